@@ -1,26 +1,84 @@
-from fastapi import APIRouter, HTTPException
+import asyncio
+from typing import Optional
+
+import numpy as np
+from fastapi import APIRouter, Header, HTTPException, WebSocket, status
+from fastapi.responses import ORJSONResponse, Response
 from sqlalchemy import select, delete
 
 from core.db import get_session_local
+from core.logging import get_logger
+from core.settings import get_data_window, get_indicator_mode, get_stream_send_timeout
 from models.indicator import IndicatorDB
 from schemas.indicator import IndicatorCreate, IndicatorUpdate
-from services.indicators import recalc_indicator, clean
-from state.memory import candles, indicator_values
+from services.candles import is_tracked
+from services.data_cache import get_data_cache, invalidate_all
+from services.indicator_cache import indicator_cache
+from services.indicators import recalc_indicator, candle_columns, candle_rows, lazy_values
+from services.stream import stream_hub
+from state.memory import get_store, indicator_series, indicator_values
+from utils.columnar import BINARY, COLUMNS, INDICATOR_PREFIX, ROWS, encode_binary, media_type, negotiate
+from utils.constants import DEFAULT_INTERVAL, DEFAULT_SYMBOL
+from utils.indicator_graph import IndicatorGraph
 
 
 router = APIRouter()
 
+_logger = get_logger("IndicatorRoutes")
+
+
+def _check_series(symbol, interval):
+    if not is_tracked(symbol, interval):
+        raise HTTPException(404, f"Series {symbol}/{interval} is not tracked")
+
+
+def _sources(sources):
+    # В БД источники лежат JSON: {вход: {"id": id, "output": выход}}
+    if not sources:
+        return None
+    return {name: source.model_dump() for name, source in sources.items()}
+
+
+async def _check_graph(ind):
+    """Граф ряда после изменения ind должен остаться корректным.
+
+    Сам ind - без циклов, чужих рядов и пропавших источников (400). Изменение
+    не должно ломать индикаторы, которые считаются через ind (409, как при
+    удалении источника). Новому индикатору без источников другие не нужны.
+    """
+    inds = {}
+    if ind.sources or ind.id is not None:
+        inds = {i.id: i for i in await indicator_cache.all(get_session_local)}
+    broken_before = set(IndicatorGraph(inds.values()).errors)
+    inds[ind.id] = ind
+    errors = IndicatorGraph(inds.values()).errors
+    if ind.id in errors:
+        raise HTTPException(400, errors[ind.id])
+    broken = sorted(set(errors) - broken_before)
+    if broken:
+        raise HTTPException(
+            409, f"Indicator {ind.id} is a source of {', '.join(map(str, broken))}: {errors[broken[0]]}"
+        )
+
 
 @router.post("/indicator")
 async def create_indicator(ind: IndicatorCreate):
-    db_ind = IndicatorDB(name=ind.name, type=ind.type, period=ind.period, color=ind.color)
+    _check_series(ind.symbol, ind.interval)
+    db_ind = IndicatorDB(
+        name=ind.name, type=ind.type, period=ind.period, color=ind.color,
+        symbol=ind.symbol, interval=ind.interval, sources=_sources(ind.sources)
+    )
+    await _check_graph(db_ind)
     session_local = get_session_local()
     async with session_local() as session:
         session.add(db_ind)
+        await indicator_cache.notify(session)
         await session.commit()
         await session.refresh(db_ind)
 
+    indicator_cache.put(db_ind)
     await recalc_indicator(db_ind)
+    stream_hub.resync_all()
 
     return {"id": db_ind.id} 
 
@@ -45,47 +103,208 @@ async def update_indicator(ind_id: int, upd: IndicatorUpdate):
             ind.type = upd.type
         if upd.color:
             ind.color = upd.color
+        if upd.symbol or upd.interval:
+            symbol = upd.symbol or ind.series[0]
+            interval = upd.interval or ind.series[1]
+            _check_series(symbol, interval)
+            ind.symbol, ind.interval = symbol, interval
+        if upd.sources is not None:
+            ind.sources = _sources(upd.sources)
+        await _check_graph(ind)
 
+        await indicator_cache.notify(session)
         await session.commit()
 
+    indicator_cache.put(ind)
     await recalc_indicator(ind)
+    stream_hub.resync_all()
     return {"status": "updated"}
 
 
 @router.delete("/indicator/{ind_id}")
 async def delete_indicator(ind_id: int):
+    # Индикатор, через который считаются другие, удалить нельзя. Кэш
+    # write-through и загружен при старте: БД для проверки не нужна
+    graph = IndicatorGraph(indicator_cache.cached())
+    dependents = sorted(graph.dependents(ind_id) - {ind_id})
+    if dependents:
+        raise HTTPException(409, f"Indicator {ind_id} is a source of {', '.join(map(str, dependents))}")
+
     session_local = get_session_local()
     async with session_local() as session:
         await session.execute(delete(IndicatorDB).where(IndicatorDB.id == ind_id))
+        await indicator_cache.notify(session)
         await session.commit()
 
+    indicator_cache.remove(ind_id)
     indicator_values.pop(ind_id, None)
+    indicator_series.pop(ind_id, None)
+    invalidate_all()
+    stream_hub.resync_all()
     return {"status": "deleted"}
 
 
 @router.get("/data")
-async def get_data():
-    session_local = get_session_local()
-    async with session_local() as session:
-        result = await session.execute(select(IndicatorDB))
-        inds = result.scalars().all()
-
-    cleaned = {k: clean(v) for k, v in indicator_values.items()}
-
-    merged = []
-    for i, c in enumerate(candles):
-        row = dict(c)
-        row["indicators"] = {
-            ind_id: cleaned[ind_id][i]
-            for ind_id in cleaned
-            if i < len(cleaned[ind_id])
+async def get_data(
+    symbol: str = DEFAULT_SYMBOL,
+    interval: str = DEFAULT_INTERVAL,
+    since: Optional[float] = None,
+    format: Optional[str] = None,
+    accept: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None)
+):
+    _check_series(symbol, interval)
+    try:
+        fmt = negotiate(format, accept)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    data_cache = get_data_cache(symbol, interval)
+    # ETag включает версию определений индикаторов: они должны быть загружены
+    # до проверки If-None-Match (после первой загрузки это без БД)
+    await indicator_cache.all(get_session_local)
+
+    # Клиент уже держит текущую версию: ни БД, ни сериализации
+    if data_cache.not_modified(if_none_match, fmt):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=_cache_headers(data_cache.etag(fmt)))
+
+    if since is not None:
+        # Только хвост начиная с since, включая пересобранную последнюю свечу
+        etag = data_cache.etag(fmt)
+        start = get_store(symbol, interval).index_from(since)
+        content = await _build(fmt, start, symbol, interval)
+        if fmt == BINARY:
+            return Response(content=encode_binary(content), media_type=media_type(fmt), headers=_cache_headers(etag))
+        return ORJSONResponse(content=content, media_type=media_type(fmt), headers=_cache_headers(etag))
+
+    payload = await data_cache.get(
+        lambda: _build(fmt, _window_start(symbol, interval), symbol, interval),
+        fmt,
+        encode_binary if fmt == BINARY else None,
+    )
+    return Response(
+        content=payload.body,
+        media_type=media_type(fmt),
+        headers=_cache_headers(payload.etag)
+    )
+
+
+def _cache_headers(etag):
+    # no-cache заставляет браузер каждый раз перепроверять ответ по ETag,
+    # Vary: формат ответа зависит от Accept
+    return {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept"}
+
+
+def _window_start(symbol, interval):
+    # Полная история может быть длинной: отдаём последнее окно, остальное через since
+    return max(0, len(get_store(symbol, interval)) - get_data_window())
+
+
+async def _build_data(symbol, interval):
+    return await _build(ROWS, _window_start(symbol, interval), symbol, interval)
+
+
+async def _build(fmt, start, symbol, interval):
+    """Содержимое /data в формате fmt начиная со свечи start.
+
+    columns - JSON-массив на каждую колонку, binary - колонки float64 для
+    encode_binary, индикаторы в нём идут колонками indicator:<id>. Колонки
+    остаются массивами NumPy: NaN становится null при сериализации.
+    """
+    values = await _values(symbol, interval)
+    definitions = await _indicator_definitions(symbol, interval)
+    if fmt == ROWS:
+        return {"candles": candle_rows(start, symbol, interval, values), "indicators": definitions}
+
+    columns, indicators = candle_columns(start, symbol, interval, values)
+    outputs = {int(d["id"]): d["outputs"] for d in definitions}
+    split = {ind_id: _split_outputs(v, outputs.get(ind_id)) for ind_id, v in indicators.items()}
+    if fmt == BINARY:
+        for ind_id, ind_columns in split.items():
+            prefix = f"{INDICATOR_PREFIX}{ind_id}"
+            if isinstance(ind_columns, dict):
+                columns.update((f"{prefix}:{name}", column) for name, column in ind_columns.items())
+            else:
+                columns[prefix] = ind_columns
+        return columns
+
+    columns["indicators"] = split
+    return {"candles": columns, "indicators": definitions}
+
+
+def _split_outputs(values, outputs):
+    # Индикатор с несколькими выходами - словарь {выход: колонка}
+    if values.ndim == 1:
+        return values
+    names = outputs or [str(i) for i in range(values.shape[1])]
+    return {name: np.ascontiguousarray(column) for name, column in zip(names, values.T)}
+
+
+async def _values(symbol, interval):
+    # В режиме lazy индикаторы считаются здесь, по запросу; None - посчитанные на опросе
+    if get_indicator_mode() == "lazy":
+        return await lazy_values(symbol, interval)
+    return None
+
+
+def _outputs(graph, ind_id):
+    # Имена выходов и длина прогрева (с прогревом источников): по ним клиент разбирает значения
+    node = graph.nodes.get(ind_id)
+    if node is None:
+        return {"outputs": ["value"], "warmup": 0}
+    return {"outputs": list(node.definition.outputs), "warmup": graph.warmup(node)}
+
+
+async def _indicator_definitions(symbol, interval):
+    inds = [i for i in await indicator_cache.all(get_session_local) if i.series == (symbol, interval)]
+    graph = IndicatorGraph(inds)
+    return [
+        {
+            "id": str(i.id), "name": i.name, "type": i.type, "period": i.period, "color": i.color,
+            "symbol": i.series[0], "interval": i.series[1], "sources": i.sources, **_outputs(graph, i.id)
         }
-        merged.append(row)
-
-    return {
-        "candles": merged,
-        "indicators": [
-            {"id": str(i.id), "name": i.name, "type": i.type, "period": i.period, "color": i.color}
-            for i in inds
-        ]
-    }
+        for i in inds
+    ]
+
+
+@router.websocket("/ws/data")
+async def data_stream(websocket: WebSocket, symbol: str = DEFAULT_SYMBOL, interval: str = DEFAULT_INTERVAL):
+    """Снимок /data при подключении, дальше только изменившиеся свечи"""
+    if not is_tracked(symbol, interval):
+        await websocket.close(code=1008)
+        return
+
+    await websocket.accept()
+    subscriber = stream_hub.subscribe(symbol, interval)
+
+    sender = asyncio.create_task(_send_stream(websocket, subscriber, symbol, interval))
+    watcher = asyncio.create_task(_wait_disconnect(websocket))
+    try:
+        done, _ = await asyncio.wait({sender, watcher}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        stream_hub.unsubscribe(subscriber)
+        sender.cancel()
+        watcher.cancel()
+
+    if sender in done and isinstance(sender.exception(), asyncio.TimeoutError):
+        # Клиент не принимает данные дольше таймаута: отключаем его
+        _logger.warning("Stream subscriber is too slow, closing connection")
+        await websocket.close(code=1013)
+
+
+async def _send_stream(websocket, subscriber, symbol, interval):
+    timeout = get_stream_send_timeout()
+    data_cache = get_data_cache(symbol, interval)
+    message = None
+    while True:
+        if message is None:
+            payload = await data_cache.get(lambda: _build_data(symbol, interval))
+            message = '{"type":"snapshot","data":' + payload.body.decode("utf-8") + '}'
+        await asyncio.wait_for(websocket.send_text(message), timeout)
+        message = await subscriber.next()
+
+
+async def _wait_disconnect(websocket):
+    while True:
+        message = await websocket.receive()
+        if message["type"] == "websocket.disconnect":
+            return
@@ -1,14 +1,22 @@
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
+import contextlib
 import time
 import asyncio
 import os
-from core.db import Base, get_engine
+from core.db import Base, get_engine, get_session_local, dispose_engine
+from core.executor import init_executor, shutdown_executor
+from core.http import init_http_client, close_http_client
+from core.migrations import run_migrations
 from services.candles import fetch_candles
-from core.settings import get_app_name, get_environment, get_debug
+from core.settings import get_app_name, get_environment, get_debug, get_database_url
 from core.logging import setup_logging, get_logger
-from services.candles import candle_loop
+from services.backfill import ingest_loop, sync_from_db, warm_from_db
+from services.candle_storage import close_candle_storage, init_candle_storage
+from services.indicator_cache import indicator_cache
+from services.indicators import reload_indicators
+from services.leader import leader
 from api.indicator_routes import router
 
 # Prometheus метрики
@@ -42,12 +50,29 @@ async def lifespan(app: FastAPI):
     engine = get_engine()
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        await run_migrations(conn)
         logger.info(f"Successfully create database")
 
-    asyncio.create_task(candle_loop())
+    init_executor()
+    await indicator_cache.load(get_session_local)
+    await indicator_cache.listen(get_database_url(), reload_indicators)
+    init_candle_storage(get_session_local())
+    await warm_from_db()
+    init_http_client()
+    await leader.start(get_database_url(), sync_from_db)
+    candle_task = asyncio.create_task(ingest_loop())
     logger.info(f"Candle loop started")
     yield
     logger.info(f"Shutting down {get_app_name()}")
+    candle_task.cancel()
+    with contextlib.suppress(asyncio.CancelledError):
+        await candle_task
+    await leader.close()
+    await close_http_client()
+    close_candle_storage()
+    await indicator_cache.close()
+    shutdown_executor()
+    await dispose_engine()
 
 
 app = FastAPI(
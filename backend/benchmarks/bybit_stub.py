@@ -0,0 +1,114 @@
+"""Локальная заглушка Bybit /v5/market/kline для тестов и нагрузочного теста.
+
+Поднимает настоящий HTTP/1.1 сервер с keep-alive на 127.0.0.1, считает
+TCP-подключения и запросы и отдаёт синтетические свечи по параметрам
+interval, limit, start и end. fail(params) -> True отвечает на запрос
+ошибкой Bybit (retCode 10006) с HTTP 200, как настоящая биржа.
+"""
+import asyncio
+import json
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+
+from utils.constants import CANDLE_COLUMNS
+
+MINUTE_MS = 60_000
+
+
+def synthetic_candle(timestamp):
+    """Детерминированная свеча в формате Bybit: строки в порядке колонок"""
+    step = timestamp // MINUTE_MS
+    close = 50000 + (step % 1000) * 1.5
+    return [
+        str(timestamp),
+        str(close - 1.0),
+        str(close + 5.0),
+        str(close - 5.0),
+        str(close),
+        str(10 + step % 7),
+        str((10 + step % 7) * close),
+    ]
+
+
+def candle_columns(timestamps):
+    """Синтетические свечи колонками, как их принимают CandleStore и save_candles"""
+    rows = np.array([synthetic_candle(int(ts)) for ts in timestamps], dtype=np.float64)
+    return dict(zip(CANDLE_COLUMNS, rows.T))
+
+
+class BybitStub:
+    def __init__(self, now_ms=1_700_000_000_000, max_limit=1000):
+        self.now_ms = now_ms
+        self.max_limit = max_limit
+        self.connections = 0
+        self.requests = []
+        self.fail = None
+        self._server = None
+
+    @property
+    def url(self):
+        host, port = self._server.sockets[0].getsockname()[:2]
+        return f"http://{host}:{port}/v5/market/kline"
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        return self
+
+    async def stop(self):
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *exc):
+        await self.stop()
+
+    def klines(self, params):
+        """Свечи от новых к старым, как их отдаёт Bybit"""
+        step = int(params.get("interval", "1")) * MINUTE_MS
+        limit = min(int(params.get("limit", 200)), self.max_limit)
+        end = min(int(params.get("end", self.now_ms)), self.now_ms)
+        start = int(params.get("start", 0))
+
+        last = end - end % step
+        timestamps = range(last, max(start - 1, last - limit * step), -step)
+        return [synthetic_candle(ts) for ts in timestamps if ts >= start]
+
+    async def _handle(self, reader, writer):
+        self.connections += 1
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                target = head.split(b" ", 2)[1].decode()
+                params = {k: v[0] for k, v in parse_qs(urlsplit(target).query).items()}
+                self.requests.append(params)
+
+                if self.fail is not None and self.fail(params):
+                    body = json.dumps({"retCode": 10006, "retMsg": "Too many visits!", "result": {}}).encode()
+                else:
+                    body = self.body(params)
+                writer.write(
+                    b"HTTP/1.1 200 OK\r\n"
+                    b"Content-Type: application/json\r\n"
+                    b"Connection: keep-alive\r\n"
+                    + f"Content-Length: {len(body)}\r\n\r\n".encode()
+                    + body
+                )
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionResetError):
+            pass
+        finally:
+            writer.close()
+
+    def body(self, params):
+        return json.dumps({
+            "retCode": 0,
+            "retMsg": "OK",
+            "result": {
+                "category": params.get("category"),
+                "symbol": params.get("symbol"),
+                "list": self.klines(params),
+            },
+        }).encode()
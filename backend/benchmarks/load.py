@@ -0,0 +1,459 @@
+"""Нагрузочный тест: N дашбордов опрашивают /data, параллельно идёт CRUD индикаторов
+
+Поднимает настоящий сервер uvicorn app:app, как в Dockerfile, на SQLite
+(aiosqlite) и заглушке Bybit из benchmarks/bybit_stub.py: сеть и Postgres не
+нужны. Сначала замеряется фоновая нагрузка сервера (опрос биржи и пересчёт
+индикаторов без клиентов), потом нагрузка с клиентами. Отчёт: пропускная
+способность, p50/p95/p99 по типам запросов, CPU сервера на запрос, память
+и что при такой нагрузке сделает HPA из k8s/.
+
+Запуск из каталога backend:
+    python -m benchmarks.load --dashboards 200 --duration 60
+    python -m benchmarks.load --dashboards 50 --env INDICATOR_MODE=lazy --output /tmp/load.json
+"""
+import argparse
+import asyncio
+import math
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+import numpy as np
+import yaml
+from prometheus_client.parser import text_string_to_metric_families
+
+from benchmarks.bybit_stub import MINUTE_MS, BybitStub
+from benchmarks.runner import git_commit, write_results
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+K8S_DIR = BACKEND_DIR.parent / "k8s"
+RESULTS_DIR = Path(__file__).parent / "results"
+
+# Индикаторы, которые есть на сервере до начала нагрузки
+BASE_INDICATORS = [
+    ("sma", 20), ("ema", 50), ("rsi", 14), ("macd", 12),
+    ("bbands", 20), ("atr", 14), ("vwap", 30), ("stoch", 14),
+]
+# Что создают дашборды во время нагрузки
+CREATED_TYPES = ["sma", "ema", "wma", "rsi", "bbands", "min", "max", "stddev"]
+
+
+class LiveBybitStub(BybitStub):
+    """Заглушка Bybit с живыми часами: открытая свеча меняется на каждом опросе"""
+
+    def __init__(self):
+        super().__init__(now_ms=int(time.time() * 1000))
+        self.ticks = 0
+
+    def klines(self, params):
+        self.now_ms = int(time.time() * 1000)
+        rows = super().klines(params)
+        step = int(params.get("interval", "1")) * MINUTE_MS
+        # Свечи идут от новых к старым: первая - открытая, если запрос до текущего момента
+        if rows and int(rows[0][0]) == self.now_ms - self.now_ms % step:
+            self.ticks += 1
+            row = rows[0]
+            close = float(row[4]) + (self.ticks % 20 - 10) * 0.5
+            rows[0] = row[:2] + [str(max(float(row[2]), close)), str(min(float(row[3]), close)), str(close)] + row[5:]
+        return rows
+
+
+class Recorder:
+    """Время ответов по типам запросов; пишет только во время замера"""
+
+    def __init__(self):
+        self.active = False
+        self.latencies = {}
+        self.errors = {}
+
+    async def request(self, client, method, url, kind, **kwargs):
+        """Запрос к серверу; kind(response) - тип запроса в отчёте"""
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+        except httpx.HTTPError:
+            response = None
+        elapsed = time.perf_counter() - start
+
+        if self.active:
+            name = kind(response) if callable(kind) else kind
+            if response is None or response.status_code >= 400:
+                self.errors[name] = self.errors.get(name, 0) + 1
+            else:
+                self.latencies.setdefault(name, []).append(elapsed)
+        return response
+
+
+async def pause(stop, seconds):
+    """Ждёт seconds секунд или остановки нагрузки"""
+    try:
+        await asyncio.wait_for(stop.wait(), max(seconds, 0))
+    except asyncio.TimeoutError:
+        pass
+
+
+# =========================
+# Клиенты
+# =========================
+def data_kind(response):
+    return "data_304" if response is not None and response.status_code == 304 else "data"
+
+
+async def dashboard(client, recorder, stop, interval, fmt):
+    """Вкладка с графиком: /data раз в interval секунд.
+
+    Браузер перепроверяет ответ по ETag (Cache-Control: no-cache), поэтому
+    запрос идёт с If-None-Match прошлого ответа.
+    """
+    await pause(stop, random.uniform(0, interval))
+    etag = None
+    while not stop.is_set():
+        started = time.monotonic()
+        headers = {"If-None-Match": etag} if etag else {}
+        response = await recorder.request(client, "GET", "/data", data_kind, params={"format": fmt}, headers=headers)
+        if response is not None and response.status_code == 200:
+            etag = response.headers.get("ETag")
+        await pause(stop, interval - (time.monotonic() - started))
+
+
+def random_indicator(base_ids, step):
+    ind_type = random.choice(CREATED_TYPES)
+    body = {"name": f"load {step}", "type": ind_type, "period": random.randint(5, 50), "color": "#888888"}
+    # Каждый третий считается над базовым RSI: в нагрузку попадает граф источников
+    if step % 3 == 0 and "rsi" in base_ids:
+        body.update(type="ema", sources={"close": {"id": base_ids["rsi"]}})
+    return body
+
+
+async def crud(client, recorder, stop, interval, base_ids):
+    """Изменения индикаторов с дашбордов по кругу: создание, изменение, удаление"""
+    created = []
+    step = 0
+    while not stop.is_set():
+        started = time.monotonic()
+        action = ("create", "update", "delete")[step % 3]
+        if action == "create" or not created:
+            response = await recorder.request(client, "POST", "/indicator", "create",
+                                              json=random_indicator(base_ids, step))
+            if response is not None and response.status_code == 200:
+                created.append(response.json()["id"])
+        elif action == "update":
+            await recorder.request(client, "PUT", f"/indicator/{created[-1]}", "update",
+                                   json={"period": random.randint(5, 50)})
+        else:
+            await recorder.request(client, "DELETE", f"/indicator/{created.pop(0)}", "delete")
+        step += 1
+        await pause(stop, interval - (time.monotonic() - started))
+
+
+# =========================
+# Сервер
+# =========================
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(port, workdir, env):
+    """uvicorn app:app в отдельном процессе: CPU сервера не смешивается с клиентами"""
+    command = [
+        sys.executable, "-m", "uvicorn", "app:app", "--app-dir", str(BACKEND_DIR),
+        "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning",
+    ]
+    with open(workdir / "server.log", "wb") as log:
+        return subprocess.Popen(command, cwd=workdir, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+
+def log_tail(workdir, lines=20):
+    # Рабочий каталог временный: хвост лога показываем сразу в ошибке
+    return "\n".join((workdir / "server.log").read_text(errors="replace").splitlines()[-lines:])
+
+
+async def wait_ready(client, server, workdir, timeout):
+    """Ждёт, пока сервер догрузит историю с заглушки и /data отдаст свечи"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"Server exited with code {server.returncode}:\n{log_tail(workdir)}")
+        try:
+            response = await client.get("/data")
+            if response.status_code == 200 and response.json()["candles"]:
+                return
+        except httpx.HTTPError:
+            pass
+        await asyncio.sleep(0.5)
+    raise TimeoutError(f"Server is not ready after {timeout} s")
+
+
+async def create_indicators(client, count):
+    """Базовые индикаторы: {тип: id}"""
+    ids = {}
+    for ind_type, period in BASE_INDICATORS[:count]:
+        response = await client.post("/indicator", json={
+            "name": f"{ind_type} {period}", "type": ind_type, "period": period, "color": "#000000"
+        })
+        response.raise_for_status()
+        ids[ind_type] = response.json()["id"]
+    return ids
+
+
+async def process_metrics(client):
+    """CPU сервера в секундах и RSS в байтах из /metrics (ProcessCollector, только Linux)"""
+    response = await client.get("/metrics")
+    values = {}
+    for family in text_string_to_metric_families(response.text):
+        for sample in family.samples:
+            values[sample.name] = sample.value
+    return values.get("process_cpu_seconds_total"), values.get("process_resident_memory_bytes")
+
+
+async def sample_memory(client, stop, peak):
+    """Максимальный RSS сервера за время замера, раз в секунду"""
+    while not stop.is_set():
+        _, rss = await process_metrics(client)
+        if rss is not None:
+            peak.append(rss)
+        await pause(stop, 1)
+
+
+# =========================
+# Отчёт
+# =========================
+def latency_summary(latencies, duration):
+    values = np.asarray(latencies) * 1000
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {
+        "count": len(values), "rps": len(values) / duration,
+        "p50_ms": p50, "p95_ms": p95, "p99_ms": p99, "max_ms": float(values.max()),
+    }
+
+
+def summarize(recorder, duration, dashboards, idle_cores, load_cpu, client_cpu, rss_peak):
+    """Итог замера; CPU на запрос - сверх фоновой нагрузки без клиентов"""
+    by_kind = {kind: latency_summary(values, duration) for kind, values in sorted(recorder.latencies.items())}
+    for kind, errors in recorder.errors.items():
+        by_kind.setdefault(kind, {"count": 0, "rps": 0.0})["errors"] = errors
+    requests = sum(item["count"] for item in by_kind.values())
+
+    cpu = None
+    if load_cpu is not None:
+        load_cores = load_cpu / duration
+        extra = max(load_cpu - idle_cores * duration, 0.0)
+        cpu = {
+            "idle_cores": idle_cores,
+            "load_cores": load_cores,
+            "per_request_ms": extra / requests * 1000 if requests else None,
+            "per_dashboard_cores": (load_cores - idle_cores) / dashboards if dashboards else None,
+        }
+    return {
+        "duration": duration,
+        "dashboards": dashboards,
+        "requests": requests,
+        "errors": sum(recorder.errors.values()),
+        "throughput_rps": requests / duration,
+        "by_kind": by_kind,
+        "cpu": cpu,
+        "client_cores": client_cpu / duration,
+        "rss_peak_mb": max(rss_peak) / 2 ** 20 if rss_peak else None,
+    }
+
+
+def cpu_cores(value):
+    """CPU из манифеста k8s: "200m" или "0.5" """
+    value = str(value)
+    return float(value[:-1]) / 1000 if value.endswith("m") else float(value)
+
+
+def memory_mb(value):
+    """Память из манифеста k8s: "256Mi", "1Gi" """
+    units = {"Ki": 2 ** -10, "Mi": 1, "Gi": 2 ** 10}
+    value = str(value)
+    for suffix, scale in units.items():
+        if value.endswith(suffix):
+            return float(value[:-len(suffix)]) * scale
+    return float(value) / 2 ** 20
+
+
+def pod_sizing(summary, deployment, hpa):
+    """Что увидит HPA при такой нагрузке на один под.
+
+    Опрос биржи идёт только на лидере, а /data делится между репликами,
+    поэтому число реплик - оценка сверху.
+    """
+    cpu = summary["cpu"]
+    if cpu is None:
+        return None
+    resources = deployment["spec"]["template"]["spec"]["containers"][0].get("resources", {})
+    request = cpu_cores(resources["requests"]["cpu"])
+    limit = cpu_cores(resources["limits"]["cpu"])
+    target = next(
+        m["resource"]["target"]["averageUtilization"] for m in hpa["spec"]["metrics"]
+        if m["type"] == "Resource" and m["resource"]["name"] == "cpu"
+    )
+    min_replicas, max_replicas = hpa["spec"].get("minReplicas", 1), hpa["spec"]["maxReplicas"]
+
+    utilization = cpu["load_cores"] / request * 100
+    # Формула HPA для одной реплики: ceil(загрузка / целевая загрузка)
+    wanted = max(min_replicas, math.ceil(utilization / target))
+    per_dashboard = cpu["per_dashboard_cores"]
+    memory_limit = memory_mb(resources["limits"]["memory"])
+    return {
+        "cpu_request": request,
+        "cpu_limit": limit,
+        "hpa_target_pct": target,
+        "utilization_pct": utilization,
+        "hpa_replicas": min(wanted, max_replicas),
+        "hpa_replicas_wanted": wanted,
+        "cpu_throttled": cpu["load_cores"] > limit,
+        "dashboards_per_pod_at_limit": (limit - cpu["idle_cores"]) / per_dashboard if per_dashboard else None,
+        "memory_limit_mb": memory_limit,
+        "memory_ok": summary["rss_peak_mb"] is None or summary["rss_peak_mb"] < memory_limit,
+    }
+
+
+def load_manifests():
+    try:
+        deployment = yaml.safe_load((K8S_DIR / "backend-deployment.yaml").read_text())
+        hpa = yaml.safe_load((K8S_DIR / "hpa-backend.yaml").read_text())
+    except OSError:
+        return None, None
+    return deployment, hpa
+
+
+def print_report(summary, sizing):
+    print(f"\n{'request':<10} {'count':>7} {'rps':>8} {'p50, ms':>8} {'p95, ms':>8} {'p99, ms':>8} {'errors':>7}")
+    for kind, item in summary["by_kind"].items():
+        if not item["count"]:
+            print(f"{kind:<10} {0:>7} {0:>8.1f} {'-':>8} {'-':>8} {'-':>8} {item.get('errors', 0):>7}")
+            continue
+        print(f"{kind:<10} {item['count']:>7} {item['rps']:>8.1f} {item['p50_ms']:>8.1f} "
+              f"{item['p95_ms']:>8.1f} {item['p99_ms']:>8.1f} {item.get('errors', 0):>7}")
+    print(f"\nThroughput: {summary['throughput_rps']:.1f} req/s, errors: {summary['errors']}")
+
+    cpu = summary["cpu"]
+    if cpu is None:
+        print("Server CPU: /metrics has no process_cpu_seconds_total on this platform")
+    else:
+        per_request = "-" if cpu["per_request_ms"] is None else f"{cpu['per_request_ms']:.2f}"
+        print(f"Server CPU: idle {cpu['idle_cores']:.3f} cores, under load {cpu['load_cores']:.3f} cores, "
+              f"{per_request} ms CPU per request")
+    if summary["rss_peak_mb"] is not None:
+        print(f"Server RSS: peak {summary['rss_peak_mb']:.0f} MB")
+    if summary["client_cores"] > 0.8:
+        print(f"Load generator used {summary['client_cores']:.2f} cores: it may be the bottleneck")
+
+    if sizing:
+        print(f"\nk8s: CPU request {sizing['cpu_request'] * 1000:.0f}m, limit {sizing['cpu_limit'] * 1000:.0f}m, "
+              f"HPA target {sizing['hpa_target_pct']}%, memory limit {sizing['memory_limit_mb']:.0f} MB")
+        print(f"  one pod at {sizing['utilization_pct']:.0f}% of CPU request: HPA scales to "
+              f"{sizing['hpa_replicas']} replicas (wants {sizing['hpa_replicas_wanted']})")
+        if sizing["cpu_throttled"]:
+            print("  load is above the CPU limit: the pod is throttled")
+        if sizing["dashboards_per_pod_at_limit"] is not None:
+            print(f"  one pod at its CPU limit serves about {sizing['dashboards_per_pod_at_limit']:.0f} dashboards")
+        if not sizing["memory_ok"]:
+            print("  peak RSS is above the memory limit: the pod would be OOM-killed")
+
+
+# =========================
+# Запуск
+# =========================
+async def run(args):
+    extra_env = dict(item.split("=", 1) for item in args.env)
+    async with LiveBybitStub() as stub:
+        with tempfile.TemporaryDirectory() as workdir:
+            workdir = Path(workdir)
+            port = free_port()
+            env = {
+                **os.environ,
+                "APP_NAME": os.getenv("APP_NAME", "Trading Indicators API"),
+                "DATABASE_URL": f"sqlite+aiosqlite:///{workdir / 'load.db'}",
+                "BYBIT_URL": stub.url,
+                **extra_env,
+            }
+            server = start_server(port, workdir, env)
+            limits = httpx.Limits(max_connections=args.dashboards + 8, max_keepalive_connections=args.dashboards + 8)
+            try:
+                async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits,
+                                             timeout=args.timeout) as client:
+                    await wait_ready(client, server, workdir, args.startup_timeout)
+                    base_ids = await create_indicators(client, args.indicators)
+                    print(f"Server ready on port {port}, {len(base_ids)} indicators, "
+                          f"{args.dashboards} dashboards polling every {args.poll_interval} s")
+
+                    # Фон: опрос биржи и пересчёт индикаторов без клиентов
+                    idle_start, _ = await process_metrics(client)
+                    await asyncio.sleep(args.idle)
+                    idle_end, _ = await process_metrics(client)
+                    idle_cores = (idle_end - idle_start) / args.idle if idle_start is not None else 0.0
+
+                    recorder = Recorder()
+                    stop = asyncio.Event()
+                    tasks = [
+                        asyncio.create_task(dashboard(client, recorder, stop, args.poll_interval, args.format))
+                        for _ in range(args.dashboards)
+                    ]
+                    if args.crud_interval > 0:
+                        tasks.append(asyncio.create_task(crud(client, recorder, stop, args.crud_interval, base_ids)))
+                    await asyncio.sleep(args.warmup)
+
+                    peak = []
+                    measured = asyncio.Event()
+                    sampler = asyncio.create_task(sample_memory(client, measured, peak))
+                    cpu_start, _ = await process_metrics(client)
+                    client_start, started = time.process_time(), time.monotonic()
+                    recorder.active = True
+                    await asyncio.sleep(args.duration)
+                    recorder.active = False
+                    duration = time.monotonic() - started
+                    client_cpu = time.process_time() - client_start
+                    cpu_end, _ = await process_metrics(client)
+
+                    measured.set()
+                    stop.set()
+                    await asyncio.gather(sampler, *tasks)
+            finally:
+                server.terminate()
+                # Ждём вне event loop: заглушка тем временем дочитывает закрытые сервером соединения
+                await asyncio.to_thread(server.wait, 30)
+
+    load_cpu = None if cpu_start is None else cpu_end - cpu_start
+    return summarize(recorder, duration, args.dashboards, idle_cores, load_cpu, client_cpu, peak)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dashboards", type=int, default=50, help="сколько вкладок опрашивают /data")
+    parser.add_argument("--poll-interval", type=float, default=5, help="период опроса /data, как в frontend/src/App.js")
+    parser.add_argument("--format", default="rows", choices=["rows", "columns", "binary"])
+    parser.add_argument("--crud-interval", type=float, default=2, help="секунд между изменениями индикаторов, 0 - без CRUD")
+    parser.add_argument("--indicators", type=int, default=len(BASE_INDICATORS), help="базовых индикаторов на сервере")
+    parser.add_argument("--duration", type=float, default=60, help="длительность замера, секунд")
+    parser.add_argument("--warmup", type=float, default=5, help="нагрузка до начала замера, секунд")
+    parser.add_argument("--idle", type=float, default=10, help="замер фоновой нагрузки без клиентов, секунд; не меньше периода опроса биржи (10 с)")
+    parser.add_argument("--timeout", type=float, default=30, help="таймаут одного запроса")
+    parser.add_argument("--startup-timeout", type=float, default=120)
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE", help="переменные окружения сервера")
+    parser.add_argument("--output", type=Path, help="файл результатов, по умолчанию results/load-<commit>.json")
+    args = parser.parse_args(argv)
+
+    summary = asyncio.run(run(args))
+    deployment, hpa = load_manifests()
+    sizing = pod_sizing(summary, deployment, hpa) if deployment and hpa else None
+    print_report(summary, sizing)
+
+    output = args.output or RESULTS_DIR / f"load-{git_commit() or 'local'}.json"
+    write_results(output, {"summary": summary, "sizing": sizing}, args={k: v for k, v in vars(args).items() if k != "output"})
+    print(f"\nResults written to {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
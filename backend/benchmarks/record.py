@@ -0,0 +1,41 @@
+"""Записывает ответ Bybit /v5/market/kline для benchmarks.suite
+
+Нужна сеть. Запуск из каталога backend:
+    python -m benchmarks.record [--symbol BTCUSDT] [--interval 1]
+"""
+import argparse
+import json
+from pathlib import Path
+
+import httpx
+
+from core.settings import get_bybit_url
+
+DATA_DIR = Path(__file__).parent / "data"
+LIMIT = 1000
+
+
+def payload_path(symbol, interval):
+    return DATA_DIR / f"bybit_kline_{symbol.lower()}_{interval}.json"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--symbol", default="BTCUSDT")
+    parser.add_argument("--interval", default="1")
+    args = parser.parse_args()
+
+    params = {"category": "linear", "symbol": args.symbol, "interval": args.interval, "limit": LIMIT}
+    response = httpx.get(get_bybit_url(), params=params, timeout=30)
+    response.raise_for_status()
+    payload = response.json()
+    if payload.get("retCode", 0) != 0:
+        raise SystemExit(f"Bybit error: retCode {payload['retCode']} {payload.get('retMsg', '')}")
+
+    path = payload_path(args.symbol, args.interval)
+    path.write_text(json.dumps(payload, separators=(",", ":")))
+    print(f"{len(payload['result']['list'])} candles written to {path}")
+
+
+if __name__ == "__main__":
+    main()
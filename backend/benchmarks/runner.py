@@ -0,0 +1,119 @@
+"""Замеры времени и файлы результатов для benchmarks.suite"""
+import json
+import platform
+import statistics
+import subprocess
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+
+def summary(times, number):
+    """Время одного вызова в секундах: лучший, медианный и средний прогон"""
+    return {
+        "best": min(times),
+        "median": statistics.median(times),
+        "mean": statistics.fmean(times),
+        "repeat": len(times),
+        "number": number,
+    }
+
+
+def autorange(func, min_time):
+    """Сколько вызовов подряд нужно, чтобы прогон шёл не меньше min_time"""
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        if time.perf_counter() - start >= min_time:
+            return number
+        number *= 2
+
+
+def measure(func, repeat=5, min_time=0.05, setup=None):
+    """Замер синхронной функции.
+
+    Без setup число вызовов в прогоне подбирается по min_time. С setup
+    прогон - один вызов, setup() перед ним в замер не входит.
+    """
+    number = 1 if setup else autorange(func, min_time)
+    times = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        times.append((time.perf_counter() - start) / number)
+    return summary(times, number)
+
+
+async def measure_async(func, repeat=5, min_time=0.05, setup=None):
+    """То же для корутин: func() и setup() - корутинные функции"""
+    number = 1
+    if not setup:
+        while True:
+            start = time.perf_counter()
+            for _ in range(number):
+                await func()
+            if time.perf_counter() - start >= min_time:
+                break
+            number *= 2
+
+    times = []
+    for _ in range(repeat):
+        if setup:
+            await setup()
+        start = time.perf_counter()
+        for _ in range(number):
+            await func()
+        times.append((time.perf_counter() - start) / number)
+    return summary(times, number)
+
+
+def git_commit():
+    try:
+        result = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=10)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return result.stdout.strip() or None
+
+
+def metadata():
+    """Окружение прогона: без него результаты разных машин не сравнить"""
+    return {
+        "commit": git_commit(),
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+    }
+
+
+def write_results(path, results, **meta):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps({"meta": {**metadata(), **meta}, "results": results}, indent=2, sort_keys=True))
+
+
+def read_results(path):
+    return json.loads(path.read_text())["results"]
+
+
+def compare(baseline, current, threshold=1.25):
+    """Строки (имя, было, стало, отношение) по общим замерам и список регрессий.
+
+    Сравнивается лучший прогон: он меньше всего зависит от шума машины.
+    Регрессия - замедление больше чем в threshold раз.
+    """
+    rows = []
+    regressions = []
+    for name in sorted(set(baseline) & set(current)):
+        old, new = baseline[name]["best"], current[name]["best"]
+        ratio = new / old if old > 0 else float("inf")
+        rows.append((name, old, new, ratio))
+        if ratio > threshold:
+            regressions.append(name)
+    return rows, regressions
@@ -0,0 +1,319 @@
+"""Бенчмарки горячих путей: расчёт индикаторов, пересчёт, /data и опрос Bybit
+
+Работает без сети и БД: Bybit отвечает записанным ответом из
+benchmarks/data (обновить - python -m benchmarks.record), индикаторы
+берутся из кэша определений. Результаты пишутся в JSON; с --baseline
+замеры сравниваются с прошлым прогоном, при регрессии код выхода 1.
+
+Запуск из каталога backend:
+    python -m benchmarks.suite
+    python -m benchmarks.suite --quick --only recalc get_data
+    python -m benchmarks.suite --baseline benchmarks/results/<commit>.json
+"""
+import argparse
+import asyncio
+import json
+from contextlib import asynccontextmanager, contextmanager
+from pathlib import Path
+
+import httpx
+import numpy as np
+
+import core.http
+from api.indicator_routes import get_data
+from benchmarks.record import payload_path
+from benchmarks.runner import compare, git_commit, measure, measure_async, read_results, write_results
+from core.settings import get_candle_capacity, get_data_window
+from models.indicator import IndicatorDB
+from services import candles as candles_service
+from services.data_cache import get_data_cache
+from services.indicator_cache import indicator_cache
+from services.indicators import recalc_all_indicators
+from state.memory import get_store, indicator_series, indicator_streams, indicator_values
+from utils.columnar import BINARY, COLUMNS, ROWS
+from utils.constants import CANDLE_COLUMNS, DEFAULT_INTERVAL, DEFAULT_SYMBOL, Indicators
+from utils.indicator_calculator import IndicatorsCalculator
+from utils.rate_limiter import AsyncRateLimiter
+
+RESULTS_DIR = Path(__file__).parent / "results"
+
+FULL = {
+    # Длина истории для IndicatorsCalculator.calculate
+    "sizes": (1_000, 10_000, 100_000),
+    # Число индикаторов ряда для recalc_all_indicators
+    "counts": (1, 10, 100, 1000),
+    # Свечей в хранилище ряда (не больше CANDLE_CAPACITY)
+    "history": 10_000,
+    # Индикаторов в ответе /data и при опросе Bybit
+    "indicators": 20,
+    "repeat": 5,
+    # Короткие вызовы повторяются в прогоне, пока он не займёт min_time секунд
+    "min_time": 0.05,
+}
+
+QUICK = {**FULL, "sizes": (1_000, 10_000), "counts": (1, 10, 100), "history": 2_000, "repeat": 3}
+
+PERIOD = 14
+
+
+# =========================
+# Данные
+# =========================
+def random_columns(size, seed=0):
+    """Минутные свечи со случайным блужданием цены"""
+    rng = np.random.default_rng(seed)
+    close = 50000 + np.cumsum(rng.normal(0, 25, size=size))
+    open_ = np.concatenate(([close[0]], close[:-1]))
+    spread = np.abs(rng.normal(0, 10, size=size))
+    volume = rng.uniform(1, 20, size=size)
+    return {
+        "timestamp": 60_000.0 * np.arange(size),
+        "open": open_,
+        "high": np.maximum(open_, close) + spread,
+        "low": np.minimum(open_, close) - spread,
+        "close": close,
+        "volume": volume,
+        "turnover": volume * close,
+    }
+
+
+def make_indicators(count):
+    """count индикаторов ряда по умолчанию: все типы реестра с разными периодами.
+
+    Каждый пятый из десяти - EMA над предыдущим индикатором, каждый десятый -
+    пересечение двух предыдущих: в замер попадает и граф источников.
+    """
+    types = [t for t in Indicators if t != Indicators.CROSSOVER]
+    indicators = []
+    for i in range(count):
+        ind_id = i + 1
+        ind_type, period, sources = types[i % len(types)], 2 + i // len(types), None
+        if i % 10 == 4:
+            ind_type, sources = Indicators.EMA, {"close": {"id": ind_id - 1, "output": None}}
+        elif i % 10 == 9:
+            ind_type = Indicators.CROSSOVER
+            sources = {"fast": {"id": ind_id - 1, "output": None}, "slow": {"id": ind_id - 2, "output": None}}
+        indicators.append(IndicatorDB(
+            id=ind_id, name=f"{ind_type.value} {period}", type=ind_type.value, period=period, color="#000",
+            symbol=DEFAULT_SYMBOL, interval=DEFAULT_INTERVAL, sources=sources
+        ))
+    return indicators
+
+
+def recorded_payload():
+    return json.loads(payload_path(DEFAULT_SYMBOL, DEFAULT_INTERVAL).read_text())
+
+
+def payload_columns(payload):
+    """Колонки хранилища из ответа Bybit (свечи в нём от новых к старым)"""
+    rows = np.array(payload["result"]["list"], dtype=np.float64)[::-1]
+    return dict(zip(CANDLE_COLUMNS, rows.T))
+
+
+@contextmanager
+def app_state(columns=None, indicators=()):
+    """Ряд по умолчанию с заданными свечами и индикаторами; после замера всё очищается"""
+    store = get_store(DEFAULT_SYMBOL, DEFAULT_INTERVAL)
+
+    def reset():
+        store.clear()
+        indicator_cache.clear()
+        indicator_values.clear()
+        indicator_series.clear()
+        indicator_streams.clear()
+
+    reset()
+    if columns is not None:
+        store.extend_columns(columns)
+    for ind in indicators:
+        indicator_cache.put(ind)
+    indicator_cache.loaded = True
+    try:
+        yield store
+    finally:
+        reset()
+
+
+@asynccontextmanager
+async def recorded_bybit(payload):
+    """Bybit отвечает записанным ответом: limit самых новых свечей, как биржа"""
+    bodies = {}
+
+    def handler(request):
+        limit = int(request.url.params.get("limit", 200))
+        if limit not in bodies:
+            result = dict(payload["result"], list=payload["result"]["list"][:limit])
+            bodies[limit] = json.dumps(dict(payload, result=result)).encode()
+        return httpx.Response(200, content=bodies[limit], headers={"Content-Type": "application/json"})
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    saved_client, saved_limiter = core.http._client, candles_service.bybit_limiter
+    core.http._client = client
+    # Лимит частоты запросов к бирже в замер не входит
+    candles_service.bybit_limiter = AsyncRateLimiter(1e9, 1e9)
+    try:
+        yield
+    finally:
+        core.http._client, candles_service.bybit_limiter = saved_client, saved_limiter
+        await client.aclose()
+
+
+def forming_tick(store):
+    """Сдвигает цену открытой свечи, как очередной опрос биржи"""
+    last = store[-1]
+    close = last["close"] + 0.5
+    store.upsert(dict(last, close=close, high=max(last["high"], close)))
+
+
+# =========================
+# Бенчмарки
+# =========================
+async def bench_calculate(config):
+    """IndicatorsCalculator.calculate каждого типа на истории разной длины"""
+    for size in config["sizes"]:
+        columns = random_columns(size)
+        # Входы CROSSOVER обычно идут из других индикаторов
+        columns.update(fast=columns["close"], slow=columns["open"])
+        for ind_type in Indicators:
+            stats = measure(
+                lambda: IndicatorsCalculator.calculate(ind_type, columns, PERIOD), config["repeat"], config["min_time"]
+            )
+            yield f"calculate[{ind_type.value}-{size}]", {"type": ind_type.value, "size": size, "period": PERIOD}, stats
+
+
+async def bench_recalc(config):
+    """recalc_all_indicators: полный пересчёт и тик открытой свечи"""
+    history = min(config["history"], get_candle_capacity())
+    columns = random_columns(history)
+    for count in config["counts"]:
+        params = {"indicators": count, "history": history}
+        with app_state(columns, make_indicators(count)) as store:
+            stats = await measure_async(recalc_all_indicators, config["repeat"], config["min_time"])
+            yield f"recalc_full[{count}]", {**params, "mode": "full"}, stats
+
+            async def tick():
+                await recalc_all_indicators(DEFAULT_SYMBOL, DEFAULT_INTERVAL, len(store) - 1)
+
+            async def move():
+                forming_tick(store)
+
+            # Первый тик строит потоки, в замер идут следующие
+            await move()
+            await tick()
+            stats = await measure_async(tick, config["repeat"] * 4, setup=move)
+            yield f"recalc_tick[{count}]", {**params, "mode": "tick"}, stats
+
+
+async def bench_get_data(config):
+    """get_data: сборка и сериализация ответа, готовый ответ, 304 и хвост since"""
+    history = min(config["history"], get_candle_capacity())
+    count = config["indicators"]
+    with app_state(random_columns(history), make_indicators(count)) as store:
+        await recalc_all_indicators()
+        cache = get_data_cache(DEFAULT_SYMBOL, DEFAULT_INTERVAL)
+        params = {"indicators": count, "history": history, "window": get_data_window()}
+        since = store.column("timestamp")[-2]
+
+        for fmt in (ROWS, COLUMNS, BINARY):
+            def request(**kwargs):
+                options = {"since": None, "format": fmt, "accept": None, "if_none_match": None, **kwargs}
+                return lambda: get_data(DEFAULT_SYMBOL, DEFAULT_INTERVAL, **options)
+
+            async def invalidate():
+                cache.invalidate()
+
+            cases = [
+                ("build", request(), invalidate),
+                ("cached", request(), None),
+                ("not_modified", request(if_none_match=cache.etag(fmt)), None),
+                ("since", request(since=since), None),
+            ]
+            for case, func, setup in cases:
+                repeat = config["repeat"] * 4 if setup else config["repeat"]
+                stats = await measure_async(func, repeat, config["min_time"], setup)
+                yield f"get_data[{fmt}-{case}]", {**params, "format": fmt, "case": case}, stats
+
+
+async def bench_fetch(config):
+    """Разбор записанного ответа Bybit и опрос ряда fetch_candles целиком"""
+    payload = recorded_payload()
+    async with recorded_bybit(payload):
+        for limit in (100, 1000):
+            stats = await measure_async(
+                lambda: candles_service.fetch_klines(DEFAULT_SYMBOL, DEFAULT_INTERVAL, limit),
+                config["repeat"], config["min_time"]
+            )
+            yield f"fetch_klines[{limit}]", {"limit": limit}, stats
+
+        count = config["indicators"]
+        with app_state(payload_columns(payload), make_indicators(count)) as store:
+            await recalc_all_indicators()
+
+            async def fetch():
+                await candles_service.fetch_candles(DEFAULT_SYMBOL, DEFAULT_INTERVAL)
+
+            async def move():
+                # Биржа пришлёт прежнюю открытую свечу: она перезапишет сдвинутую
+                forming_tick(store)
+
+            await move()
+            await fetch()
+            stats = await measure_async(fetch, config["repeat"] * 4, setup=move)
+            yield f"fetch_candles[{count}]", {"indicators": count, "limit": 100}, stats
+
+
+GROUPS = {
+    "calculate": bench_calculate,
+    "recalc": bench_recalc,
+    "get_data": bench_get_data,
+    "fetch": bench_fetch,
+}
+
+
+async def run(config, only=None):
+    """Запускает группы бенчмарков; {имя: {group, params, best, median, ...}}"""
+    results = {}
+    for group, bench in GROUPS.items():
+        if only and group not in only:
+            continue
+        async for name, params, stats in bench(config):
+            results[name] = {"group": group, "params": params, **stats}
+            print(f"{name:<36} {stats['best'] * 1e3:>10.3f} ms  "
+                  f"(median {stats['median'] * 1e3:.3f} ms, {stats['number']} x {stats['repeat']})")
+    return results
+
+
+def print_comparison(rows, regressions, threshold):
+    print(f"\n{'benchmark':<36} | {'baseline, ms':>12} | {'current, ms':>11} | {'ratio':>6}")
+    for name, old, new, ratio in rows:
+        mark = "  <-- regression" if name in regressions else ""
+        print(f"{name:<36} | {old * 1e3:>12.3f} | {new * 1e3:>11.3f} | {ratio:>5.2f}x{mark}")
+    if regressions:
+        print(f"\n{len(regressions)} benchmarks slower than {threshold}x baseline")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--quick", action="store_true", help="меньше размеров и повторов")
+    parser.add_argument("--only", nargs="+", choices=list(GROUPS), help="только эти группы")
+    parser.add_argument("--output", type=Path, help="файл результатов, по умолчанию results/<commit>.json")
+    parser.add_argument("--baseline", type=Path, help="результаты прошлого прогона для сравнения")
+    parser.add_argument("--threshold", type=float, default=1.25, help="замедление, которое считается регрессией")
+    args = parser.parse_args(argv)
+
+    config = QUICK if args.quick else FULL
+    results = asyncio.run(run(config, args.only))
+
+    output = args.output or RESULTS_DIR / f"{git_commit() or 'local'}{'-quick' if args.quick else ''}.json"
+    write_results(output, results, quick=args.quick, config=config)
+    print(f"\nResults written to {output}")
+
+    if args.baseline:
+        rows, regressions = compare(read_results(args.baseline), results, args.threshold)
+        print_comparison(rows, regressions, args.threshold)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
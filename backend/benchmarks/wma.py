@@ -0,0 +1,48 @@
+"""Сравнение векторной WMA с прежним rolling().apply()
+
+Запуск из каталога backend:
+    python -m benchmarks.wma
+"""
+import time
+
+import numpy as np
+import pandas as pd
+
+from utils.indicator_calculator import IndicatorsCalculator
+
+SIZES = [1_000, 100_000, 1_000_000]
+PERIOD = 14
+
+
+def legacy_wma(series, period):
+    """Прежняя реализация: Python-лямбда на каждое окно"""
+    weights = np.arange(1, period + 1)
+    return series.rolling(window=period).apply(lambda x: np.dot(x, weights) / weights.sum(), raw=True)
+
+
+def best_of(func, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    rng = np.random.default_rng(0)
+    print(f"{'candles':>10} | {'legacy, s':>10} | {'vectorized, s':>13} | {'speedup':>8}")
+
+    for size in SIZES:
+        series = pd.Series(50000 + np.cumsum(rng.normal(0, 25, size=size)))
+        # Старую реализацию на миллионе свечей гоняем один раз: это секунды
+        repeat = 3 if size < 1_000_000 else 1
+
+        legacy = best_of(lambda: legacy_wma(series, PERIOD), repeat)
+        vectorized = best_of(lambda: IndicatorsCalculator.calc_wma(series, PERIOD), 5)
+
+        print(f"{size:>10} | {legacy:>10.4f} | {vectorized:>13.4f} | {legacy / vectorized:>7.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,65 @@
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker, declarative_base
 
-from core.settings import get_database_url
+from core.logging import get_logger
+from core.settings import (
+    get_database_url,
+    get_db_max_overflow,
+    get_db_pool_pre_ping,
+    get_db_pool_recycle,
+    get_db_pool_size,
+    get_db_pool_timeout,
+)
+
+_logger = get_logger("Database")
+
+# Один движок и одна фабрика сессий на процесс
+_engine = None
+_session_local = None
+
+
+def _pool_options(url):
+    # У SQLite свой пул без размеров, настройки нужны только серверной БД
+    if url.get_backend_name() == "sqlite":
+        return {}
+    return {
+        "pool_size": get_db_pool_size(),
+        "max_overflow": get_db_max_overflow(),
+        "pool_recycle": get_db_pool_recycle(),
+        "pool_timeout": get_db_pool_timeout(),
+        "pool_pre_ping": get_db_pool_pre_ping(),
+    }
 
 
 def get_engine():
-    database_url = get_database_url()
-    print("DATABASE_URL: ", database_url)
-    if not database_url:
-        raise RuntimeError("DATABASE_URL not set")
-    return create_async_engine(database_url, echo=False)
+    global _engine
+    if _engine is None:
+        database_url = get_database_url()
+        if not database_url:
+            raise RuntimeError("DATABASE_URL not set")
+
+        url = make_url(database_url)
+        _logger.info(f"Creating database engine for {url.render_as_string(hide_password=True)}")
+        _engine = create_async_engine(url, echo=False, **_pool_options(url))
+    return _engine
 
 
 def get_session_local():
-    engine = get_engine()
-    return sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    global _session_local
+    if _session_local is None:
+        _session_local = sessionmaker(get_engine(), class_=AsyncSession, expire_on_commit=False)
+    return _session_local
+
+
+async def dispose_engine():
+    """Закрывает пул соединений при остановке приложения"""
+    global _engine, _session_local
+    if _engine is not None:
+        await _engine.dispose()
+        _engine = None
+        _session_local = None
+        _logger.info("Database engine disposed")
 
 
 Base = declarative_base()
@@ -0,0 +1,49 @@
+import asyncio
+import functools
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from core.logging import get_logger
+from core.settings import get_calc_executor, get_calc_workers
+
+_logger = get_logger("CalcExecutor")
+
+_executor = None
+
+
+def create_executor():
+    """Пул для расчёта индикаторов: потоки (по умолчанию) или процессы"""
+    kind = get_calc_executor()
+    workers = get_calc_workers()
+    if kind == "process":
+        executor = ProcessPoolExecutor(max_workers=workers)
+    elif kind == "thread":
+        executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="calc")
+    else:
+        raise ValueError(f"Unknown CALC_EXECUTOR {kind}, expected thread or process")
+    _logger.info(f"Calc executor created: {kind}, workers={workers}")
+    return executor
+
+
+def init_executor():
+    global _executor
+    _executor = create_executor()
+    return _executor
+
+
+def shutdown_executor():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+        _logger.info("Calc executor shut down")
+
+
+def get_executor():
+    """Пул приложения или None вне lifespan: тогда берётся пул цикла по умолчанию"""
+    return _executor
+
+
+async def run_cpu(fn, *args):
+    """Выполняет CPU-задачу вне event loop, чтобы не задерживать запросы"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, functools.partial(fn, *args))
@@ -0,0 +1,48 @@
+import importlib.util
+
+import httpx
+
+from core.logging import get_logger
+from core.settings import (
+    get_http2,
+    get_http_keepalive_expiry,
+    get_http_max_connections,
+    get_http_max_keepalive,
+    get_http_timeout,
+)
+
+_logger = get_logger("HttpClient")
+
+_client = None
+
+
+def create_http_client():
+    """Клиент с пулом keep-alive соединений к бирже"""
+    # HTTP/2 включается, только если установлен пакет h2
+    http2 = get_http2() and importlib.util.find_spec("h2") is not None
+    limits = httpx.Limits(
+        max_connections=get_http_max_connections(),
+        max_keepalive_connections=get_http_max_keepalive(),
+        keepalive_expiry=get_http_keepalive_expiry(),
+    )
+    _logger.info(f"HTTP client created: http2={http2}, max_connections={limits.max_connections}")
+    return httpx.AsyncClient(limits=limits, timeout=httpx.Timeout(get_http_timeout()), http2=http2)
+
+
+def init_http_client():
+    global _client
+    _client = create_http_client()
+    return _client
+
+
+async def close_http_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+        _logger.info("HTTP client closed")
+
+
+def get_http_client():
+    """Общий клиент приложения или None вне lifespan"""
+    return _client
@@ -0,0 +1,33 @@
+from sqlalchemy import inspect, text
+
+from core.logging import get_logger
+
+_logger = get_logger("Migrations")
+
+# create_all не меняет существующие таблицы: новые колонки добавляются здесь.
+# У каждой колонки есть DEFAULT, чтобы старые строки оставались валидными.
+COLUMNS = [
+    ("indicators", "symbol", "VARCHAR NOT NULL DEFAULT 'BTCUSDT'"),
+    ("indicators", "interval", "VARCHAR NOT NULL DEFAULT '1'"),
+    ("indicators", "sources", "JSON DEFAULT NULL"),
+]
+
+
+def _missing_columns(sync_conn):
+    inspector = inspect(sync_conn)
+    existing = {}
+    missing = []
+    for table, column, ddl in COLUMNS:
+        if table not in existing:
+            existing[table] = {c["name"] for c in inspector.get_columns(table)}
+        if column not in existing[table]:
+            missing.append((table, column, ddl))
+    return missing
+
+
+async def run_migrations(conn):
+    """Добавляет недостающие колонки в таблицы, созданные прежними версиями"""
+    missing = await conn.run_sync(_missing_columns)
+    for table, column, ddl in missing:
+        await conn.execute(text(f'ALTER TABLE {table} ADD COLUMN "{column}" {ddl}'))
+        _logger.info(f"Added column {table}.{column}")
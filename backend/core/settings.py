@@ -6,6 +6,8 @@ load_dotenv()
 
 
 def get_database_url():
+    if os.getenv("DATABASE_URL"):
+        return os.getenv("DATABASE_URL")
     user = os.getenv("POSTGRES_USER")
     password = os.getenv("POSTGRES_PASSWORD")
     db = os.getenv("POSTGRES_DB")
@@ -13,8 +15,147 @@ def get_database_url():
     return DATABASE_URL
 
 
+def get_db_pool_size():
+    return int(os.getenv("DB_POOL_SIZE", "5"))
+
+
+def get_db_max_overflow():
+    return int(os.getenv("DB_MAX_OVERFLOW", "10"))
+
+
+def get_db_pool_recycle():
+    return int(os.getenv("DB_POOL_RECYCLE", "1800"))
+
+
+def get_db_pool_timeout():
+    return float(os.getenv("DB_POOL_TIMEOUT", "30"))
+
+
+def get_db_pool_pre_ping():
+    return os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+
+
 def get_bybit_url():
-    return "https://api.bybit.com/v5/market/kline"
+    # Подменяется на локальную заглушку в нагрузочном тесте (benchmarks/load.py)
+    return os.getenv("BYBIT_URL", "https://api.bybit.com/v5/market/kline")
+
+
+def get_http_max_connections():
+    return int(os.getenv("HTTP_MAX_CONNECTIONS", "10"))
+
+
+def get_http_max_keepalive():
+    return int(os.getenv("HTTP_MAX_KEEPALIVE", "5"))
+
+
+def get_http_keepalive_expiry():
+    return float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+
+
+def get_http_timeout():
+    return float(os.getenv("HTTP_TIMEOUT", "10"))
+
+
+def get_http2():
+    return os.getenv("HTTP2", "true").lower() == "true"
+
+
+def get_market_symbols():
+    return [s.strip() for s in os.getenv("MARKET_SYMBOLS", "BTCUSDT").split(",") if s.strip()]
+
+
+def get_market_intervals():
+    return [i.strip() for i in os.getenv("MARKET_INTERVALS", "1").split(",") if i.strip()]
+
+
+def get_resample_intervals():
+    """Таймфреймы, которые собираются из минутных свечей вместо опроса биржи"""
+    return [i.strip() for i in os.getenv("RESAMPLE_INTERVALS", "5,15,60,240").split(",") if i.strip()]
+
+
+def get_fetch_concurrency():
+    return int(os.getenv("FETCH_CONCURRENCY", "4"))
+
+
+def get_backfill_candles():
+    """Глубина истории, которую догружает backfill, в свечах"""
+    return int(os.getenv("BACKFILL_CANDLES", str(get_candle_capacity())))
+
+
+def get_backfill_page_size():
+    return int(os.getenv("BACKFILL_PAGE_SIZE", "1000"))
+
+
+def get_backfill_concurrency():
+    return int(os.getenv("BACKFILL_CONCURRENCY", "4"))
+
+
+def get_backfill_retries():
+    """Сколько раз повторять страницу backfill после ошибки"""
+    return int(os.getenv("BACKFILL_RETRIES", "3"))
+
+
+def get_backfill_retry_delay():
+    """Пауза перед первым повтором страницы в секундах, дальше удваивается"""
+    return float(os.getenv("BACKFILL_RETRY_DELAY", "1"))
+
+
+def get_leader_lock_key():
+    """Ключ pg_advisory_lock, который держит реплика-лидер"""
+    return int(os.getenv("LEADER_LOCK_KEY", "80617"))
+
+
+def get_leader_retry_interval():
+    return float(os.getenv("LEADER_RETRY_INTERVAL", "5"))
+
+
+def get_bybit_rate_limit():
+    return float(os.getenv("BYBIT_RATE_LIMIT", "10"))
+
+
+def get_bybit_rate_burst():
+    return int(os.getenv("BYBIT_RATE_BURST", "5"))
+
+
+def get_candle_capacity():
+    return int(os.getenv("CANDLE_CAPACITY", "10000"))
+
+
+def get_calc_executor():
+    """thread или process: где считать индикаторы"""
+    return os.getenv("CALC_EXECUTOR", "thread").lower()
+
+
+def get_calc_workers():
+    return int(os.getenv("CALC_WORKERS", "2"))
+
+
+def get_calc_chunk_size():
+    """Сколько уникальных индикаторов считается одной задачей пула"""
+    return int(os.getenv("CALC_CHUNK_SIZE", "8"))
+
+
+def get_indicator_mode():
+    """eager - считать все индикаторы на каждом опросе, lazy - только просматриваемые"""
+    return os.getenv("INDICATOR_MODE", "eager").lower()
+
+
+def get_indicator_cache_bytes():
+    """Бюджет памяти LRU-кэша значений индикаторов в режиме lazy"""
+    return int(os.getenv("INDICATOR_CACHE_MB", "64")) * 1024 * 1024
+
+
+def get_data_window():
+    """Сколько последних свечей отдаёт /data без since"""
+    return int(os.getenv("DATA_WINDOW", "1000"))
+
+
+def get_stream_max_pending():
+    return int(os.getenv("STREAM_MAX_PENDING", "32"))
+
+
+def get_stream_send_timeout():
+    return float(os.getenv("STREAM_SEND_TIMEOUT", "5"))
 
 
 def get_app_name():
@@ -0,0 +1,22 @@
+from sqlalchemy import BigInteger, Column, Float, String
+
+from core.db import Base
+
+
+class CandleDB(Base):
+    """Свеча ряда (symbol, interval).
+
+    Первичный ключ (symbol, interval, timestamp) одновременно защищает от
+    дублей при upsert и служит индексом для чтения диапазонов ряда.
+    """
+    __tablename__ = "candles"
+
+    symbol = Column(String, primary_key=True)
+    interval = Column(String, primary_key=True)
+    timestamp = Column(BigInteger, primary_key=True)
+    open = Column(Float)
+    high = Column(Float)
+    low = Column(Float)
+    close = Column(Float)
+    volume = Column(Float)
+    turnover = Column(Float)
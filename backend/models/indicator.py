@@ -1,5 +1,6 @@
-from sqlalchemy import Column, String, Integer
+from sqlalchemy import JSON, Column, String, Integer
 from core.db import Base
+from utils.constants import DEFAULT_INTERVAL, DEFAULT_SYMBOL
 
 
 class IndicatorDB(Base):
@@ -10,4 +11,12 @@ class IndicatorDB(Base):
     type = Column(String, nullable=False)
     period = Column(Integer, nullable=False)
     color = Column(String, nullable=False, default="#000")
+    symbol = Column(String, nullable=False, default=DEFAULT_SYMBOL, server_default=DEFAULT_SYMBOL)
+    interval = Column(String, nullable=False, default=DEFAULT_INTERVAL, server_default=DEFAULT_INTERVAL)
+    # Входы из других индикаторов: {вход: {"id": id, "output": выход}}; NULL - только свечи
+    sources = Column(JSON, nullable=True)
 
+    @property
+    def series(self):
+        """Ключ ряда свечей, по которому считается индикатор"""
+        return self.symbol or DEFAULT_SYMBOL, self.interval or DEFAULT_INTERVAL
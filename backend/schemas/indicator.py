@@ -1,17 +1,30 @@
-from pydantic import BaseModel
-from utils.constants import Indicators
-from typing import Optional
+from pydantic import BaseModel, Field
+from utils.constants import Indicators, DEFAULT_INTERVAL, DEFAULT_SYMBOL
+from typing import Dict, Optional
+
+
+class IndicatorSource(BaseModel):
+    """Вход индикатора из выхода другого индикатора того же ряда"""
+    id: int
+    output: Optional[str] = None
 
 
 class IndicatorCreate(BaseModel):
     name: str
     type: Indicators
-    period: int
+    period: int = Field(gt=0)
     color: Optional[str] = None
+    symbol: str = DEFAULT_SYMBOL
+    interval: str = DEFAULT_INTERVAL
+    sources: Optional[Dict[str, IndicatorSource]] = None
 
 
 class IndicatorUpdate(BaseModel):
     name: Optional[str] = None
     type: Optional[Indicators] = None
-    period: Optional[int] = None
+    period: Optional[int] = Field(None, gt=0)
     color: Optional[str] = None
+    symbol: Optional[str] = None
+    interval: Optional[str] = None
+    # Пустой словарь убирает источники: индикатор снова считается по свечам
+    sources: Optional[Dict[str, IndicatorSource]] = None
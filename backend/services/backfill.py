@@ -0,0 +1,219 @@
+import asyncio
+import time
+
+import numpy as np
+
+from core.logging import get_logger
+from core.settings import (
+    get_backfill_candles,
+    get_backfill_concurrency,
+    get_backfill_page_size,
+    get_backfill_retries,
+    get_backfill_retry_delay,
+    get_candle_capacity,
+    get_leader_retry_interval,
+)
+from services.candle_storage import get_candle_storage, load_candles, load_latest, save_candles
+from services.candles import candle_loop, fetch_klines, polled_series, update_derived
+from services.indicators import recalc_all_indicators
+from services.leader import leader
+from services.stream import stream_hub
+from state.memory import get_store
+from utils.constants import BASE_INTERVAL, CANDLE_COLUMNS
+from utils.resampler import INTERVAL_MS
+
+_logger = get_logger("BackfillService")
+
+
+def missing_ranges(store, start, end, step):
+    """Диапазоны [start, end] timestamp, которых нет в хранилище.
+
+    Хранилище заполнено непрерывно, поэтому догружать нужно только то, что
+    старше первой свечи, и то, что новее последней: после рестарта загрузка
+    продолжается с последнего сохранённого timestamp.
+    """
+    if not len(store):
+        return [(start, end)]
+
+    timestamps = store.column("timestamp")
+    ranges = []
+    if start < timestamps[0]:
+        ranges.append((start, timestamps[0] - step))
+    if timestamps[-1] < end:
+        ranges.append((timestamps[-1] + step, end))
+    return [(lo, hi) for lo, hi in ranges if lo <= hi]
+
+
+def split_pages(ranges, step, page_size):
+    """Окна по page_size свечей, от новых к старым, как листает Bybit"""
+    pages = []
+    for start, end in ranges:
+        page_end = end
+        while page_end >= start:
+            page_start = max(start, page_end - (page_size - 1) * step)
+            pages.append((page_start, page_end))
+            page_end = page_start - step
+    return sorted(pages, reverse=True)
+
+
+def contiguous_results(pages, results, newest_first):
+    """Загруженные страницы одного диапазона, которые продолжают историю без дыр.
+
+    Страницы берутся со стороны, примыкающей к хранилищу, до первой
+    неудачной (None): недогруженное остаётся в missing_ranges и догрузится
+    следующим backfill.
+    """
+    ordered = sorted(zip(pages, results), reverse=newest_first)
+    usable = []
+    for _, rows in ordered:
+        if rows is None:
+            break
+        usable.append(rows)
+    return usable
+
+
+async def backfill(symbol, interval, depth=None, now_ms=None):
+    """Догружает историю ряда страницами и вливает её в хранилище без дублей.
+
+    Страницы запрашиваются параллельно, не больше BACKFILL_CONCURRENCY сразу,
+    через общий лимит запросов к Bybit. Возвращает число вставленных свечей.
+    """
+    if interval not in INTERVAL_MS:
+        _logger.warning(f"Backfill is not supported for interval {interval}")
+        return 0
+
+    step = INTERVAL_MS[interval]
+    depth = depth or get_backfill_candles()
+    now_ms = now_ms if now_ms is not None else time.time() * 1000
+    end = now_ms - now_ms % step
+    start = end - (depth - 1) * step
+
+    store = get_store(symbol, interval)
+    first = store.column("timestamp")[0] if len(store) else None
+    ranges = [
+        (split_pages([rng], step, get_backfill_page_size()), bool(first is None or rng[1] < first))
+        for rng in missing_ranges(store, start, end, step)
+    ]
+    pages = [page for range_pages, _ in ranges for page in range_pages]
+    if not pages:
+        return 0
+
+    semaphore = asyncio.Semaphore(get_backfill_concurrency())
+    retries = get_backfill_retries()
+
+    async def fetch_page(page_start, page_end):
+        # Повтор с экспоненциальной паузой; пауза вне семафора, слот отдаётся другим страницам
+        for attempt in range(retries + 1):
+            try:
+                async with semaphore:
+                    return await fetch_klines(
+                        symbol, interval, limit=get_backfill_page_size(), start=page_start, end=page_end
+                    )
+            except Exception as e:
+                if attempt == retries:
+                    _logger.error(f"Backfill page {symbol}/{interval} {page_start}-{page_end} failed: {e}")
+                    return None
+                _logger.warning(f"Backfill page {symbol}/{interval} {page_start}-{page_end} retry {attempt + 1}: {e}")
+                await asyncio.sleep(get_backfill_retry_delay() * 2 ** attempt)
+
+    results = await asyncio.gather(*(fetch_page(*page) for range_pages, _ in ranges for page in range_pages))
+    fetched = []
+    offset = 0
+    for range_pages, newest_first in ranges:
+        # Старшая история растёт от первой свечи назад, новая - от последней вперёд
+        fetched += contiguous_results(range_pages, results[offset:offset + len(range_pages)], newest_first)
+        offset += len(range_pages)
+    rows = np.concatenate([r for r in fetched if len(r)] or [np.empty((0, len(CANDLE_COLUMNS)))])
+
+    columns = dict(zip(CANDLE_COLUMNS, rows.T))
+    size = len(store)
+    changed = store.backfill(columns)
+    await save_candles(symbol, interval, columns)
+    inserted = len(store) - size
+    failed = sum(r is None for r in results)
+    _logger.info(f"Backfilled {symbol}/{interval}: {len(pages)} pages, {failed} failed, {inserted} new candles")
+    if changed is None:
+        return 0
+
+    # История вставлена в середину ряда: индикаторы и подписчики начинают заново
+    await leader.notify(symbol, interval, full=True)
+    await recalc_all_indicators(symbol, interval)
+    stream_hub.publish_since(None, symbol, interval)
+    if interval == BASE_INTERVAL:
+        await update_derived(symbol)
+    return inserted
+
+
+async def warm_from_db():
+    """Заполняет хранилища опрашиваемых рядов из БД одним запросом.
+
+    Вызывается при старте до первого опроса биржи: backfill после этого
+    догружает только то, что появилось, пока приложение не работало.
+    """
+    session_local = get_candle_storage()
+    if session_local is None:
+        return
+
+    loaded = await load_latest(session_local, polled_series(), get_candle_capacity())
+    for (symbol, interval), columns in loaded.items():
+        get_store(symbol, interval).backfill(columns)
+        await recalc_all_indicators(symbol, interval)
+        if interval == BASE_INTERVAL:
+            await update_derived(symbol)
+    _logger.info(f"Warmed {len(loaded)} series from database")
+
+
+async def sync_from_db(symbol, interval, full=False):
+    """Реплика-последователь дочитывает свечи ряда, записанные лидером.
+
+    Читается всё, что не старше своей последней свечи, поэтому пропущенные
+    уведомления не оставляют дыр. full перечитывает последнее окно целиком.
+    symbol=None догоняет все опрашиваемые ряды.
+    """
+    if symbol is None:
+        for key in polled_series():
+            await sync_from_db(*key)
+        return
+
+    session_local = get_candle_storage()
+    if session_local is None:
+        return
+
+    store = get_store(symbol, interval)
+    since = None if full else store.last_timestamp()
+    if since is None:
+        loaded = await load_latest(session_local, [(symbol, interval)], get_candle_capacity())
+        changed = store.backfill(loaded[symbol, interval]) if loaded else None
+        start = None
+    else:
+        changed = store.merge(await load_candles(session_local, symbol, interval, start=since))
+        start = changed
+    if changed is None:
+        return
+
+    await recalc_all_indicators(symbol, interval, start)
+    stream_hub.publish_since(since if start else None, symbol, interval)
+    if interval == BASE_INTERVAL:
+        await update_derived(symbol, since if start else None)
+
+
+async def backfill_all(now_ms=None):
+    """Догружает историю всех опрашиваемых рядов по очереди"""
+    for symbol, interval in polled_series():
+        try:
+            await backfill(symbol, interval, now_ms=now_ms)
+        except Exception as e:
+            _logger.error(f"Backfill error {symbol}/{interval}: {e}")
+
+
+async def ingest_loop():
+    """Биржу опрашивает только лидер: сначала история, потом последние свечи.
+
+    Остальные реплики раз в LEADER_RETRY_INTERVAL пробуют взять блокировку,
+    а до тех пор получают свечи через sync_from_db.
+    """
+    while True:
+        if await leader.acquire():
+            await backfill_all()
+            await candle_loop(lambda: leader.is_leader)
+        await asyncio.sleep(get_leader_retry_interval())
@@ -0,0 +1,127 @@
+import numpy as np
+from sqlalchemy import func, select, tuple_
+from sqlalchemy.dialects import postgresql, sqlite
+
+from core.logging import get_logger
+from models.candle import CandleDB
+from utils.constants import CANDLE_COLUMNS
+
+_logger = get_logger("CandleStorage")
+
+_INSERTS = {
+    "postgresql": postgresql.insert,
+    "sqlite": sqlite.insert,
+}
+
+# Фабрика сессий задаётся в lifespan; вне приложения свечи в БД не пишутся
+_session_local = None
+
+
+def init_candle_storage(session_local):
+    global _session_local
+    _session_local = session_local
+
+
+def close_candle_storage():
+    global _session_local
+    _session_local = None
+
+
+def get_candle_storage():
+    return _session_local
+
+
+def upsert_statement(dialect_name):
+    """INSERT ... ON CONFLICT (symbol, interval, timestamp) DO UPDATE"""
+    insert = _INSERTS.get(dialect_name)
+    if insert is None:
+        raise ValueError(f"Candle upsert is not supported for {dialect_name}")
+    stmt = insert(CandleDB)
+    return stmt.on_conflict_do_update(
+        index_elements=[CandleDB.symbol, CandleDB.interval, CandleDB.timestamp],
+        set_={name: stmt.excluded[name] for name in CANDLE_COLUMNS[1:]},
+    )
+
+
+def _rows(symbol, interval, columns):
+    values = [np.asarray(columns[name], dtype=np.float64).tolist() for name in CANDLE_COLUMNS]
+    return [
+        {"symbol": symbol, "interval": interval, "timestamp": int(row[0]),
+         **dict(zip(CANDLE_COLUMNS[1:], row[1:]))}
+        for row in zip(*values)
+    ]
+
+
+def _columns(rows):
+    """Строки (timestamp, open, ...) из БД в колонки для CandleStore"""
+    data = np.array(rows, dtype=np.float64).reshape(-1, len(CANDLE_COLUMNS))
+    return dict(zip(CANDLE_COLUMNS, data.T))
+
+
+async def save_candles(symbol, interval, columns, session_local=None):
+    """Пакетный upsert свечей ряда одним executemany.
+
+    Закрытые свечи перезаписываются теми же значениями, открытая обновляется.
+    Ошибка БД не останавливает опрос биржи: свечи останутся в памяти и
+    попадут в БД со следующей записью. Возвращает число записанных строк.
+    """
+    session_local = session_local or _session_local
+    if session_local is None:
+        return 0
+    rows = _rows(symbol, interval, columns)
+    if not rows:
+        return 0
+
+    try:
+        async with session_local() as session:
+            stmt = upsert_statement(session.get_bind().dialect.name)
+            await session.execute(stmt, rows)
+            await session.commit()
+    except Exception as e:
+        _logger.error(f"Failed to save {len(rows)} candles {symbol}/{interval}: {e}")
+        return 0
+    return len(rows)
+
+
+async def load_candles(session_local, symbol, interval, start=None, end=None):
+    """Диапазон свечей ряда по первичному ключу, по возрастанию timestamp"""
+    stmt = select(*(getattr(CandleDB, name) for name in CANDLE_COLUMNS)).where(
+        CandleDB.symbol == symbol, CandleDB.interval == interval
+    )
+    if start is not None:
+        stmt = stmt.where(CandleDB.timestamp >= start)
+    if end is not None:
+        stmt = stmt.where(CandleDB.timestamp <= end)
+
+    async with session_local() as session:
+        result = await session.execute(stmt.order_by(CandleDB.timestamp))
+        return _columns(result.all())
+
+
+async def load_latest(session_local, series, limit):
+    """Последние limit свечей каждого ряда одним запросом.
+
+    Возвращает {(symbol, interval): колонки}; рядов без свечей в ответе нет.
+    """
+    if not series:
+        return {}
+
+    rank = func.row_number().over(
+        partition_by=(CandleDB.symbol, CandleDB.interval),
+        order_by=CandleDB.timestamp.desc(),
+    ).label("rank")
+    ranked = select(CandleDB, rank).where(
+        tuple_(CandleDB.symbol, CandleDB.interval).in_(list(series))
+    ).subquery()
+    stmt = select(
+        ranked.c.symbol, ranked.c.interval, *(ranked.c[name] for name in CANDLE_COLUMNS)
+    ).where(ranked.c.rank <= limit).order_by(ranked.c.symbol, ranked.c.interval, ranked.c.timestamp)
+
+    async with session_local() as session:
+        result = await session.execute(stmt)
+        rows = result.all()
+
+    grouped = {}
+    for row in rows:
+        grouped.setdefault((row[0], row[1]), []).append(row[2:])
+    return {key: _columns(values) for key, values in grouped.items()}
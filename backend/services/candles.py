@@ -1,48 +1,148 @@
 import asyncio
+import itertools
 
 import httpx
-import pandas as pd
+import numpy as np
 
+from core.http import get_http_client
 from core.logging import get_logger
-from core.settings import get_bybit_url
+from core.settings import (
+    get_bybit_rate_burst,
+    get_bybit_rate_limit,
+    get_bybit_url,
+    get_fetch_concurrency,
+    get_market_intervals,
+    get_market_symbols,
+    get_resample_intervals,
+)
+from services.candle_storage import save_candles
 from services.indicators import recalc_all_indicators
-from state.memory import candles
+from services.leader import leader
+from services.stream import stream_hub
+from state.memory import get_store
+from utils.constants import BASE_INTERVAL, CANDLE_COLUMNS, DEFAULT_INTERVAL, DEFAULT_SYMBOL
+from utils.rate_limiter import AsyncRateLimiter
+from utils.resampler import can_resample, resample_into
 
 _logger = get_logger("CandlesService")
 
+# Один лимит на все запросы к Bybit из процесса
+bybit_limiter = AsyncRateLimiter(get_bybit_rate_limit(), get_bybit_rate_burst())
 
-async def fetch_candles():
-    _logger.debug(f"Starting catch candles")
 
+class BybitError(RuntimeError):
+    """Bybit ответил ошибкой: ненулевой retCode в теле ответа"""
+
+
+def polled_series():
+    """Ряды (symbol, interval), которые опрашиваются у биржи"""
+    return list(itertools.product(get_market_symbols(), get_market_intervals()))
+
+
+def derived_intervals():
+    """Таймфреймы, которые собираются из минутных свечей, а не опрашиваются"""
+    polled = get_market_intervals()
+    if BASE_INTERVAL not in polled:
+        return []
+    return [i for i in get_resample_intervals() if i not in polled and can_resample(i)]
+
+
+def tracked_series():
+    """Все ряды, которые отдаёт API: опрашиваемые и собранные из минутных"""
+    derived = itertools.product(get_market_symbols(), derived_intervals())
+    return polled_series() + list(derived)
+
+
+def is_tracked(symbol, interval):
+    return (symbol, interval) in tracked_series()
+
+
+async def fetch_klines(symbol, interval, limit, start=None, end=None):
+    """Один запрос к Bybit /v5/market/kline: массив (n, 7) по возрастанию timestamp"""
     params = {
         "category": "linear",
-        "symbol": "BTCUSDT",
-        "interval": "1",
-        "limit": 100
+        "symbol": symbol,
+        "interval": interval,
+        "limit": limit
     }
+    if start is not None:
+        params["start"] = int(start)
+    if end is not None:
+        params["end"] = int(end)
 
-    async with httpx.AsyncClient() as client:
+    await bybit_limiter.acquire()
+    client = get_http_client()
+    if client is not None:
         r = await client.get(get_bybit_url(), params=params)
-        data = r.json()
+    else:
+        # Вне жизненного цикла приложения пула нет: одноразовый клиент
+        async with httpx.AsyncClient() as client:
+            r = await client.get(get_bybit_url(), params=params)
+    r.raise_for_status()
+    data = r.json()
+    # Ошибки Bybit приходят с HTTP 200: причина в retCode и retMsg
+    if data.get("retCode", 0) != 0:
+        raise BybitError(f"Bybit kline {symbol}/{interval} failed: retCode {data['retCode']} {data.get('retMsg', '')}")
 
     raw = data["result"]["list"]
 
-    df = pd.DataFrame(raw, columns=[
-        "timestamp", "open", "high", "low", "close", "volume", "turnover"
-    ])
+    rows = np.array(raw, dtype=np.float64).reshape(-1, len(CANDLE_COLUMNS))
+    return rows[np.argsort(rows[:, 0], kind="stable")]
+
+
+async def fetch_candles(symbol=DEFAULT_SYMBOL, interval=DEFAULT_INTERVAL):
+    _logger.debug(f"Starting catch candles {symbol}/{interval}")
+
+    rows = await fetch_klines(symbol, interval, limit=100)
+    store = get_store(symbol, interval)
+    changed = store.merge(dict(zip(CANDLE_COLUMNS, rows.T)))
+
+    _logger.debug(f"Finish catch candles {symbol}/{interval}, catched {len(rows)} candles, changed from {changed}")
+    if changed is None:
+        return None
+    await save_candles(symbol, interval, {name: store.column(name)[changed:] for name in CANDLE_COLUMNS})
+    await recalc_all_indicators(symbol, interval, changed)
+    return changed
+
+
+async def fetch_all_candles():
+    """Опрашивает все ряды параллельно, не больше FETCH_CONCURRENCY одновременно"""
+    semaphore = asyncio.Semaphore(get_fetch_concurrency())
+
+    async def fetch_one(symbol, interval):
+        async with semaphore:
+            since = get_store(symbol, interval).last_timestamp()
+            try:
+                changed = await fetch_candles(symbol, interval)
+            except Exception as e:
+                _logger.error(f"Fetch error {symbol}/{interval}: {e}")
+                return
+            if changed is None:
+                return
+            await leader.notify(symbol, interval)
+            stream_hub.publish_since(since, symbol, interval)
+            if interval == BASE_INTERVAL:
+                await update_derived(symbol, since)
+
+    await asyncio.gather(*(fetch_one(symbol, interval) for symbol, interval in polled_series()))
 
-    df = df.astype(float).sort_values("timestamp")
-    candles.clear()
-    candles.extend(df.to_dict(orient="records"))
 
-    _logger.debug(f"Finish catch candles, catched {len(df)} candles")
-    await recalc_all_indicators()
+async def update_derived(symbol, since=None):
+    """Обновляет старшие таймфреймы symbol по минутным свечам, изменившимся с since"""
+    base = get_store(symbol, BASE_INTERVAL)
+    for interval in derived_intervals():
+        store = get_store(symbol, interval)
+        changed = resample_into(base, store, interval, since)
+        start = None if changed is None else store.index_from(changed)
+        await recalc_all_indicators(symbol, interval, start)
+        stream_hub.publish_since(changed, symbol, interval)
 
 
-async def candle_loop():
-    while True:
+async def candle_loop(is_active=None):
+    """Опрос биржи каждые 10 секунд, пока is_active() не вернёт False"""
+    while is_active is None or is_active():
         try:
-            await fetch_candles()
+            await fetch_all_candles()
         except Exception as e:
             print("fetch error", e)
         await asyncio.sleep(10)
@@ -0,0 +1,161 @@
+import asyncio
+import hashlib
+from dataclasses import dataclass
+
+import numpy as np
+from prometheus_client import Counter
+
+from core.logging import get_logger
+from core.settings import get_data_window
+from services.indicator_cache import indicator_cache
+from state.memory import get_store
+from utils.columnar import ROWS
+from utils.constants import CANDLE_COLUMNS, DEFAULT_SERIES
+from utils.serialization import dumps
+
+_logger = get_logger("DataCache")
+
+data_cache_hits_total = Counter(
+    'data_cache_hits_total',
+    'Responses of /data served from the cached payload'
+)
+
+data_cache_misses_total = Counter(
+    'data_cache_misses_total',
+    'Responses of /data that had to rebuild the payload'
+)
+
+
+@dataclass(frozen=True)
+class CachedPayload:
+    body: bytes
+    etag: str
+    version: tuple = ()
+
+
+class DataCache:
+    """Готовый сериализованный ответ /data.
+
+    Локальная версия складывается из версии хранилища свечей и собственного
+    счётчика, который увеличивается при пересчёте индикаторов и изменении их
+    списка. Пока она не сменилась, ответ отдаётся из памяти без сборки.
+    Ответ хранится отдельно для каждого формата (utils.columnar).
+
+    ETag от локальных счётчиков не зависит: он строится по данным, которые
+    одинаковы на всех репликах (последняя свеча, начало окна /data, версия
+    определений индикаторов), поэтому 304 работает за балансировщиком.
+    """
+
+    def __init__(self, store, definitions=None):
+        self._store = store
+        # Версия определений индикаторов; по умолчанию из общего кэша
+        self._definitions = definitions or indicator_cache.fingerprint
+        self._version = 0
+        self._state = None
+        self._payloads = {}
+        self._lock = asyncio.Lock()
+
+    def invalidate(self):
+        self._version += 1
+
+    def etag(self, fmt=ROWS):
+        # У каждого формата свой ETag: это разные представления одних данных
+        suffix = "" if fmt == ROWS else f"-{fmt}"
+        return f'"{self._content_version()}{suffix}"'
+
+    def _content_version(self):
+        definitions = self._definitions()
+        key = (self._store.version, definitions)
+        if self._state is None or self._state[0] != key:
+            self._state = (key, content_version(self._store, definitions))
+        return self._state[1]
+
+    def not_modified(self, if_none_match, fmt=ROWS):
+        """Проверяет If-None-Match по текущей версии, ничего не собирая"""
+        if not if_none_match:
+            return False
+
+        etag = self.etag(fmt)
+        for candidate in if_none_match.split(","):
+            candidate = candidate.strip()
+            # Для If-None-Match сравнение слабое: префикс W/ не учитывается
+            if candidate.startswith("W/"):
+                candidate = candidate[2:]
+            if candidate in ("*", etag):
+                data_cache_hits_total.inc()
+                return True
+        return False
+
+    async def get(self, build, fmt=ROWS, encode=None):
+        """Возвращает закэшированный ответ или собирает его через build().
+
+        encode превращает результат build() в байты, по умолчанию это JSON.
+        """
+        payload = self._payloads.get(fmt)
+        if payload is not None and self._is_current(payload, fmt):
+            data_cache_hits_total.inc()
+            return payload
+
+        async with self._lock:
+            # Пока ждали блокировку, ответ мог собрать другой запрос
+            payload = self._payloads.get(fmt)
+            if payload is not None and self._is_current(payload, fmt):
+                data_cache_hits_total.inc()
+                return payload
+            etag = self.etag(fmt)
+            version = self._local_version()
+
+            data_cache_misses_total.inc()
+            # ETag берётся до сборки: если данные поменяются во время неё,
+            # следующий запрос увидит другую версию и соберёт ответ заново
+            body = (encode or dumps)(await build())
+            self._payloads[fmt] = CachedPayload(body=body, etag=etag, version=version)
+            _logger.debug(f"Data payload rebuilt: {len(body)} bytes, format {fmt}, etag {etag}")
+            return self._payloads[fmt]
+
+    def _local_version(self):
+        return self._store.version, self._version
+
+    def _is_current(self, payload, fmt):
+        return payload.version == self._local_version() and payload.etag == self.etag(fmt)
+
+
+def content_version(store, definitions):
+    """Версия содержимого /data ряда, одинаковая на всех репликах.
+
+    Закрытые свечи не меняются, поэтому хватает timestamp и значений
+    последней (открытой) свечи, начала окна /data и версии определений
+    индикаторов: значения индикаторов - функция свечей и определений.
+    """
+    size = len(store)
+    if not size:
+        return f"0-{definitions}"
+
+    timestamps = store.column("timestamp")
+    window = size - max(0, size - get_data_window())
+    state = np.array(
+        [timestamps[size - window], window] + [store.column(name)[-1] for name in CANDLE_COLUMNS],
+        dtype=np.float64,
+    )
+    digest = hashlib.blake2b(state.tobytes() + definitions.encode(), digest_size=8).hexdigest()
+    return f"{int(timestamps[-1])}-{digest}"
+
+
+_caches = {}
+
+
+def get_data_cache(symbol, interval):
+    """Кэш ответа /data для ряда (symbol, interval)"""
+    key = (symbol, interval)
+    if key not in _caches:
+        _caches[key] = DataCache(get_store(symbol, interval))
+    return _caches[key]
+
+
+def invalidate_all():
+    """Сбрасывает ответы всех рядов, например после изменения индикаторов"""
+    for cache in _caches.values():
+        cache.invalidate()
+
+
+data_cache = get_data_cache(*DEFAULT_SERIES)
@@ -0,0 +1,129 @@
+import asyncio
+import hashlib
+import json
+import uuid
+
+import asyncpg
+from sqlalchemy import select, text
+from sqlalchemy.engine import make_url
+
+from core.logging import get_logger
+from models.indicator import IndicatorDB
+
+_logger = get_logger("IndicatorCache")
+
+NOTIFY_CHANNEL = "indicators_changed"
+
+
+class IndicatorCache:
+    """Write-through кэш определений индикаторов.
+
+    Загружается при старте, дальше обработчики CRUD обновляют его сами.
+    Другие реплики узнают об изменениях через Postgres NOTIFY и
+    перечитывают список целиком.
+    """
+
+    def __init__(self):
+        self._items = {}
+        self._fingerprint = None
+        self.loaded = False
+        # Отличает свои уведомления от уведомлений других реплик
+        self._token = uuid.uuid4().hex
+        self._listener = None
+        self._on_change = None
+        # Запущенные перезагрузки: цикл событий держит на задачи только слабые ссылки
+        self._tasks = set()
+
+    async def load(self, get_session_local):
+        session_local = get_session_local()
+        async with session_local() as session:
+            result = await session.execute(select(IndicatorDB))
+            inds = result.scalars().all()
+
+        self._items = {ind.id: ind for ind in inds}
+        self._fingerprint = None
+        self.loaded = True
+        _logger.debug(f"Loaded {len(self._items)} indicator definitions")
+
+    async def all(self, get_session_local):
+        """Все определения; в БД идёт только первый вызов после сброса"""
+        # Если соединение LISTEN потеряно, изменения других реплик не придут:
+        # тогда честно читаем БД на каждый вызов
+        listener_lost = self._on_change is not None and self._listener is None
+        if not self.loaded or listener_lost:
+            await self.load(get_session_local)
+        return list(self._items.values())
+
+    def cached(self):
+        """Определения, которые уже в памяти, без обращения к БД"""
+        return list(self._items.values())
+
+    def put(self, ind):
+        self._items[ind.id] = ind
+        self._fingerprint = None
+
+    def remove(self, ind_id):
+        self._items.pop(ind_id, None)
+        self._fingerprint = None
+
+    def clear(self):
+        self._items = {}
+        self._fingerprint = None
+        self.loaded = False
+
+    def fingerprint(self):
+        """Версия определений по их содержимому: совпадает на всех репликах"""
+        if self._fingerprint is None:
+            items = sorted(
+                (ind.id, ind.name, getattr(ind.type, "value", ind.type), ind.period, ind.color, ind.series,
+                 json.dumps(ind.sources, sort_keys=True))
+                for ind in self._items.values()
+            )
+            self._fingerprint = hashlib.blake2b(repr(items).encode(), digest_size=8).hexdigest()
+        return self._fingerprint
+
+    async def notify(self, session):
+        """Сообщает другим репликам об изменении; уходит вместе с коммитом"""
+        if session.bind.dialect.name != "postgresql":
+            return
+        await session.execute(
+            text("SELECT pg_notify(:channel, :payload)"),
+            {"channel": NOTIFY_CHANNEL, "payload": self._token},
+        )
+
+    async def listen(self, database_url, on_change):
+        """Подписка на изменения от других реплик через LISTEN"""
+        url = make_url(database_url)
+        if url.get_backend_name() != "postgresql":
+            return
+
+        self._on_change = on_change
+        dsn = url.set(drivername="postgresql").render_as_string(hide_password=False)
+        self._listener = await asyncpg.connect(dsn)
+        self._listener.add_termination_listener(self._on_terminate)
+        await self._listener.add_listener(NOTIFY_CHANNEL, self._on_notify)
+        _logger.info(f"Listening for {NOTIFY_CHANNEL} notifications")
+
+    async def close(self):
+        self._on_change = None
+        listener, self._listener = self._listener, None
+        if listener is not None:
+            await listener.close()
+
+    def _on_notify(self, connection, pid, channel, payload):
+        if payload == self._token:
+            return
+        _logger.info("Indicator definitions changed on another replica, reloading")
+        self.loaded = False
+        task = asyncio.get_running_loop().create_task(self._on_change())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def _on_terminate(self, connection):
+        if self._listener is None:
+            return
+        _logger.warning("Indicator notification connection lost, falling back to database reads")
+        self._listener = None
+
+
+indicator_cache = IndicatorCache()
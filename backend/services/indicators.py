@@ -1,37 +1,403 @@
-import math
+import asyncio
+from itertools import repeat
 
-import pandas as pd
-from sqlalchemy import select
+import numpy as np
+from prometheus_client import Counter
 
 from core.db import get_session_local
+from core.executor import run_cpu
+from core.logging import get_logger
+from core.settings import get_calc_chunk_size, get_indicator_cache_bytes, get_indicator_mode
 from models.indicator import IndicatorDB
-from state.memory import candles, indicator_values
+from services.data_cache import get_data_cache
+from services.indicator_cache import indicator_cache
+from state.memory import get_store, indicator_series, indicator_streams, indicator_values, watched_series
+from utils.constants import DEFAULT_SERIES, DEFAULT_INTERVAL, DEFAULT_SYMBOL
+from utils.budget_cache import BudgetLruCache
+from utils.columnar import align, align_end, nullable
 from utils.indicator_calculator import IndicatorsCalculator
+from utils.indicator_graph import IndicatorGraph, first_valid, node_inputs
+from utils.indicator_registry import get_definition
+from utils.indicator_stream import IndicatorStream
+
+indicator_lazy_hits_total = Counter(
+    'indicator_lazy_hits_total',
+    'Indicator series served from the lazy LRU cache'
+)
+
+indicator_lazy_misses_total = Counter(
+    'indicator_lazy_misses_total',
+    'Indicator series computed on demand in lazy mode'
+)
+
+# Значения индикаторов режима lazy: (ряд, хранилище, версия, type, period) -> np.ndarray
+lazy_cache = BudgetLruCache(get_indicator_cache_bytes())
+
+_logger = get_logger("IndicatorsService")
 
 
 def clean(values):
-    return [
-        None if (v is None or not math.isfinite(v)) else float(v)
-        for v in values
-    ]
+    """NaN, бесконечности и None -> None одной векторной маской"""
+    return nullable(values)
+
+
+def as_values(values):
+    """Значения индикатора хранятся как float64, пропуски - NaN"""
+    return np.asarray(values, dtype=np.float64)
+
+
+def is_lazy(key):
+    """Считать ли индикаторы ряда только по запросу"""
+    return get_indicator_mode() == "lazy" and key not in watched_series
+
+
+def candle_rows(start=0, symbol=DEFAULT_SYMBOL, interval=DEFAULT_INTERVAL, values=None):
+    """Свечи ряда начиная с индекса start вместе со значениями его индикаторов.
+
+    values - {id: ряд значений}; по умолчанию берутся посчитанные на опросе.
+    """
+    values = _series_values(symbol, interval, values)
+    cleaned = {ind_id: clean(series_values[start:]) for ind_id, series_values in values.items()}
+
+    rows = get_store(symbol, interval).to_records(start)
+    if all(len(values) >= len(rows) for values in cleaned.values()):
+        # Обычный случай: индикаторы посчитаны на всю историю, строки собираются через zip
+        ids = list(cleaned)
+        for row, values in zip(rows, zip(*cleaned.values()) if ids else repeat(())):
+            row["indicators"] = dict(zip(ids, values))
+        return rows
+
+    for offset, row in enumerate(rows):
+        row["indicators"] = {
+            ind_id: values[offset]
+            for ind_id, values in cleaned.items()
+            if offset < len(values)
+        }
+    return rows
+
+
+def candle_columns(start=0, symbol=DEFAULT_SYMBOL, interval=DEFAULT_INTERVAL, values=None):
+    """То же, что candle_rows, колонками: ({колонка: массив}, {id: массив}).
+
+    Колонки свечей - копии срезов хранилища, индикаторы выровнены по ним
+    и дополнены NaN, если посчитаны не до конца.
+    """
+    store = get_store(symbol, interval)
+    columns = {name: np.array(column[start:]) for name, column in store.columns().items()}
+    size = len(columns["timestamp"])
+    indicators = {
+        ind_id: align(series_values[start:], size)
+        for ind_id, series_values in _series_values(symbol, interval, values).items()
+    }
+    return columns, indicators
+
+
+def _series_values(symbol, interval, values):
+    # Без values берутся значения, посчитанные на опросе
+    if values is not None:
+        return values
+    key = (symbol, interval)
+    return {
+        ind_id: series_values
+        for ind_id, series_values in indicator_values.items()
+        if indicator_series.get(ind_id, DEFAULT_SERIES) == key
+    }
 
 
 async def recalc_indicator(ind: IndicatorDB):
-    if not candles:
-        indicator_values[ind.id] = []
+    """Пересчитывает индикатор и всё, что считается через него.
+
+    Источники индикатора считаются вместе с ним: одинаковые выражения - один
+    раз. Определения остальных индикаторов ряда берутся из кэша без БД.
+    """
+    # Меняются значения только этого ряда; смену определений сбрасывают маршруты
+    get_data_cache(*ind.series).invalidate()
+    indicator_series[ind.id] = ind.series
+    store = get_store(*ind.series)
+    if is_lazy(ind.series):
+        # Посчитается, когда ряд запросят
+        indicator_values.pop(ind.id, None)
+        return
+    if not store:
+        indicator_values[ind.id] = as_values([])
         return
 
-    df = pd.DataFrame(candles)
-    period = ind.period or 14
-    values = IndicatorsCalculator.calculate(ind.type, df["close"], period)
-    indicator_values[ind.id] = values
+    group = {i.id: i for i in indicator_cache.cached() if i.series == ind.series}
+    group[ind.id] = ind
+    graph = IndicatorGraph(group.values())
+    ids = graph.dependents(ind.id)
+    nodes = [graph.nodes[ind_id] for ind_id in ids if ind_id in graph.nodes]
+    _assign(graph, ids, await evaluate_batch(graph, store.columns(), nodes))
+
+
+def input_columns(columns, ind_types):
+    """Копии колонок свечей, нужных индикаторам ind_types (см. реестр).
+
+    columns - {колонка: массив} или массив close. Копируются только нужные
+    колонки: буфер хранилища может измениться, пока пул считает.
+    """
+    if not isinstance(columns, dict):
+        columns = {"close": columns}
+    needed = {"close"}
+    for ind_type in ind_types:
+        definition = get_definition(ind_type)
+        if definition is not None:
+            needed.update(definition.inputs)
+    return {name: np.array(columns[name], dtype=np.float64) for name in needed if name in columns}
+
+
+async def calculate_batch(columns, specs):
+    """IndicatorsCalculator.calculate_batch в пуле, по CALC_CHUNK_SIZE спецификаций.
+
+    Каждый чанк отдельная задача пула: чанки считаются параллельно, а event
+    loop между ними продолжает обслуживать запросы.
+    """
+    columns = input_columns(columns, [ind_type for ind_type, _ in specs])
+    keys = [IndicatorsCalculator.spec_key(ind_type, period) for ind_type, period in specs]
+    unique = list(dict.fromkeys(keys))
+    size = get_calc_chunk_size()
+    chunks = [unique[i:i + size] for i in range(0, len(unique), size)]
+
+    results = await asyncio.gather(
+        *(run_cpu(IndicatorsCalculator.calculate_batch, columns, chunk) for chunk in chunks)
+    )
+    by_key = {
+        key: values
+        for chunk, chunk_values in zip(chunks, results)
+        for key, values in zip(chunk, chunk_values)
+    }
+    return [by_key[key] for key in keys]
+
+
+async def evaluate_batch(graph, columns, nodes, known=None):
+    """Значения узлов nodes и их источников пакетным расчётом, по уровням графа.
+
+    known - уже посчитанные узлы {узел: значения}, они не пересчитываются.
+    Узлы по свечам уровня идут одним calculate_batch, производные - группами
+    с одинаковыми входами.
+    """
+    values = dict(known or {})
+    size = len(columns["timestamp"])
+    pending = [node for node in graph.closure(nodes) if node not in values]
+    for level in graph.levels(pending):
+        groups = {}
+        for node in level:
+            groups.setdefault(node.bindings if node.derived else None, []).append(node)
+        results = await asyncio.gather(
+            *(_evaluate_group(group, columns, values, size) for group in groups.values())
+        )
+        for group, group_values in zip(groups.values(), results):
+            values.update(zip(group, group_values))
+    return values
+
 
+async def _evaluate_group(nodes, columns, values, size):
+    specs = [(node.type, node.period) for node in nodes]
+    if not nodes[0].derived:
+        return [as_values(v) for v in await calculate_batch(columns, specs)]
 
-async def recalc_all_indicators():
-    session_local = get_session_local()
-    async with session_local() as session:
-        result = await session.execute(select(IndicatorDB))
-        inds = result.scalars().all()
+    data = node_inputs(nodes[0], columns, values)
+    if any(len(v) != size for v in data.values()):
+        # Источник не посчитался
+        return [as_values([]) for _ in nodes]
+    # Прогрев источника отрезается: иначе NaN попадёт в окно и сглаживание
+    first = first_valid(data)
+    results = await calculate_batch({name: v[first:] for name, v in data.items()}, specs)
+    return [align_end(v, size) if len(v) else as_values(v) for v in results]
 
+
+def _assign(graph, ids, values):
+    for ind_id in ids:
+        node = graph.nodes.get(ind_id)
+        if node is None:
+            _logger.warning(f"Indicator {ind_id} is not calculated: {graph.errors.get(ind_id)}")
+            indicator_values[ind_id] = as_values([])
+        else:
+            indicator_values[ind_id] = values.get(node, as_values([]))
+
+
+def _prune_streams(key, keep=()):
+    # Потоки узлов, которых больше нет в графе ряда
+    keep = set(keep)
+    for stream_key in [k for k in indicator_streams if k[0] == key and k[1] not in keep]:
+        del indicator_streams[stream_key]
+
+
+async def recalc_all_indicators(symbol=None, interval=None, start=None):
+    """Пересчитывает индикаторы ряда (symbol, interval) или всех рядов.
+
+    start - индекс первой изменившейся свечи ряда (см. CandleStore.merge).
+    Индикаторы ряда - граф (utils/indicator_graph.py): узлы считаются в
+    топологическом порядке, одинаковые выражения один раз. С start узлы только
+    дописывают новые закрытые свечи в поток и пересчитывают открытую, без
+    start всё считается целиком.
+    """
+    inds = await indicator_cache.all(get_session_local)
+    if symbol is not None:
+        inds = [ind for ind in inds if ind.series == (symbol, interval)]
+
+    by_series = {}
     for ind in inds:
-        await recalc_indicator(ind)
+        by_series.setdefault(ind.series, []).append(ind)
+
+    for key, group in by_series.items():
+        get_data_cache(*key).invalidate()
+        store = get_store(*key)
+        for ind in group:
+            indicator_series[ind.id] = key
+        if is_lazy(key) or not store:
+            for ind in group:
+                if is_lazy(key):
+                    indicator_values.pop(ind.id, None)
+                else:
+                    indicator_values[ind.id] = as_values([])
+            _prune_streams(key)
+            continue
+
+        graph = IndicatorGraph(group)
+        if start:
+            values = await _advance_graph(key, graph, store)
+        else:
+            values = await evaluate_batch(graph, store.columns(), graph.order)
+            _prune_streams(key)
+        _assign(graph, [ind.id for ind in group], values)
+
+
+async def _advance_graph(key, graph, store):
+    """Продвигает потоки узлов графа в топологическом порядке.
+
+    Узел, поток которого не удалось продвинуть, и всё, что считается через
+    него, уходят в пакетный расчёт.
+    """
+    values = {}
+    pending = set()
+    for node in graph.order:
+        if any(up in pending for up in node.upstream):
+            pending.add(node)
+            continue
+        result = await _try_advance_stream(key, node, store, values)
+        if result is None:
+            pending.add(node)
+        else:
+            values[node] = result
+
+    streamed = list(values)
+    if pending:
+        values = await evaluate_batch(graph, store.columns(), list(pending), values)
+    _prune_streams(key, streamed)
+    return values
+
+
+async def _try_advance_stream(key, node, store, values):
+    """_advance_stream, в котором ошибка одного узла не роняет весь ряд.
+
+    Как и в IndicatorsCalculator.calculate, ошибка логируется; поток
+    сбрасывается, а узел уходит в пакетный пересчёт.
+    """
+    try:
+        return await _advance_stream(key, node, store, values)
+    except Exception as exception:
+        _logger.exception(f"Exception {exception} while streaming indicator {node.type.value}({node.period})")
+        indicator_streams.pop((key, node), None)
+        return None
+
+
+async def _advance_stream(key, node, store, values):
+    """Продвигает потоковое состояние узла до конца store.
+
+    Все свечи, кроме последней, закрыты, последняя формируется. Поток
+    продолжается с первой закрытой свечи, которой в нём ещё нет; если
+    история разошлась, он строится заново. Если новых закрытых свечей нет и
+    входы открытой свечи не изменились, узел не пересчитывается. values -
+    значения уже продвинутых узлов-источников. Возвращает значения,
+    выровненные по store, или None, если узел надо считать пакетно.
+    """
+    size = len(store)
+    data = node_inputs(node, store.columns(), values)
+    if any(len(v) != size for v in data.values()):
+        return None
+    inputs = node.definition.inputs
+    # Один вход - колонка, несколько - строки (свечи, входы) в порядке inputs
+    if len(inputs) == 1:
+        rows = data[inputs[0]]
+    else:
+        rows = np.column_stack([data[name] for name in inputs])
+    timestamps = store.column("timestamp")
+
+    state = indicator_streams.get((key, node))
+    resume = 0
+    if state is not None:
+        stream, closed_until, forming, previous = state
+        if closed_until is not None:
+            resume = store.index_from(closed_until) + 1
+            if resume >= size or timestamps[resume - 1] != closed_until:
+                resume = 0
+        if resume == size - 1 and len(previous) == size and np.array_equal(forming, rows[size - 1], equal_nan=True):
+            return previous
+
+    closed_until = float(timestamps[size - 2]) if size > 1 else None
+    forming = np.array(rows[size - 1])
+    if resume == 0:
+        # Прогрев источника в поток не идёт, как и в пакетном расчёте
+        first = first_valid(data) if node.derived else 0
+        if first >= size:
+            return None
+        # Построение с нуля проходит всю историю: это работа для пула
+        closed = np.array(rows[first:size - 1])
+        stream = await run_cpu(_build_stream, node.type, node.period, store.capacity, closed)
+        stream.update(forming=forming)
+        result = align_end(stream.series(), size)
+    else:
+        # Меняется только хвост с resume: начало берётся из прошлых значений,
+        # без переписывания всего ряда потока в массив на каждом тике
+        new_values = stream.update(rows[resume:size - 1], forming=forming)
+        result = np.concatenate([align_end(previous[:-1], resume), np.asarray(new_values, dtype=np.float64)])
+    indicator_streams[key, node] = (stream, closed_until, forming, result)
+    return result
+
+
+async def lazy_values(symbol, interval):
+    """Значения индикаторов ряда по запросу, через LRU-кэш.
+
+    Ключ включает версию хранилища и узел графа: пока свечи не менялись,
+    значения берутся из кэша, а одинаковые выражения считаются один раз.
+    """
+    key = (symbol, interval)
+    inds = [ind for ind in await indicator_cache.all(get_session_local) if ind.series == key]
+    store = get_store(symbol, interval)
+    if not inds or not store:
+        return {ind.id: [] for ind in inds}
+
+    graph = IndicatorGraph(inds)
+    prefix = (key, id(store), store.version)
+    known = {}
+    for node in graph.order:
+        cached = lazy_cache.get(prefix + (node,))
+        if cached is not None:
+            known[node] = cached
+    missing = [node for node in graph.order if node not in known]
+    indicator_lazy_hits_total.inc(len(known))
+    values = known
+    if missing:
+        indicator_lazy_misses_total.inc(len(missing))
+        values = await evaluate_batch(graph, store.columns(), missing, known)
+        for node in missing:
+            lazy_cache.put(prefix + (node,), values[node], values[node].nbytes)
+
+    # Значение могло не влезть в бюджет: отдаём только что посчитанное
+    return {
+        ind.id: values[graph.nodes[ind.id]] if ind.id in graph.nodes else as_values([])
+        for ind in inds
+    }
+
+
+def _build_stream(ind_type, period, max_history, closed):
+    stream = IndicatorStream(ind_type, period, max_history=max_history)
+    stream.update(closed)
+    return stream
+
+
+async def reload_indicators():
+    """Перечитывает определения после изменений на другой реплике"""
+    await indicator_cache.load(get_session_local)
+    await recalc_all_indicators()
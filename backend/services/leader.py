@@ -0,0 +1,115 @@
+import asyncio
+import json
+import uuid
+
+import asyncpg
+from sqlalchemy.engine import make_url
+
+from core.logging import get_logger
+from core.settings import get_leader_lock_key
+
+_logger = get_logger("LeaderElection")
+
+CANDLES_CHANNEL = "candles_changed"
+
+
+class LeaderElection:
+    """Выбор реплики, которая опрашивает биржу и пишет свечи в БД.
+
+    Лидер держит сессионный pg_try_advisory_lock на выделенном соединении:
+    пока соединение живо, блокировка за ним, а при обрыве Postgres снимает
+    её сам и её забирает другая реплика. Остальные реплики слушают
+    CANDLES_CHANNEL на том же соединении и дочитывают свечи из БД.
+    Без Postgres (SQLite) реплика одна и всегда лидер.
+    """
+
+    def __init__(self, lock_key):
+        self.lock_key = lock_key
+        self.is_leader = False
+        # Отличает свои уведомления от уведомлений других реплик
+        self._token = uuid.uuid4().hex
+        self._dsn = None
+        self._conn = None
+        self._on_candles = None
+        self._connected_before = False
+        # Запущенные дочитывания: цикл событий держит на задачи только слабые ссылки
+        self._tasks = set()
+
+    async def start(self, database_url, on_candles):
+        """on_candles(symbol, interval, full) вызывается на репликах-последователях"""
+        url = make_url(database_url)
+        if url.get_backend_name() != "postgresql":
+            self.is_leader = True
+            _logger.info("Single replica database, running as leader")
+            return
+
+        self._on_candles = on_candles
+        self._dsn = url.set(drivername="postgresql").render_as_string(hide_password=False)
+        await self._connect()
+
+    async def acquire(self):
+        """Пытается взять блокировку; True, если реплика лидер"""
+        if self._dsn is None or self.is_leader:
+            return self.is_leader
+
+        try:
+            if self._conn is None:
+                await self._connect()
+            self.is_leader = bool(await self._conn.fetchval("SELECT pg_try_advisory_lock($1)", self.lock_key))
+        except (OSError, asyncpg.PostgresError) as e:
+            _logger.warning(f"Leader election failed: {e}")
+            self.is_leader = False
+
+        if self.is_leader:
+            _logger.info("Became leader, starting ingestion")
+        return self.is_leader
+
+    async def notify(self, symbol, interval, full=False):
+        """Лидер сообщает о свечах ряда, уже записанных в БД.
+
+        full - история менялась не только в хвосте, ряд нужно перечитать.
+        """
+        if not self.is_leader or self._conn is None:
+            return
+        payload = json.dumps({"token": self._token, "symbol": symbol, "interval": interval, "full": full})
+        await self._conn.execute("SELECT pg_notify($1, $2)", CANDLES_CHANNEL, payload)
+
+    async def close(self):
+        """Закрытие соединения снимает блокировку"""
+        self._on_candles = None
+        conn, self._conn = self._conn, None
+        if self._dsn is not None:
+            self.is_leader = False
+        if conn is not None:
+            await conn.close()
+
+    async def _connect(self):
+        self._conn = await asyncpg.connect(self._dsn)
+        self._conn.add_termination_listener(self._on_terminate)
+        await self._conn.add_listener(CANDLES_CHANNEL, self._on_notify)
+        if self._connected_before:
+            # Пока соединения не было, уведомления терялись: догоняем все ряды
+            self._spawn(self._on_candles(None, None, False))
+        self._connected_before = True
+
+    def _on_notify(self, connection, pid, channel, payload):
+        message = json.loads(payload)
+        if message.get("token") == self._token or self._on_candles is None:
+            return
+        self._spawn(self._on_candles(message["symbol"], message["interval"], message.get("full", False)))
+
+    def _spawn(self, coro):
+        task = asyncio.get_running_loop().create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def _on_terminate(self, connection):
+        if self._conn is None:
+            return
+        if self.is_leader:
+            _logger.warning("Leader connection lost, stopping ingestion")
+        self._conn = None
+        self.is_leader = False
+
+
+leader = LeaderElection(get_leader_lock_key())
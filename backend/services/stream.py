@@ -0,0 +1,129 @@
+import asyncio
+from collections import deque
+
+from prometheus_client import Counter, Gauge
+
+from core.logging import get_logger
+from core.settings import get_stream_max_pending
+from services.indicators import candle_rows
+from state.memory import get_store, watched_series
+from utils.constants import DEFAULT_INTERVAL, DEFAULT_SYMBOL
+from utils.serialization import dumps
+
+_logger = get_logger("StreamHub")
+
+stream_subscribers = Gauge(
+    'stream_subscribers',
+    'Open /ws/data connections'
+)
+
+stream_resyncs_total = Counter(
+    'stream_resyncs_total',
+    'Slow stream subscribers whose pending deltas were replaced by a snapshot'
+)
+
+
+class StreamSubscriber:
+    """Очередь сообщений одного подключения с ограниченным размером.
+
+    Если клиент не успевает забирать дельты и очередь переполняется,
+    накопленное выбрасывается и подключению отправляется свежий снимок.
+    Так память на медленного клиента не растёт.
+    """
+
+    def __init__(self, max_pending):
+        self._pending = deque()
+        self._max_pending = max_pending
+        self._ready = asyncio.Event()
+        self.resync = False
+
+    def offer(self, message):
+        if self.resync:
+            # Снимок всё равно перекроет любые дельты
+            return
+        if len(self._pending) >= self._max_pending:
+            self._pending.clear()
+            self.resync = True
+            stream_resyncs_total.inc()
+        else:
+            self._pending.append(message)
+        self._ready.set()
+
+    def request_resync(self):
+        self._pending.clear()
+        self.resync = True
+        self._ready.set()
+
+    async def next(self):
+        """Следующее сообщение, либо None, если нужно отправить снимок"""
+        while not self._pending and not self.resync:
+            self._ready.clear()
+            await self._ready.wait()
+
+        if self.resync:
+            self.resync = False
+            return None
+        return self._pending.popleft()
+
+
+class StreamHub:
+    """Рассылка дельт свечей и индикаторов по подключениям, отдельно для каждого ряда"""
+
+    def __init__(self, max_pending):
+        self._max_pending = max_pending
+        self._subscribers = {}
+
+    def __len__(self):
+        return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+    def subscribe(self, symbol=DEFAULT_SYMBOL, interval=DEFAULT_INTERVAL):
+        subscriber = StreamSubscriber(self._max_pending)
+        key = (symbol, interval)
+        self._subscribers.setdefault(key, set()).add(subscriber)
+        watched_series[key] = len(self._subscribers[key])
+        stream_subscribers.set(len(self))
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        for key, subscribers in self._subscribers.items():
+            if subscriber in subscribers:
+                subscribers.discard(subscriber)
+                if subscribers:
+                    watched_series[key] = len(subscribers)
+                else:
+                    watched_series.pop(key, None)
+        stream_subscribers.set(len(self))
+
+    def publish(self, message, symbol=DEFAULT_SYMBOL, interval=DEFAULT_INTERVAL):
+        """Сериализует сообщение один раз и раздаёт всем подключениям ряда"""
+        subscribers = self._subscribers.get((symbol, interval))
+        if not subscribers:
+            return
+        body = dumps(message).decode("utf-8")
+        for subscriber in subscribers:
+            subscriber.offer(body)
+
+    def resync_all(self):
+        """Всем подключениям нужен новый снимок, например после изменения индикаторов"""
+        for subscribers in self._subscribers.values():
+            for subscriber in subscribers:
+                subscriber.request_resync()
+
+    def publish_since(self, since, symbol=DEFAULT_SYMBOL, interval=DEFAULT_INTERVAL):
+        """Отправляет свечи ряда начиная с since: пересобранную последнюю и новые"""
+        subscribers = self._subscribers.get((symbol, interval))
+        if not subscribers:
+            return
+        if since is None:
+            for subscriber in subscribers:
+                subscriber.request_resync()
+            return
+
+        start = get_store(symbol, interval).index_from(since)
+        rows = candle_rows(start, symbol, interval)
+        if rows:
+            self.publish({"type": "delta", "candles": rows}, symbol, interval)
+        _logger.debug(f"Published {len(rows)} {symbol}/{interval} candles to {len(subscribers)} subscribers")
+
+
+stream_hub = StreamHub(get_stream_max_pending())
@@ -0,0 +1,220 @@
+import math
+
+import numpy as np
+
+from utils.constants import CANDLE_COLUMNS
+
+_INDEX = {name: i for i, name in enumerate(CANDLE_COLUMNS)}
+
+
+class CandleStore:
+    """Колоночное хранилище свечей на NumPy с фиксированным потолком памяти.
+
+    Колонки лежат в заранее выделенном буфере на 2 * capacity строк. Новые
+    свечи дописываются в конец, а когда место кончается, последние строки
+    переносятся в начало буфера. Поэтому окно всегда непрерывно и колонки
+    отдаются как срезы без копирования. Представления действительны до
+    следующей записи в хранилище.
+    """
+
+    def __init__(self, capacity):
+        if capacity < 1:
+            raise ValueError(f"Capacity must be positive, got {capacity}")
+        self.capacity = capacity
+        self._data = np.full((len(CANDLE_COLUMNS), capacity * 2), np.nan)
+        self._start = 0
+        self._end = 0
+        # Растёт на каждой записи, по нему потребители понимают, что данные изменились
+        self.version = 0
+
+    @classmethod
+    def from_records(cls, records, capacity=None):
+        records = list(records)
+        store = cls(capacity or max(len(records), 1))
+        store.extend(records)
+        return store
+
+    @property
+    def nbytes(self):
+        """Потолок памяти под данные: не зависит от числа свечей"""
+        return self._data.nbytes
+
+    def __len__(self):
+        return self._end - self._start
+
+    def __iter__(self):
+        return iter(self.to_records())
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self.to_records()[index]
+
+        size = len(self)
+        if index < 0:
+            index += size
+        if not 0 <= index < size:
+            raise IndexError("candle index out of range")
+
+        row = self._data[:, self._start + index]
+        return {name: _to_python(v) for name, v in zip(CANDLE_COLUMNS, row.tolist())}
+
+    def column(self, name):
+        """Колонка как read-only срез буфера, без копирования"""
+        view = self._data[_INDEX[name], self._start:self._end]
+        view.flags.writeable = False
+        return view
+
+    def columns(self):
+        return {name: self.column(name) for name in CANDLE_COLUMNS}
+
+    def index_from(self, timestamp):
+        """Индекс первой свечи с timestamp не меньше заданного (бинарный поиск)"""
+        return int(np.searchsorted(self.column("timestamp"), timestamp, side="left"))
+
+    def last_timestamp(self):
+        if not len(self):
+            return None
+        return float(self._data[_INDEX["timestamp"], self._end - 1])
+
+    def clear(self):
+        self._start = 0
+        self._end = 0
+        self.version += 1
+
+    def truncate(self, index):
+        """Отбрасывает свечи начиная с индекса index"""
+        index = max(0, min(index, len(self)))
+        if index < len(self):
+            self._end = self._start + index
+            self.version += 1
+
+    def append(self, candle):
+        self._write(_records_block([candle]))
+
+    def extend(self, candles):
+        candles = list(candles)
+        if candles:
+            self._write(_records_block(candles))
+
+    def extend_columns(self, columns):
+        """Дописывает свечи, переданные колонками одинаковой длины"""
+        sizes = {len(columns[name]) for name in columns}
+        if len(sizes) > 1:
+            raise ValueError("Columns must have the same length")
+        size = sizes.pop() if sizes else 0
+        if not size:
+            return
+
+        block = np.full((len(CANDLE_COLUMNS), size), np.nan)
+        for name, values in columns.items():
+            block[_INDEX[name]] = values
+        self._write(block)
+
+    def upsert(self, candle):
+        """Заменяет последнюю свечу с тем же timestamp или дописывает новую"""
+        last = self.last_timestamp()
+        timestamp = float(candle["timestamp"])
+
+        if last is None or timestamp > last:
+            self.append(candle)
+        elif timestamp == last:
+            self._data[:, self._end - 1] = _records_block([candle])[:, 0]
+            self.version += 1
+        else:
+            raise ValueError(f"Candle {timestamp} is older than the last stored candle {last}")
+
+    def merge(self, columns):
+        """Вливает отсортированные по timestamp свечи, переданные колонками.
+
+        Закрытые свечи (старше последней) не трогаются, последняя свеча
+        заменяется, если пришла с тем же timestamp, более новые дописываются.
+        Возвращает индекс первой изменённой свечи: изменился диапазон
+        [index, len(self)). None, если данные не изменились.
+        """
+        timestamps = np.asarray(columns["timestamp"], dtype=np.float64)
+        last = self.last_timestamp()
+        first = 0 if last is None else int(np.searchsorted(timestamps, last, side="left"))
+        if first == len(timestamps):
+            return None
+
+        block = np.full((len(CANDLE_COLUMNS), len(timestamps) - first), np.nan)
+        for name, values in columns.items():
+            block[_INDEX[name]] = np.asarray(values, dtype=np.float64)[first:]
+
+        if last is not None and block[_INDEX["timestamp"], 0] == last:
+            # Открытая свеча: заменяем, только если она действительно изменилась
+            current = self._data[:, self._end - 1]
+            if block.shape[1] == 1 and np.array_equal(current, block[:, 0], equal_nan=True):
+                return None
+            self._end -= 1
+
+        self._write(block)
+        # Блок больше capacity: хранилище целиком новое
+        return max(0, len(self) - block.shape[1])
+
+    def backfill(self, columns):
+        """Вставляет недостающие свечи истории по timestamp.
+
+        Свечи, которые уже есть в хранилище, не меняются, повторы во входных
+        данных отбрасываются. Если история не влезает в capacity, остаются
+        самые новые свечи. Возвращает индекс первой вставленной свечи или
+        None, если вставлять нечего.
+        """
+        timestamps, first = np.unique(np.asarray(columns["timestamp"], dtype=np.float64), return_index=True)
+        current = self._data[:, self._start:self._end]
+        fresh = ~np.isin(timestamps, current[_INDEX["timestamp"]])
+        if not fresh.any():
+            return None
+
+        block = np.full((len(CANDLE_COLUMNS), int(fresh.sum())), np.nan)
+        for name, values in columns.items():
+            block[_INDEX[name]] = np.asarray(values, dtype=np.float64)[first[fresh]]
+
+        merged = np.concatenate([current, block], axis=1)
+        merged = merged[:, np.argsort(merged[_INDEX["timestamp"]], kind="stable")]
+        self._start = self._end = 0
+        self._write(merged)
+        return self.index_from(block[_INDEX["timestamp"], 0])
+
+    def to_records(self, start=0):
+        """Свечи начиная с индекса start в виде списка dict, как их отдаёт API"""
+        lists = []
+        for name in CANDLE_COLUMNS:
+            column = self.column(name)[start:]
+            values = column.tolist()
+            if np.isnan(column).any():
+                values = [_to_python(v) for v in values]
+            lists.append(values)
+        return [dict(zip(CANDLE_COLUMNS, row)) for row in zip(*lists)]
+
+    def _write(self, block):
+        size = block.shape[1]
+        if size >= self.capacity:
+            self._data[:, :self.capacity] = block[:, size - self.capacity:]
+            self._start, self._end = 0, self.capacity
+        else:
+            if self._end + size > self._data.shape[1]:
+                # Буфер кончился: переносим хвост в начало, старые свечи отбрасываются
+                keep = min(len(self), self.capacity - size)
+                self._data[:, :keep] = self._data[:, self._end - keep:self._end]
+                self._start, self._end = 0, keep
+
+            self._data[:, self._end:self._end + size] = block
+            self._end += size
+            if len(self) > self.capacity:
+                self._start = self._end - self.capacity
+
+        self.version += 1
+
+
+def _records_block(candles):
+    block = np.full((len(CANDLE_COLUMNS), len(candles)), np.nan)
+    for j, candle in enumerate(candles):
+        for name, value in candle.items():
+            if name in _INDEX and value is not None:
+                block[_INDEX[name], j] = value
+    return block
+
+
+def _to_python(value):
+    return None if math.isnan(value) else value
@@ -1,2 +1,23 @@
-candles: list = []
+from core.settings import get_candle_capacity
+from state.candle_store import CandleStore
+from utils.constants import DEFAULT_SERIES
+
+candles = CandleStore(get_candle_capacity())
+# Хранилища свечей по ключу (symbol, interval)
+series: dict = {DEFAULT_SERIES: candles}
 indicator_values: dict = {}
+# Ряд, по которому посчитан индикатор; без записи считается ряд по умолчанию
+indicator_series: dict = {}
+# Потоковое состояние узлов графа индикаторов (utils/indicator_graph.py):
+# (ряд, узел) -> (IndicatorStream, timestamp последней закрытой свечи в потоке,
+#                 входы открытой свечи, последние значения)
+indicator_streams: dict = {}
+# Число открытых /ws/data по ряду: в режиме lazy их индикаторы считаются на каждом опросе
+watched_series: dict = {}
+
+
+def get_store(symbol, interval):
+    key = (symbol, interval)
+    if key not in series:
+        series[key] = CandleStore(get_candle_capacity())
+    return series[key]
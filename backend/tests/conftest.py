@@ -1,5 +1,6 @@
 from unittest.mock import patch, AsyncMock, MagicMock
 
+import numpy as np
 import pandas as pd
 import pytest
 from fastapi import FastAPI
@@ -37,10 +38,17 @@ patch('core.db.get_session_local', return_value=mock_session_factory).start()
 
 # Импортируем роутер
 from api.indicator_routes import router
+from services.data_cache import data_cache
 
 test_app = FastAPI()
 test_app.include_router(router)
 
+def assert_parity(actual, expected, rtol=1e-9, atol=0):
+    """Ряды совпадают поэлементно с допуском, NaN на одних и тех же местах"""
+    np.testing.assert_allclose(np.asarray(actual, dtype=float), np.asarray(expected, dtype=float),
+                               rtol=rtol, atol=atol, equal_nan=True)
+
+
 @pytest.fixture
 def client():
     with TestClient(test_app) as c:
@@ -123,6 +131,42 @@ def mock_candles(sample_ohlc):
     memory.candles.clear()
 
 
+@pytest.fixture
+def clear_memory():
+    """Очистка свечей, значений индикаторов и кэша /data до и после теста"""
+    memory.candles.clear()
+    memory.indicator_values.clear()
+    data_cache.invalidate()
+    yield
+    memory.candles.clear()
+    memory.indicator_values.clear()
+    data_cache.invalidate()
+
+
+@pytest.fixture
+def mock_sessionmaker():
+    """Сессия БД маршрутов, которая возвращает пустой список индикаторов"""
+    session = AsyncMock()
+    result = MagicMock()
+    result.scalars.return_value.all.return_value = []
+    session.execute = AsyncMock(return_value=result)
+    session.__aenter__ = AsyncMock(return_value=session)
+    session.__aexit__ = AsyncMock(return_value=None)
+
+    sessionmaker = MagicMock(return_value=session)
+    with patch('api.indicator_routes.get_session_local', return_value=sessionmaker):
+        yield session
+
+
+@pytest.fixture(autouse=True)
+def reset_indicator_cache():
+    """Каждый тест начинает с незагруженным кэшем определений индикаторов"""
+    from services.indicator_cache import indicator_cache
+    indicator_cache.clear()
+    yield
+    indicator_cache.clear()
+
+
 @pytest.fixture(autouse=True)
 def mock_db_session():
     """Фикстура для доступа к замоканной сессии в тестах"""
@@ -0,0 +1,214 @@
+import asyncio
+from unittest.mock import AsyncMock, patch
+
+import numpy as np
+import pytest
+
+from benchmarks.bybit_stub import BybitStub, candle_columns
+from services import candles as candles_service
+from services.backfill import backfill, backfill_all, missing_ranges, split_pages
+from state import memory
+from state.candle_store import CandleStore
+from state.memory import get_store
+
+MINUTE = 60_000
+NOW = 1_700_000_000_000
+
+
+@pytest.fixture
+def stub_env(monkeypatch):
+    """Пустые хранилища и заглушка вместо пересчёта индикаторов"""
+    monkeypatch.setenv("MARKET_SYMBOLS", "BTCUSDT")
+    monkeypatch.setenv("MARKET_INTERVALS", "1")
+    monkeypatch.setenv("RESAMPLE_INTERVALS", "")
+    saved = dict(memory.series)
+    memory.candles.clear()
+    with patch('services.candles.get_http_client', return_value=None), \
+            patch('services.backfill.recalc_all_indicators', new=AsyncMock()) as mock_recalc:
+        yield mock_recalc
+    memory.series.clear()
+    memory.series.update(saved)
+    memory.candles.clear()
+
+
+# =========================
+# Разбиение на страницы
+# =========================
+def test_split_pages_newest_first():
+    pages = split_pages([(0, 2499 * MINUTE)], MINUTE, 1000)
+
+    assert pages == [
+        (1500 * MINUTE, 2499 * MINUTE),
+        (500 * MINUTE, 1499 * MINUTE),
+        (0, 499 * MINUTE),
+    ]
+
+
+def test_missing_ranges_resume_from_last_timestamp():
+    store = CandleStore(100)
+    store.extend_columns(candle_columns(range(NOW - 50 * MINUTE, NOW - 20 * MINUTE + 1, MINUTE)))
+
+    assert missing_ranges(store, NOW - 80 * MINUTE, NOW, MINUTE) == [
+        (NOW - 80 * MINUTE, NOW - 51 * MINUTE),
+        (NOW - 19 * MINUTE, NOW),
+    ]
+    assert missing_ranges(store, NOW - 50 * MINUTE, NOW - 20 * MINUTE, MINUTE) == []
+    assert missing_ranges(CandleStore(10), 0, MINUTE, MINUTE) == [(0, MINUTE)]
+
+
+# =========================
+# Backfill против заглушки Bybit
+# =========================
+@pytest.mark.asyncio
+async def test_backfill_pages_into_empty_store(stub_env):
+    async with BybitStub(now_ms=NOW) as stub:
+        with patch('services.candles.get_bybit_url', return_value=stub.url):
+            inserted = await backfill("BTCUSDT", "1", depth=2500, now_ms=NOW)
+
+    store = get_store("BTCUSDT", "1")
+    timestamps = store.column("timestamp")
+    assert inserted == 2500
+    assert len(stub.requests) == 3
+    assert all(r["limit"] == "1000" for r in stub.requests)
+    # Непрерывная история без дублей, последняя свеча - текущая минута
+    assert np.all(np.diff(timestamps) == MINUTE)
+    assert timestamps[-1] == NOW - NOW % MINUTE
+    stub_env.assert_awaited_once_with("BTCUSDT", "1")
+
+
+@pytest.mark.asyncio
+async def test_backfill_resumes_after_restart(stub_env):
+    """Уже сохранённая история не запрашивается повторно"""
+    last = NOW - NOW % MINUTE - 200 * MINUTE
+    store = get_store("BTCUSDT", "1")
+    store.extend_columns(candle_columns(range(last - 999 * MINUTE, last + 1, MINUTE)))
+    stored = store.to_records()
+
+    async with BybitStub(now_ms=NOW) as stub:
+        with patch('services.candles.get_bybit_url', return_value=stub.url):
+            inserted = await backfill("BTCUSDT", "1", depth=1200, now_ms=NOW)
+
+    assert inserted == 200
+    assert len(stub.requests) == 1
+    assert int(stub.requests[0]["start"]) == last + MINUTE
+    assert store.to_records()[:1000] == stored
+
+    # Повторный запуск ничего не догружает
+    async with BybitStub(now_ms=NOW) as stub:
+        with patch('services.candles.get_bybit_url', return_value=stub.url):
+            assert await backfill("BTCUSDT", "1", depth=1200, now_ms=NOW) == 0
+    assert stub.requests == []
+
+
+@pytest.mark.asyncio
+async def test_backfill_merges_overlapping_pages_without_duplicates(stub_env, monkeypatch):
+    """Биржа отдаёт меньше страницы: окна перекрываются, дублей нет"""
+    monkeypatch.setenv("BACKFILL_PAGE_SIZE", "300")
+
+    async with BybitStub(now_ms=NOW, max_limit=200) as stub:
+        with patch('services.candles.get_bybit_url', return_value=stub.url):
+            await backfill("BTCUSDT", "1", depth=900, now_ms=NOW)
+
+    timestamps = get_store("BTCUSDT", "1").column("timestamp")
+    assert len(np.unique(timestamps)) == len(timestamps)
+    assert np.all(np.diff(timestamps) > 0)
+
+
+@pytest.mark.asyncio
+async def test_backfill_bounded_parallelism_and_rate_limit(stub_env, monkeypatch):
+    monkeypatch.setenv("BACKFILL_CONCURRENCY", "2")
+    monkeypatch.setenv("BACKFILL_PAGE_SIZE", "100")
+    running = 0
+    peak = 0
+    real_fetch = candles_service.fetch_klines
+
+    async def tracked_fetch(*args, **kwargs):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        try:
+            await asyncio.sleep(0.01)
+            return await real_fetch(*args, **kwargs)
+        finally:
+            running -= 1
+
+    async with BybitStub(now_ms=NOW) as stub:
+        with patch('services.candles.get_bybit_url', return_value=stub.url), \
+                patch('services.backfill.fetch_klines', new=tracked_fetch), \
+                patch.object(candles_service.bybit_limiter, 'acquire', new=AsyncMock()) as mock_acquire:
+            await backfill("BTCUSDT", "1", depth=800, now_ms=NOW)
+
+    assert peak == 2
+    assert mock_acquire.await_count == 8
+    assert len(get_store("BTCUSDT", "1")) == 800
+
+
+@pytest.mark.asyncio
+async def test_backfill_builds_derived_timeframes(stub_env, monkeypatch):
+    monkeypatch.setenv("RESAMPLE_INTERVALS", "5")
+    monkeypatch.setenv("BACKFILL_CANDLES", "1000")
+
+    async with BybitStub(now_ms=NOW) as stub:
+        with patch('services.candles.get_bybit_url', return_value=stub.url), \
+                patch('services.candles.recalc_all_indicators', new=AsyncMock()):
+            await backfill_all(now_ms=NOW)
+
+    # 1000 минут: неполная первая корзина отбрасывается, последняя открыта
+    five = get_store("BTCUSDT", "5")
+    assert len(five) == 200
+    assert five.column("timestamp")[0] % (5 * MINUTE) == 0
+
+
+@pytest.mark.asyncio
+async def test_backfill_retries_failed_pages(stub_env, monkeypatch):
+    """Временная ошибка биржи: страница повторяется, история загружается целиком"""
+    monkeypatch.setenv("BACKFILL_PAGE_SIZE", "100")
+    monkeypatch.setenv("BACKFILL_RETRY_DELAY", "0")
+    failures = {"left": 3}
+
+    def fail(params):
+        failures["left"] -= 1
+        return failures["left"] >= 0
+
+    async with BybitStub(now_ms=NOW) as stub:
+        stub.fail = fail
+        with patch('services.candles.get_bybit_url', return_value=stub.url):
+            inserted = await backfill("BTCUSDT", "1", depth=500, now_ms=NOW)
+
+    assert inserted == 500
+    assert len(stub.requests) == 5 + 3
+
+
+@pytest.mark.asyncio
+async def test_backfill_keeps_pages_before_permanent_failure(stub_env, monkeypatch):
+    """Страница не загрузилась после всех повторов: вставляется только непрерывная часть"""
+    monkeypatch.setenv("BACKFILL_PAGE_SIZE", "100")
+    monkeypatch.setenv("BACKFILL_RETRIES", "2")
+    monkeypatch.setenv("BACKFILL_RETRY_DELAY", "0")
+    broken_end = NOW - NOW % MINUTE - 200 * MINUTE
+
+    async with BybitStub(now_ms=NOW) as stub:
+        stub.fail = lambda params: int(params["end"]) == broken_end
+        with patch('services.candles.get_bybit_url', return_value=stub.url):
+            inserted = await backfill("BTCUSDT", "1", depth=500, now_ms=NOW)
+
+            # Две новые страницы без дыр; битая и старше неё - в следующий раз
+            timestamps = get_store("BTCUSDT", "1").column("timestamp")
+            assert inserted == 200
+            assert timestamps[0] == broken_end + MINUTE
+            assert np.all(np.diff(timestamps) == MINUTE)
+            assert sum(int(p["end"]) == broken_end for p in stub.requests) == 3
+
+            stub.fail = None
+            assert await backfill("BTCUSDT", "1", depth=500, now_ms=NOW) == 300
+
+    timestamps = get_store("BTCUSDT", "1").column("timestamp")
+    assert len(timestamps) == 500
+    assert np.all(np.diff(timestamps) == MINUTE)
+
+
+@pytest.mark.asyncio
+async def test_backfill_all_survives_errors(stub_env):
+    with patch('services.backfill.backfill', new=AsyncMock(side_effect=RuntimeError("boom"))) as mock_backfill:
+        await backfill_all(now_ms=NOW)
+    mock_backfill.assert_awaited_once()
@@ -0,0 +1,65 @@
+import json
+
+import pytest
+
+from benchmarks.runner import compare, measure, write_results
+from benchmarks.suite import QUICK, main, make_indicators, run
+from services.indicator_cache import indicator_cache
+from state.memory import candles, indicator_streams, indicator_values
+from utils.indicator_graph import IndicatorGraph
+
+# Самые маленькие размеры: проверяется, что набор работает, а не скорость
+TINY = {**QUICK, "sizes": (200,), "counts": (1, 12), "history": 300, "indicators": 12, "repeat": 1, "min_time": 0.001}
+
+
+def test_measure_summary():
+    calls = []
+    stats = measure(lambda: calls.append(1), repeat=3, min_time=0.001, setup=lambda: calls.clear())
+
+    assert stats["number"] == 1 and stats["repeat"] == 3
+    assert 0 <= stats["best"] <= stats["median"]
+    assert calls == [1]
+
+
+def test_compare_flags_regressions():
+    baseline = {"a": {"best": 1.0}, "b": {"best": 1.0}, "gone": {"best": 1.0}}
+    current = {"a": {"best": 1.1}, "b": {"best": 2.0}, "new": {"best": 1.0}}
+
+    rows, regressions = compare(baseline, current, threshold=1.25)
+
+    assert [row[0] for row in rows] == ["a", "b"]
+    assert regressions == ["b"]
+
+
+def test_indicators_form_valid_graph():
+    """Источники синтетических индикаторов не дают ошибок графа"""
+    graph = IndicatorGraph(make_indicators(40))
+    assert graph.errors == {}
+    assert any(node.derived for node in graph.order)
+
+
+@pytest.mark.asyncio
+async def test_suite_runs_offline():
+    results = await run(TINY, ["recalc", "get_data", "fetch"])
+
+    assert {"recalc_full[12]", "recalc_tick[12]", "get_data[binary-build]", "fetch_klines[1000]",
+            "fetch_candles[12]"} <= set(results)
+    assert all(r["best"] > 0 for r in results.values())
+    # После замеров общее состояние приложения пустое
+    assert len(candles) == 0
+    assert not indicator_values and not indicator_streams
+    assert not indicator_cache.loaded
+
+
+def test_main_writes_results_and_compares(tmp_path, monkeypatch):
+    monkeypatch.setattr("benchmarks.suite.QUICK", TINY)
+    baseline = tmp_path / "baseline.json"
+    write_results(baseline, {"calculate[sma-200]": {"best": 1e-12}})
+    output = tmp_path / "current.json"
+
+    code = main(["--quick", "--only", "calculate", "--output", str(output), "--baseline", str(baseline)])
+
+    saved = json.loads(output.read_text())
+    assert saved["meta"]["quick"] is True
+    assert "calculate[crossover-200]" in saved["results"]
+    assert code == 1
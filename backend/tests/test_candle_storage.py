@@ -0,0 +1,177 @@
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import numpy as np
+import pytest
+from sqlalchemy import event, inspect, text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.asyncio import AsyncSession
+# conftest подменяет sqlalchemy.ext.asyncio.create_async_engine, нужен настоящий
+from sqlalchemy.ext.asyncio.engine import create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks.bybit_stub import BybitStub, candle_columns
+from core.db import Base
+from services import candle_storage
+from services.backfill import warm_from_db
+from services.candle_storage import (
+    load_candles,
+    load_latest,
+    save_candles,
+    upsert_statement,
+)
+from services.candles import fetch_candles
+from state import memory
+from state.memory import get_store
+
+MINUTE = 60_000
+NOW = 1_700_000_000_000
+
+
+@pytest.fixture
+async def sqlite_db(tmp_path):
+    """Файловая SQLite через aiosqlite: та же схема, что и в Postgres"""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'candles.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    yield engine, sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    await engine.dispose()
+
+
+@pytest.fixture
+def clean_stores(monkeypatch):
+    monkeypatch.setenv("MARKET_SYMBOLS", "BTCUSDT,ETHUSDT")
+    monkeypatch.setenv("MARKET_INTERVALS", "1")
+    monkeypatch.setenv("RESAMPLE_INTERVALS", "")
+    saved = dict(memory.series)
+    memory.candles.clear()
+    yield
+    memory.series.clear()
+    memory.series.update(saved)
+    memory.candles.clear()
+    candle_storage.close_candle_storage()
+
+
+# =========================
+# Upsert и чтение диапазонов
+# =========================
+@pytest.mark.asyncio
+async def test_save_and_load_range(sqlite_db):
+    _, session_local = sqlite_db
+    timestamps = range(NOW, NOW + 10 * MINUTE, MINUTE)
+
+    assert await save_candles("BTCUSDT", "1", candle_columns(timestamps), session_local) == 10
+    await save_candles("ETHUSDT", "1", candle_columns(timestamps), session_local)
+
+    loaded = await load_candles(session_local, "BTCUSDT", "1", start=NOW + 3 * MINUTE, end=NOW + 5 * MINUTE)
+    assert loaded["timestamp"].tolist() == [NOW + 3 * MINUTE, NOW + 4 * MINUTE, NOW + 5 * MINUTE]
+    np.testing.assert_array_equal(loaded["close"], candle_columns(timestamps)["close"][3:6])
+
+
+@pytest.mark.asyncio
+async def test_upsert_replaces_open_candle_without_duplicates(sqlite_db):
+    engine, session_local = sqlite_db
+    columns = candle_columns(range(NOW, NOW + 5 * MINUTE, MINUTE))
+    await save_candles("BTCUSDT", "1", columns, session_local)
+
+    # Тот же хвост ещё раз, открытая свеча изменилась
+    columns["close"][-1] = 1.0
+    await save_candles("BTCUSDT", "1", {name: values[3:] for name, values in columns.items()}, session_local)
+
+    async with engine.connect() as conn:
+        count = (await conn.execute(text("SELECT COUNT(*) FROM candles"))).scalar()
+    loaded = await load_candles(session_local, "BTCUSDT", "1")
+    assert count == 5
+    assert loaded["close"][-1] == 1.0
+
+
+@pytest.mark.asyncio
+async def test_range_read_uses_primary_key_index(sqlite_db):
+    engine, _ = sqlite_db
+    async with engine.connect() as conn:
+        pk = await conn.run_sync(lambda c: inspect(c).get_pk_constraint("candles"))
+        plan = (await conn.execute(text(
+            "EXPLAIN QUERY PLAN SELECT * FROM candles "
+            "WHERE symbol = 'BTCUSDT' AND interval = '1' AND timestamp >= 0"
+        ))).all()
+
+    assert pk["constrained_columns"] == ["symbol", "interval", "timestamp"]
+    assert "USING INDEX" in " ".join(str(row) for row in plan)
+
+
+@pytest.mark.asyncio
+async def test_load_latest_in_one_query(sqlite_db):
+    """Последние N свечей каждого ряда одним SELECT"""
+    engine, session_local = sqlite_db
+    await save_candles("BTCUSDT", "1", candle_columns(range(NOW, NOW + 50 * MINUTE, MINUTE)), session_local)
+    await save_candles("ETHUSDT", "1", candle_columns(range(NOW, NOW + 5 * MINUTE, MINUTE)), session_local)
+    await save_candles("DOGEUSDT", "1", candle_columns(range(NOW, NOW + 5 * MINUTE, MINUTE)), session_local)
+
+    statements = []
+    event.listen(engine.sync_engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+    loaded = await load_latest(session_local, [("BTCUSDT", "1"), ("ETHUSDT", "1"), ("ETHUSDT", "5")], 20)
+
+    assert len(statements) == 1
+    assert set(loaded) == {("BTCUSDT", "1"), ("ETHUSDT", "1")}
+    assert loaded["BTCUSDT", "1"]["timestamp"].tolist() == list(range(NOW + 30 * MINUTE, NOW + 50 * MINUTE, MINUTE))
+    assert len(loaded["ETHUSDT", "1"]["timestamp"]) == 5
+
+
+def test_upsert_statement_postgres():
+    sql = str(upsert_statement("postgresql").compile(dialect=postgresql.dialect()))
+    assert "ON CONFLICT (symbol, interval, timestamp) DO UPDATE" in sql
+    assert "close = excluded.close" in sql
+
+    with pytest.raises(ValueError):
+        upsert_statement("mysql")
+
+
+@pytest.mark.asyncio
+async def test_save_without_storage_or_on_error():
+    """Без БД и при ошибке БД опрос продолжается"""
+    columns = candle_columns([NOW])
+    assert await save_candles("BTCUSDT", "1", columns) == 0
+
+    session = AsyncMock()
+    session.get_bind = MagicMock(side_effect=RuntimeError("db is down"))
+    session.__aenter__ = AsyncMock(return_value=session)
+    session.__aexit__ = AsyncMock(return_value=None)
+    assert await save_candles("BTCUSDT", "1", columns, MagicMock(return_value=session)) == 0
+
+
+# =========================
+# Запись при опросе и прогрев при старте
+# =========================
+@pytest.mark.asyncio
+async def test_fetch_candles_persists_changed_rows(sqlite_db, clean_stores):
+    _, session_local = sqlite_db
+    candle_storage.init_candle_storage(session_local)
+
+    async with BybitStub(now_ms=NOW) as stub:
+        with patch('services.candles.get_bybit_url', return_value=stub.url), \
+                patch('services.candles.get_http_client', return_value=None), \
+                patch('services.candles.recalc_all_indicators', new=AsyncMock()):
+            await fetch_candles()
+            stub.now_ms += 3 * MINUTE
+            await fetch_candles()
+
+    loaded = await load_candles(session_local, "BTCUSDT", "1")
+    np.testing.assert_array_equal(loaded["timestamp"], memory.candles.column("timestamp"))
+    assert len(loaded["timestamp"]) == 103
+
+
+@pytest.mark.asyncio
+async def test_warm_from_db(sqlite_db, clean_stores, monkeypatch):
+    """Хранилища заполняются из БД до первого опроса биржи"""
+    monkeypatch.setenv("CANDLE_CAPACITY", "30")
+    _, session_local = sqlite_db
+    await save_candles("BTCUSDT", "1", candle_columns(range(NOW, NOW + 50 * MINUTE, MINUTE)), session_local)
+    await save_candles("ETHUSDT", "1", candle_columns(range(NOW, NOW + 5 * MINUTE, MINUTE)), session_local)
+    candle_storage.init_candle_storage(session_local)
+
+    with patch('services.backfill.recalc_all_indicators', new=AsyncMock()) as mock_recalc:
+        await warm_from_db()
+
+    assert len(get_store("BTCUSDT", "1")) == 30
+    assert get_store("BTCUSDT", "1").last_timestamp() == NOW + 49 * MINUTE
+    assert len(get_store("ETHUSDT", "1")) == 5
+    assert mock_recalc.await_count == 2
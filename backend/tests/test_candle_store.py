@@ -0,0 +1,243 @@
+import numpy as np
+import pytest
+
+from state.candle_store import CandleStore
+from utils.constants import CANDLE_COLUMNS
+
+
+def make_candle(i):
+    return {
+        "timestamp": 1_000_000 + i * 60_000,
+        "open": 100.0 + i,
+        "high": 110.0 + i,
+        "low": 90.0 + i,
+        "close": 105.0 + i,
+        "volume": 1.0 + i,
+        "turnover": 1000.0 + i,
+    }
+
+
+# =========================
+# Запись и чтение
+# =========================
+def test_append_and_read_records():
+    """Свечи читаются обратно в том же виде, что и записывались"""
+    store = CandleStore(10)
+    store.extend(make_candle(i) for i in range(3))
+
+    assert len(store) == 3
+    assert store[0] == {k: float(v) for k, v in make_candle(0).items()}
+    assert store[-1]["close"] == 107.0
+    assert store.to_records() == list(store)
+
+
+def test_missing_fields_are_none():
+    """Отсутствующие поля отдаются как None"""
+    store = CandleStore(10)
+    store.append({"timestamp": 1000, "close": 100})
+
+    assert store[0]["close"] == 100.0
+    assert store[0]["open"] is None
+    assert store.to_records()[0]["volume"] is None
+
+
+def test_extend_columns():
+    """Запись колонками"""
+    store = CandleStore(10)
+    store.extend_columns({name: np.arange(4, dtype=float) for name in CANDLE_COLUMNS})
+
+    assert len(store) == 4
+    np.testing.assert_array_equal(store.column("close"), [0, 1, 2, 3])
+
+
+def test_extend_columns_length_mismatch():
+    store = CandleStore(10)
+    with pytest.raises(ValueError):
+        store.extend_columns({"timestamp": [1.0, 2.0], "close": [1.0]})
+
+
+def test_column_is_zero_copy_view():
+    """Колонка ссылается на буфер хранилища и защищена от записи"""
+    store = CandleStore(10)
+    store.extend(make_candle(i) for i in range(5))
+
+    close = store.column("close")
+    assert np.shares_memory(close, store.column("close"))
+    assert not close.flags.writeable
+    with pytest.raises(ValueError):
+        close[0] = 1.0
+
+
+# =========================
+# Потолок памяти
+# =========================
+def test_capacity_keeps_latest_candles():
+    """При переполнении остаются последние capacity свечей"""
+    store = CandleStore(5)
+    nbytes = store.nbytes
+    for i in range(23):
+        store.append(make_candle(i))
+
+    assert len(store) == 5
+    assert store.nbytes == nbytes
+    np.testing.assert_array_equal(store.column("close"), [123.0, 124.0, 125.0, 126.0, 127.0])
+    assert store.column("close").flags.c_contiguous
+
+
+def test_extend_larger_than_capacity():
+    store = CandleStore(4)
+    store.extend(make_candle(i) for i in range(10))
+
+    assert len(store) == 4
+    assert store[0]["close"] == 111.0
+
+
+# =========================
+# upsert
+# =========================
+def test_upsert_replaces_last_candle():
+    """Формирующаяся свеча заменяется, новая дописывается"""
+    store = CandleStore(10)
+    store.extend(make_candle(i) for i in range(3))
+    version = store.version
+
+    updated = dict(make_candle(2), close=999.0)
+    store.upsert(updated)
+    assert len(store) == 3
+    assert store[-1]["close"] == 999.0
+    assert store.version > version
+
+    store.upsert(make_candle(3))
+    assert len(store) == 4
+    assert store.last_timestamp() == make_candle(3)["timestamp"]
+
+
+def test_upsert_rejects_older_candle():
+    store = CandleStore(10)
+    store.extend(make_candle(i) for i in range(3))
+    with pytest.raises(ValueError):
+        store.upsert(make_candle(0))
+
+
+def test_clear():
+    store = CandleStore(10)
+    store.extend(make_candle(i) for i in range(3))
+    store.clear()
+
+    assert len(store) == 0
+    assert store.last_timestamp() is None
+    assert store.to_records() == []
+
+
+def test_truncate():
+    store = CandleStore(10)
+    store.extend(make_candle(i) for i in range(5))
+    version = store.version
+
+    store.truncate(3)
+    assert [c["timestamp"] for c in store] == [make_candle(i)["timestamp"] for i in range(3)]
+    assert store.version == version + 1
+
+    # Индекс за концом ничего не меняет
+    store.truncate(10)
+    assert len(store) == 3
+    assert store.version == version + 1
+
+
+def columns_of(candles):
+    return {name: [c[name] for c in candles] for name in CANDLE_COLUMNS}
+
+
+def test_merge_into_empty_store():
+    store = CandleStore(10)
+    assert store.merge(columns_of([make_candle(i) for i in range(3)])) == 0
+    assert len(store) == 3
+
+
+def test_merge_keeps_closed_replaces_open_appends_new():
+    """Закрытые свечи не трогаются, открытая заменяется, новые дописываются"""
+    store = CandleStore(10)
+    store.extend(make_candle(i) for i in range(4))
+    closed = store.to_records()[:3]
+
+    incoming = [make_candle(i) for i in range(1, 6)]
+    for candle in incoming:
+        candle["close"] += 1000
+    changed = store.merge(columns_of(incoming))
+
+    assert changed == 3
+    assert store.to_records()[:3] == closed
+    assert [c["close"] for c in store.to_records()[3:]] == [c["close"] for c in incoming[2:]]
+    assert len(store) == 6
+
+
+def test_merge_unchanged_window():
+    """Повтор того же окна не меняет ни данные, ни version"""
+    store = CandleStore(10)
+    candles = [make_candle(i) for i in range(5)]
+    store.merge(columns_of(candles))
+    version = store.version
+
+    assert store.merge(columns_of(candles)) is None
+    assert store.merge(columns_of(candles[:2])) is None
+    assert store.version == version
+
+
+def test_merge_grows_history_up_to_capacity():
+    """Сдвигающееся окно из 100 свечей накапливает историю"""
+    store = CandleStore(250)
+    assert store.merge(columns_of([make_candle(i) for i in range(100)])) == 0
+    for tick in range(10, 300, 10):
+        changed = store.merge(columns_of([make_candle(i) for i in range(tick, tick + 100)]))
+        # Бывшая открытая свеча и 10 новых
+        assert changed == len(store) - 11
+
+    assert len(store) == 250
+    assert store[-1]["timestamp"] == make_candle(389)["timestamp"]
+
+
+def test_merge_larger_than_capacity():
+    """Блок больше capacity заменяет всё хранилище, индекс изменений не отрицательный"""
+    store = CandleStore(5)
+    store.extend(make_candle(i) for i in range(3))
+
+    assert store.merge(columns_of([make_candle(i) for i in range(2, 10)])) == 0
+    assert [c["timestamp"] for c in store.to_records()] == [make_candle(i)["timestamp"] for i in range(5, 10)]
+    assert CandleStore(5).merge(columns_of([make_candle(i) for i in range(8)])) == 0
+
+
+def test_backfill_inserts_missing_history():
+    """Старые и пропущенные свечи вставляются по порядку, хранящиеся не меняются"""
+    store = CandleStore(20)
+    store.extend(make_candle(i) for i in [5, 6, 9])
+    stored = store[0]
+
+    incoming = [make_candle(i) for i in [3, 4, 5, 7, 7, 8]]
+    incoming[2]["close"] = -1
+    changed = store.backfill(columns_of(incoming))
+
+    assert changed == 0
+    assert [c["timestamp"] for c in store] == [make_candle(i)["timestamp"] for i in range(3, 10)]
+    assert store[2] == stored
+    assert store.backfill(columns_of(incoming)) is None
+
+
+def test_backfill_keeps_newest_within_capacity():
+    store = CandleStore(5)
+    store.extend(make_candle(i) for i in [8, 9])
+
+    assert store.backfill(columns_of([make_candle(i) for i in range(8)])) == 0
+    assert [c["timestamp"] for c in store] == [make_candle(i)["timestamp"] for i in range(5, 10)]
+
+
+def test_index_from_binary_search():
+    """Поиск первой свечи не раньше заданного timestamp"""
+    store = CandleStore(10)
+    store.extend(make_candle(i) for i in range(5))
+    first = make_candle(0)["timestamp"]
+
+    assert store.index_from(first) == 0
+    assert store.index_from(first + 60_000) == 1
+    assert store.index_from(first + 90_000) == 2
+    assert store.index_from(first - 1) == 0
+    assert store.index_from(first + 10 * 60_000) == 5
@@ -4,7 +4,8 @@ from unittest.mock import MagicMock, AsyncMock, patch
 
 import httpx
 import pytest
-from services.candles import fetch_candles
+from benchmarks.bybit_stub import BybitStub
+from services.candles import BybitError, fetch_candles, fetch_klines
 
 
 # =========================
@@ -15,12 +16,13 @@ def mock_candles_state():
     """Фикстура для очистки и мока состояния candles"""
     from state import memory
     # Сохраняем оригинальное состояние
-    original_candles = memory.candles.copy() if memory.candles else []
+    original_candles = memory.candles.to_records()
     # Очищаем
-    memory.candles = []
+    memory.candles.clear()
     yield memory.candles
     # Восстанавливаем
-    memory.candles = original_candles
+    memory.candles.clear()
+    memory.candles.extend(original_candles)
 
 
 @pytest.fixture
@@ -60,7 +62,7 @@ async def test_fetch_candles_empty_response(mock_candles_state):
             from state import memory
             # Свечей быть не должно
             assert len(memory.candles) == 0
-            mock_recalc.assert_called_once()
+            mock_recalc.assert_not_called()
 
 
 @pytest.mark.asyncio
@@ -100,6 +102,33 @@ async def test_fetch_candles_api_error(mock_candles_state):
             await fetch_candles()
 
 
+@pytest.mark.asyncio
+async def test_fetch_candles_http_error(mock_candles_state):
+    """HTTP-ошибка Bybit не разбирается как свечи"""
+    request = httpx.Request("GET", "https://api.bybit.com/v5/market/kline")
+    mock_response = httpx.Response(503, request=request, text="Service Unavailable")
+
+    mock_client = MagicMock()
+    mock_client.get = AsyncMock(return_value=mock_response)
+    mock_client.__aenter__ = AsyncMock(return_value=mock_client)
+    mock_client.__aexit__ = AsyncMock(return_value=None)
+
+    with patch('services.candles.httpx.AsyncClient', return_value=mock_client):
+        with pytest.raises(httpx.HTTPStatusError):
+            await fetch_candles()
+
+
+@pytest.mark.asyncio
+async def test_fetch_klines_ret_code_error():
+    """Ненулевой retCode при HTTP 200 - понятная ошибка с retMsg"""
+    async with BybitStub() as stub:
+        stub.fail = lambda params: True
+        with patch('services.candles.get_http_client', return_value=None), \
+                patch('services.candles.get_bybit_url', return_value=stub.url):
+            with pytest.raises(BybitError, match="10006 Too many visits"):
+                await fetch_klines("BTCUSDT", "1", limit=10)
+
+
 @pytest.mark.asyncio
 async def test_fetch_candles_missing_result_key(mock_candles_state):
     """Тест ответа без ключа 'result'"""
@@ -202,3 +231,79 @@ async def test_fetch_candles_logging():
 
                 # Проверяем что логи были вызваны
                 assert mock_logger.debug.call_count >= 2
+
+
+# =========================
+# Пул соединений
+# =========================
+@pytest.mark.asyncio
+async def test_fetch_candles_reuses_pooled_connection(mock_candles_state):
+    """Общий клиент держит одно keep-alive соединение на все опросы"""
+    from core.http import create_http_client
+    from benchmarks.bybit_stub import BybitStub
+
+    async with BybitStub() as stub:
+        client = create_http_client()
+        try:
+            with patch('services.candles.get_bybit_url', return_value=stub.url), \
+                    patch('services.candles.get_http_client', return_value=client), \
+                    patch('services.candles.recalc_all_indicators', new=AsyncMock()):
+                for _ in range(3):
+                    await fetch_candles()
+        finally:
+            await client.aclose()
+
+        assert len(stub.requests) == 3
+        assert stub.connections == 1
+        assert len(mock_candles_state) == 100
+
+
+@pytest.mark.asyncio
+async def test_fetch_candles_without_pool_opens_new_connections(mock_candles_state):
+    """Без общего клиента каждый опрос открывает новое соединение"""
+    from benchmarks.bybit_stub import BybitStub
+
+    async with BybitStub() as stub:
+        with patch('services.candles.get_bybit_url', return_value=stub.url), \
+                patch('services.candles.get_http_client', return_value=None), \
+                patch('services.candles.recalc_all_indicators', new=AsyncMock()):
+            for _ in range(3):
+                await fetch_candles()
+
+        assert stub.connections == 3
+
+
+@pytest.mark.asyncio
+async def test_fetch_candles_merges_history(mock_candles_state):
+    """Повторные опросы дописывают историю и сообщают изменившийся диапазон"""
+    from benchmarks.bybit_stub import BybitStub
+
+    async with BybitStub(now_ms=1_700_000_000_000) as stub:
+        with patch('services.candles.get_bybit_url', return_value=stub.url), \
+                patch('services.candles.get_http_client', return_value=None), \
+                patch('services.candles.recalc_all_indicators', new=AsyncMock()) as mock_recalc:
+            assert await fetch_candles() == 0
+            closed = mock_candles_state.to_records()[:99]
+
+            # Тот же ответ: ничего не изменилось
+            assert await fetch_candles() is None
+
+            stub.now_ms += 5 * 60_000
+            assert await fetch_candles() == 99
+
+    assert len(mock_candles_state) == 105
+    assert mock_candles_state.to_records()[:99] == closed
+    assert [call.args[2] for call in mock_recalc.call_args_list] == [0, 99]
+
+
+@pytest.mark.asyncio
+async def test_http_client_lifecycle():
+    """Клиент создаётся и закрывается вместе с приложением"""
+    from core import http
+
+    client = http.init_http_client()
+    assert http.get_http_client() is client
+
+    await http.close_http_client()
+    assert http.get_http_client() is None
+    assert client.is_closed
@@ -0,0 +1,192 @@
+from unittest.mock import AsyncMock, patch
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from app import app
+from models.indicator import IndicatorDB
+from services.data_cache import data_cache
+from state import memory
+from state.memory import candles, indicator_values
+from utils.columnar import (
+    BINARY_MEDIA_TYPE,
+    COLUMNS_MEDIA_TYPE,
+    decode_binary,
+    encode_binary,
+    negotiate,
+    nullable,
+)
+from utils.constants import CANDLE_COLUMNS
+
+client = TestClient(app)
+
+
+@pytest.fixture
+def history():
+    """Десять свечей и SMA с пропусками в начале"""
+    candles.clear()
+    indicator_values.clear()
+    candles.extend(
+        {"timestamp": 60_000 * i, "open": 100 + i, "high": 101 + i, "low": 99 + i, "close": 100.5 + i,
+         "volume": 10, "turnover": 1000}
+        for i in range(10)
+    )
+    indicator_values[1] = [None, None] + [float(i) for i in range(8)]
+    memory.indicator_series[1] = ("BTCUSDT", "1")
+    data_cache.invalidate()
+    with patch('api.indicator_routes.indicator_cache') as cache:
+        cache.all = AsyncMock(return_value=[
+            IndicatorDB(id=1, name="SMA 3", type="sma", period=3, color="#fff", symbol="BTCUSDT", interval="1")
+        ])
+        yield
+    candles.clear()
+    indicator_values.clear()
+    memory.indicator_series.pop(1, None)
+    data_cache.invalidate()
+
+
+# =========================
+# utils.columnar
+# =========================
+def test_binary_roundtrip():
+    columns = {"timestamp": np.arange(5) * 60_000.0, "indicator:1": np.array([np.nan, 1, 2, 3, 4])}
+    body = encode_binary(columns)
+    decoded = decode_binary(body)
+
+    assert list(decoded) == ["timestamp", "indicator:1"]
+    np.testing.assert_array_equal(decoded["timestamp"], columns["timestamp"])
+    np.testing.assert_array_equal(decoded["indicator:1"], columns["indicator:1"])
+    assert body[:4] == b"CNDL"
+
+
+def test_binary_rejects_unknown_magic():
+    with pytest.raises(ValueError):
+        decode_binary(b"XXXX" + encode_binary({"a": [1.0]})[4:])
+
+
+@pytest.mark.parametrize("fmt, accept, expected", [
+    (None, None, "rows"),
+    (None, "application/json", "rows"),
+    (None, COLUMNS_MEDIA_TYPE, "columns"),
+    (None, f"{BINARY_MEDIA_TYPE};q=1, application/json", "binary"),
+    (None, "application/octet-stream", "binary"),
+    ("columns", BINARY_MEDIA_TYPE, "columns"),
+])
+def test_negotiate(fmt, accept, expected):
+    assert negotiate(fmt, accept) == expected
+
+
+def test_negotiate_unknown_format():
+    with pytest.raises(ValueError):
+        negotiate("xml", None)
+
+
+def test_nullable():
+    assert nullable([1.0, np.nan, np.inf]) == [1.0, None, None]
+    assert nullable(np.array([1.0, 2.0])) == [1.0, 2.0]
+
+
+# =========================
+# GET /data
+# =========================
+def test_get_data_columns(history):
+    response = client.get("/data", params={"format": "columns"})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith(COLUMNS_MEDIA_TYPE)
+    body = response.json()
+    assert body["candles"]["timestamp"] == [60_000.0 * i for i in range(10)]
+    assert body["candles"]["indicators"]["1"][:3] == [None, None, 0.0]
+    assert body["indicators"][0]["id"] == "1"
+
+
+def test_get_data_columns_matches_rows(history):
+    rows = client.get("/data").json()["candles"]
+    columns = client.get("/data", headers={"Accept": COLUMNS_MEDIA_TYPE}).json()["candles"]
+
+    for name in CANDLE_COLUMNS:
+        assert columns[name] == [row[name] for row in rows]
+    assert columns["indicators"]["1"] == [row["indicators"].get("1") for row in rows]
+
+
+def test_get_data_binary(history):
+    response = client.get("/data", headers={"Accept": BINARY_MEDIA_TYPE})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == BINARY_MEDIA_TYPE
+    decoded = decode_binary(response.content)
+    assert list(decoded) == list(CANDLE_COLUMNS) + ["indicator:1"]
+    np.testing.assert_array_equal(decoded["close"], memory.candles.column("close"))
+    assert np.isnan(decoded["indicator:1"][:2]).all()
+    assert decoded["indicator:1"][-1] == 7.0
+
+
+def test_get_data_binary_since(history):
+    response = client.get("/data", params={"format": "binary", "since": 8 * 60_000})
+
+    decoded = decode_binary(response.content)
+    assert decoded["timestamp"].tolist() == [8 * 60_000.0, 9 * 60_000.0]
+
+
+def test_get_data_etag_per_format(history):
+    rows = client.get("/data")
+    binary = client.get("/data", params={"format": "binary"})
+
+    assert rows.headers["etag"] != binary.headers["etag"]
+    assert binary.headers["vary"] == "Accept"
+    repeat = client.get("/data", params={"format": "binary"}, headers={"If-None-Match": binary.headers["etag"]})
+    assert repeat.status_code == 304
+    assert client.get("/data", headers={"If-None-Match": binary.headers["etag"]}).status_code == 200
+
+
+def test_get_data_unknown_format(history):
+    assert client.get("/data", params={"format": "xml"}).status_code == 400
+
+
+@pytest.fixture
+def bbands_history(history):
+    """К SMA добавляются полосы Боллинджера: три выхода на свечу"""
+    values = np.column_stack([np.arange(10.0), np.arange(10.0) + 1, np.arange(10.0) - 1])
+    values[:2] = np.nan
+    indicator_values[2] = values
+    memory.indicator_series[2] = ("BTCUSDT", "1")
+    with patch('api.indicator_routes.indicator_cache') as cache:
+        cache.all = AsyncMock(return_value=[
+            IndicatorDB(id=1, name="SMA 3", type="sma", period=3, color="#fff", symbol="BTCUSDT", interval="1"),
+            IndicatorDB(id=2, name="BB 3", type="bbands", period=3, color="#0ff", symbol="BTCUSDT", interval="1"),
+        ])
+        yield values
+    memory.indicator_series.pop(2, None)
+
+
+def test_get_data_multi_output_definitions(bbands_history):
+    definitions = {d["id"]: d for d in client.get("/data").json()["indicators"]}
+
+    assert definitions["1"]["outputs"] == ["value"]
+    assert definitions["2"]["outputs"] == ["middle", "upper", "lower"]
+    assert definitions["2"]["warmup"] == 2
+
+
+def test_get_data_multi_output_rows(bbands_history):
+    rows = client.get("/data").json()["candles"]
+
+    assert rows[0]["indicators"]["2"] == [None, None, None]
+    assert rows[-1]["indicators"]["2"] == [9.0, 10.0, 8.0]
+
+
+def test_get_data_multi_output_columns(bbands_history):
+    indicators = client.get("/data", params={"format": "columns"}).json()["candles"]["indicators"]
+
+    assert indicators["1"][-1] == 7.0
+    assert indicators["2"]["middle"] == [None, None] + [float(i) for i in range(2, 10)]
+    assert indicators["2"]["upper"][-1] == 10.0
+    assert indicators["2"]["lower"][-1] == 8.0
+
+
+def test_get_data_multi_output_binary(bbands_history):
+    decoded = decode_binary(client.get("/data", params={"format": "binary"}).content)
+
+    assert list(decoded)[-3:] == ["indicator:2:middle", "indicator:2:upper", "indicator:2:lower"]
+    for index, name in enumerate(["middle", "upper", "lower"]):
+        np.testing.assert_array_equal(decoded[f"indicator:2:{name}"], bbands_history[:, index])
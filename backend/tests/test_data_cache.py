@@ -0,0 +1,221 @@
+import json
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+
+from app import app
+from models.indicator import IndicatorDB
+from services.data_cache import DataCache, get_data_cache
+from services.indicator_cache import indicator_cache
+from services.indicators import recalc_all_indicators, recalc_indicator
+from state.candle_store import CandleStore
+from state.memory import candles, indicator_values
+
+client = TestClient(app)
+
+
+def cache_counters():
+    return (
+        REGISTRY.get_sample_value('data_cache_hits_total'),
+        REGISTRY.get_sample_value('data_cache_misses_total'),
+    )
+
+
+# =========================
+# DataCache
+# =========================
+@pytest.mark.asyncio
+async def test_payload_built_once_per_version():
+    """Повторный запрос без изменений не пересобирает ответ"""
+    store = CandleStore(10)
+    cache = DataCache(store)
+    build = AsyncMock(return_value={"candles": []})
+
+    first = await cache.get(build)
+    second = await cache.get(build)
+
+    assert build.await_count == 1
+    assert first is second
+    assert json.loads(first.body) == {"candles": []}
+
+
+@pytest.mark.asyncio
+async def test_payload_rebuilt_after_change():
+    """Новые свечи и invalidate() сбрасывают кэш; ETag меняют только данные"""
+    store = CandleStore(10)
+    cache = DataCache(store)
+    build = AsyncMock(return_value={"candles": []})
+
+    first = await cache.get(build)
+    store.append({"timestamp": 1000, "close": 100})
+    second = await cache.get(build)
+    cache.invalidate()
+    third = await cache.get(build)
+
+    assert build.await_count == 3
+    assert first.etag != second.etag
+    assert second.etag == third.etag
+
+
+def test_etag_same_on_every_replica():
+    """Две реплики с одинаковыми свечами и определениями дают один ETag"""
+    records = [{"timestamp": 60_000 * i, "open": 1, "high": 2, "low": 0.5, "close": 1.5 + i} for i in range(5)]
+    first = DataCache(CandleStore.from_records(records, capacity=100), lambda: "defs")
+    second = DataCache(CandleStore.from_records(records[:3], capacity=100), lambda: "defs")
+    second.invalidate()
+    second._store.extend(records[3:])
+
+    assert first.etag() == second.etag()
+    assert first.etag("binary") == second.etag("binary")
+    assert second.not_modified(first.etag())
+
+
+def test_etag_follows_open_candle_and_definitions():
+    """Тик по открытой свече и смена определений индикаторов меняют ETag"""
+    definitions = {"version": "a"}
+    store = CandleStore.from_records([{"timestamp": 60_000, "close": 100.0}], capacity=10)
+    cache = DataCache(store, lambda: definitions["version"])
+    etag = cache.etag()
+    assert etag.startswith('"60000-')
+
+    store.upsert({"timestamp": 60_000, "close": 100.5})
+    ticked = cache.etag()
+    definitions["version"] = "b"
+
+    assert len({etag, ticked, cache.etag()}) == 3
+
+
+def test_etag_follows_data_window(monkeypatch):
+    """Начало окна /data входит в ETag: догруженная история меняет ответ"""
+    def records(start):
+        return [{"timestamp": 60_000 * i, "close": 1.0} for i in range(start, 10)]
+
+    cache = DataCache(CandleStore.from_records(records(5), capacity=10), lambda: "defs")
+    assert cache.etag() != DataCache(CandleStore.from_records(records(4), capacity=10), lambda: "defs").etag()
+
+    # Окно /data короче истории: более старые свечи на ответ не влияют
+    monkeypatch.setenv("DATA_WINDOW", "3")
+    windowed = DataCache(CandleStore.from_records(records(5), capacity=10), lambda: "defs")
+    assert windowed.etag() == DataCache(CandleStore.from_records(records(4), capacity=10), lambda: "defs").etag()
+
+
+# =========================
+# Сброс после пересчёта
+# =========================
+@pytest.mark.asyncio
+async def test_recalc_invalidates_only_its_series():
+    """Пересчёт индикаторов ряда сбрасывает ответ этого ряда, другие не трогает"""
+    btc, eth = ("BTCUSDT", "1"), ("ETHUSDT", "1")
+    stores = {key: CandleStore.from_records([{"timestamp": 60_000 * i, "close": 1.0 + i} for i in range(30)], 100)
+              for key in (btc, eth)}
+    ind = IndicatorDB(id=1, name="SMA", type="sma", period=3, color="#fff", symbol="BTCUSDT", interval="1")
+    session = AsyncMock()
+    session.execute.return_value = MagicMock(**{"scalars.return_value.all.return_value": [ind]})
+    session.__aenter__.return_value = session
+    sessions = MagicMock(return_value=MagicMock(return_value=session))
+    build = AsyncMock(return_value={"candles": []})
+    # Определения загружены заранее: их версия входит в ETag всех рядов
+    await indicator_cache.all(sessions)
+
+    with patch.dict('services.data_cache._caches', clear=True), \
+            patch.dict('state.memory.series', stores), \
+            patch('services.indicators.get_session_local', sessions), \
+            patch('services.indicators.indicator_values', {}), \
+            patch('services.indicators.indicator_streams', {}):
+        caches = {key: get_data_cache(*key) for key in (btc, eth)}
+        for recalc in (lambda: recalc_all_indicators(*btc), lambda: recalc_indicator(ind)):
+            for cache in caches.values():
+                await cache.get(build)
+            build.reset_mock()
+            await recalc()
+            for cache in caches.values():
+                await cache.get(build)
+
+            # ETH берётся из кэша, BTC пересобирается
+            assert build.await_count == 1
+
+
+# =========================
+# GET /data
+# =========================
+def test_get_data_served_from_cache(clear_memory, mock_sessionmaker):
+    """Повторный /data не ходит в БД и отдаёт тот же ETag"""
+    candles.append({"timestamp": 1000, "close": 100})
+
+    first = client.get("/data")
+    second = client.get("/data")
+
+    assert first.status_code == second.status_code == 200
+    assert first.headers["etag"] == second.headers["etag"]
+    assert first.content == second.content
+    assert mock_sessionmaker.execute.await_count == 1
+
+
+def test_get_data_rebuilt_after_indicator_delete(clear_memory, mock_sessionmaker):
+    """Удаление индикатора сбрасывает кэш"""
+    mock_sessionmaker.execute.return_value.scalars.return_value.all.return_value = [
+        IndicatorDB(id=1, name="SMA 3", type="sma", period=3, color="#fff", symbol="BTCUSDT", interval="1")
+    ]
+    candles.append({"timestamp": 1000, "close": 100})
+    indicator_values[1] = [100.0]
+
+    first = client.get("/data")
+    assert first.json()["candles"][0]["indicators"] == {"1": 100.0}
+
+    client.delete("/indicator/1")
+    second = client.get("/data")
+
+    assert second.headers["etag"] != first.headers["etag"]
+    assert second.json()["candles"][0]["indicators"] == {}
+
+
+# =========================
+# If-None-Match
+# =========================
+def test_get_data_not_modified_skips_database(clear_memory, mock_sessionmaker):
+    """Совпавший If-None-Match отвечает 304 без обращения к БД"""
+    candles.append({"timestamp": 1000, "close": 100})
+    etag = client.get("/data").headers["etag"]
+    mock_sessionmaker.reset_mock()
+
+    with patch('services.data_cache.DataCache.get', new=AsyncMock()) as mock_get:
+        response = client.get("/data", headers={"If-None-Match": etag})
+
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == etag
+    mock_sessionmaker.execute.assert_not_awaited()
+    mock_get.assert_not_awaited()
+
+
+def test_get_data_stale_etag_returns_full_response(clear_memory, mock_sessionmaker):
+    """После новых свечей старый ETag не подходит"""
+    candles.append({"timestamp": 1000, "close": 100})
+    etag = client.get("/data").headers["etag"]
+    candles.append({"timestamp": 2000, "close": 110})
+
+    response = client.get("/data", headers={"If-None-Match": etag})
+
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+    assert len(response.json()["candles"]) == 2
+
+
+@pytest.mark.parametrize("header_template", ['W/{}', '"other", {}', '*'])
+def test_not_modified_header_forms(header_template):
+    """Слабый ETag, список ETag и звёздочка"""
+    cache = DataCache(CandleStore(10))
+    assert cache.not_modified(header_template.format(cache.etag()))
+    assert not cache.not_modified('"other"')
+    assert not cache.not_modified(None)
+
+
+def test_dumps_numpy_nan_as_null():
+    """Массивы NumPy сериализуются напрямую, NaN и бесконечности - null"""
+    import numpy as np
+    from utils.serialization import dumps
+
+    body = dumps({"values": np.array([1.0, np.nan, -np.inf]), 1: float("nan")})
+    assert json.loads(body) == {"values": [1.0, None, None], "1": None}
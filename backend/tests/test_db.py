@@ -0,0 +1,60 @@
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from core import db
+
+
+@pytest.fixture
+def fresh_db_module():
+    """Сбрасывает закэшированные движок и фабрику сессий"""
+    saved = db._engine, db._session_local
+    db._engine, db._session_local = None, None
+    yield db
+    db._engine, db._session_local = saved
+
+
+def test_engine_created_once(fresh_db_module, monkeypatch):
+    """Повторные вызовы не создают новый движок и пул"""
+    monkeypatch.setenv("DATABASE_URL", "postgresql+asyncpg://user:secret@db:5432/crypto_db")
+    monkeypatch.setenv("DB_POOL_SIZE", "3")
+    monkeypatch.setenv("DB_MAX_OVERFLOW", "4")
+
+    with patch('core.db.create_async_engine', return_value=MagicMock()) as mock_create:
+        first = db.get_engine()
+        second = db.get_engine()
+        session_local = db.get_session_local()
+
+    assert first is second
+    assert session_local is db.get_session_local()
+    mock_create.assert_called_once()
+
+    options = mock_create.call_args.kwargs
+    assert options["pool_size"] == 3
+    assert options["max_overflow"] == 4
+    assert options["pool_pre_ping"] is True
+    assert options["pool_recycle"] == 1800
+
+
+def test_sqlite_without_pool_sizes(fresh_db_module, monkeypatch):
+    """Для SQLite настройки пула не передаются"""
+    monkeypatch.setenv("DATABASE_URL", "sqlite+aiosqlite:///./test.db")
+
+    with patch('core.db.create_async_engine', return_value=MagicMock()) as mock_create:
+        db.get_engine()
+
+    assert "pool_size" not in mock_create.call_args.kwargs
+
+
+@pytest.mark.asyncio
+async def test_dispose_engine(fresh_db_module):
+    """При остановке пул закрывается и кэш сбрасывается"""
+    engine = MagicMock()
+    engine.dispose = AsyncMock()
+    db._engine, db._session_local = engine, MagicMock()
+
+    await db.dispose_engine()
+
+    engine.dispose.assert_awaited_once()
+    assert db._engine is None
+    assert db._session_local is None
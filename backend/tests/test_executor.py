@@ -0,0 +1,122 @@
+import asyncio
+import time
+from unittest.mock import AsyncMock, patch
+
+import httpx
+import numpy as np
+import pytest
+
+from app import app
+from core import executor
+from models.indicator import IndicatorDB
+from services.indicators import calculate_batch, recalc_all_indicators
+from state import memory
+from state.candle_store import CandleStore
+from utils.constants import DEFAULT_SERIES
+from utils.indicator_calculator import IndicatorsCalculator
+
+
+@pytest.fixture
+def calc_executor(monkeypatch):
+    """Пул как в приложении; CALC_EXECUTOR задаётся тестом до вызова"""
+    created = []
+
+    def start(kind="thread", workers=2):
+        monkeypatch.setenv("CALC_EXECUTOR", kind)
+        monkeypatch.setenv("CALC_WORKERS", str(workers))
+        created.append(executor.init_executor())
+        return created[-1]
+
+    yield start
+    executor.shutdown_executor()
+
+
+def random_close(size, seed=11):
+    rng = np.random.default_rng(seed)
+    return 100 + np.cumsum(rng.normal(0, 1, size=size))
+
+
+# =========================
+# Пул
+# =========================
+@pytest.mark.asyncio
+async def test_run_cpu_without_pool():
+    """Вне lifespan задача уходит в пул цикла по умолчанию"""
+    assert executor.get_executor() is None
+    assert await executor.run_cpu(sum, [1, 2, 3]) == 6
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("kind", ["thread", "process"])
+async def test_calculate_batch_in_pool_matches_sync(calc_executor, kind):
+    calc_executor(kind)
+    close = random_close(2000)
+    specs = [("sma", 10), ("ema", 20), ("wma", 5), ("sma", 10)]
+
+    expected = IndicatorsCalculator.calculate_batch(close, specs)
+    actual = await calculate_batch(close, specs)
+
+    for a, e in zip(actual, expected):
+        np.testing.assert_allclose(a, e, equal_nan=True)
+
+
+def test_unknown_executor_kind(monkeypatch):
+    monkeypatch.setenv("CALC_EXECUTOR", "gpu")
+    with pytest.raises(ValueError):
+        executor.create_executor()
+
+
+@pytest.mark.asyncio
+async def test_large_batch_is_chunked(monkeypatch):
+    """Уникальные спецификации делятся на задачи по CALC_CHUNK_SIZE"""
+    monkeypatch.setenv("CALC_CHUNK_SIZE", "2")
+    specs = [("sma", p) for p in range(2, 7)] + [("sma", 2)]
+
+    with patch('services.indicators.run_cpu', wraps=executor.run_cpu) as mock_run:
+        results = await calculate_batch(random_close(100), specs)
+
+    assert mock_run.call_count == 3
+    assert [len(chunk) for _, _, chunk in (c.args for c in mock_run.call_args_list)] == [2, 2, 1]
+    np.testing.assert_array_equal(results[0], results[-1])
+
+
+# =========================
+# Отзывчивость во время пересчёта
+# =========================
+@pytest.mark.asyncio
+async def test_health_latency_flat_during_heavy_recompute(calc_executor):
+    """p99 /health во время тяжёлого пересчёта остаётся на уровне миллисекунд"""
+    calc_executor("thread", workers=2)
+    store = CandleStore(50_000)
+    store.extend_columns({"timestamp": np.arange(50_000) * 60_000.0, "close": random_close(50_000)})
+    indicators = [
+        IndicatorDB(id=i, type=("sma", "ema", "wma")[i % 3], period=5 + i, symbol="BTCUSDT", interval="1")
+        for i in range(150)
+    ]
+
+    async def probe(stop, latencies):
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            while not stop.is_set():
+                started = time.perf_counter()
+                response = await client.get("/health")
+                latencies.append(time.perf_counter() - started)
+                assert response.status_code == 200
+
+    latencies = []
+    stop = asyncio.Event()
+    with patch.dict(memory.series, {DEFAULT_SERIES: store}), \
+            patch('services.indicators.indicator_values', {}), \
+            patch('services.indicators.indicator_cache') as cache:
+        cache.all = AsyncMock(return_value=indicators)
+        prober = asyncio.create_task(probe(stop, latencies))
+        started = time.perf_counter()
+        await recalc_all_indicators()
+        duration = time.perf_counter() - started
+        stop.set()
+        await prober
+
+    p99 = float(np.percentile(latencies, 99))
+    # Пересчёт занял заметное время, а запросы всё это время обслуживались
+    assert len(latencies) >= 10
+    assert p99 < 0.1
+    assert p99 < duration / 3
@@ -0,0 +1,175 @@
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import app
+from models.indicator import IndicatorDB
+from services.data_cache import data_cache
+from services.indicator_cache import NOTIFY_CHANNEL, IndicatorCache, indicator_cache
+from state.memory import candles
+
+client = TestClient(app)
+
+
+def make_sessionmaker(indicators):
+    """Фабрика сессий, которая отдаёт заданный список индикаторов"""
+    mock_session = AsyncMock()
+    mock_result = MagicMock()
+    mock_result.scalars.return_value.all.return_value = indicators
+    mock_session.execute = AsyncMock(return_value=mock_result)
+    mock_session.add = MagicMock()
+    mock_session.__aenter__ = AsyncMock(return_value=mock_session)
+    mock_session.__aexit__ = AsyncMock(return_value=None)
+    return MagicMock(return_value=mock_session), mock_session
+
+
+# =========================
+# Кэш
+# =========================
+@pytest.mark.asyncio
+async def test_loaded_once():
+    """После загрузки список отдаётся без обращения к БД"""
+    cache = IndicatorCache()
+    sessionmaker, session = make_sessionmaker([IndicatorDB(id=1, name="SMA", type="sma", period=5)])
+
+    first = await cache.all(lambda: sessionmaker)
+    second = await cache.all(lambda: sessionmaker)
+
+    assert [ind.id for ind in first] == [1]
+    assert first == second
+    assert session.execute.await_count == 1
+
+
+@pytest.mark.asyncio
+async def test_write_through():
+    """put/remove меняют кэш без перечитывания"""
+    cache = IndicatorCache()
+    sessionmaker, session = make_sessionmaker([])
+    await cache.load(lambda: sessionmaker)
+
+    cache.put(IndicatorDB(id=5, name="EMA", type="ema", period=10))
+    assert [ind.id for ind in await cache.all(lambda: sessionmaker)] == [5]
+
+    cache.remove(5)
+    assert await cache.all(lambda: sessionmaker) == []
+    assert session.execute.await_count == 1
+
+
+def test_fingerprint_follows_sources():
+    """Смена источника меняет значения индикатора, а значит и ETag /data"""
+    cache = IndicatorCache()
+    cache.put(IndicatorDB(id=1, name="RSI", type="rsi", period=14))
+    cache.put(IndicatorDB(id=2, name="SMA", type="sma", period=5))
+    cache.put(IndicatorDB(id=3, name="EMA", type="ema", period=9))
+    before = cache.fingerprint()
+
+    cache.put(IndicatorDB(id=3, name="EMA", type="ema", period=9, sources={"close": {"id": 1, "output": None}}))
+    from_rsi = cache.fingerprint()
+    cache.put(IndicatorDB(id=3, name="EMA", type="ema", period=9, sources={"close": {"output": None, "id": 1}}))
+    assert cache.fingerprint() == from_rsi
+
+    cache.put(IndicatorDB(id=3, name="EMA", type="ema", period=9, sources={"close": {"id": 2, "output": None}}))
+    assert len({before, from_rsi, cache.fingerprint()}) == 3
+
+
+@pytest.mark.asyncio
+async def test_notify_only_for_postgres():
+    cache = IndicatorCache()
+    session = AsyncMock()
+
+    session.bind.dialect.name = "sqlite"
+    await cache.notify(session)
+    session.execute.assert_not_awaited()
+
+    session.bind.dialect.name = "postgresql"
+    await cache.notify(session)
+    params = session.execute.call_args.args[1]
+    assert params == {"channel": NOTIFY_CHANNEL, "payload": cache._token}
+
+
+@pytest.mark.asyncio
+async def test_foreign_notification_triggers_reload():
+    """Уведомление другой реплики перезагружает кэш, своё игнорируется"""
+    cache = IndicatorCache()
+    cache.loaded = True
+    cache._on_change = AsyncMock()
+
+    cache._on_notify(None, 1, NOTIFY_CHANNEL, cache._token)
+    await asyncio.sleep(0)
+    cache._on_change.assert_not_awaited()
+    assert cache.loaded
+
+    cache._on_notify(None, 1, NOTIFY_CHANNEL, "other-replica")
+    # Перезагрузка держится в кэше, пока не закончится
+    assert len(cache._tasks) == 1
+    await asyncio.sleep(0)
+    cache._on_change.assert_awaited_once()
+    # Колбэк завершения задачи выполняется на следующем шаге цикла
+    await asyncio.sleep(0)
+    assert not cache._tasks
+    assert not cache.loaded
+
+
+@pytest.mark.asyncio
+async def test_lost_listener_falls_back_to_database():
+    """Без LISTEN каждое обращение читает БД"""
+    cache = IndicatorCache()
+    sessionmaker, session = make_sessionmaker([])
+    cache._on_change = AsyncMock()
+    cache._listener = MagicMock()
+    await cache.all(lambda: sessionmaker)
+
+    cache._on_terminate(cache._listener)
+    await cache.all(lambda: sessionmaker)
+    await cache.all(lambda: sessionmaker)
+
+    assert session.execute.await_count == 3
+
+
+@pytest.mark.asyncio
+async def test_listen_skipped_for_sqlite():
+    cache = IndicatorCache()
+    with patch('services.indicator_cache.asyncpg.connect') as mock_connect:
+        await cache.listen("sqlite+aiosqlite:///./test.db", AsyncMock())
+    mock_connect.assert_not_called()
+
+
+# =========================
+# Маршруты
+# =========================
+def test_get_data_reads_definitions_from_cache(clear_memory):
+    """Чтение /data не ходит в БД даже после изменения данных"""
+    indicator = IndicatorDB(id=1, name="SMA 14", type="sma", period=14, color="#FF0000")
+    sessionmaker, session = make_sessionmaker([indicator])
+
+    with patch('api.indicator_routes.get_session_local', return_value=sessionmaker):
+        assert len(client.get("/data").json()["indicators"]) == 1
+
+        candles.append({"timestamp": 1000, "close": 100})
+        data_cache.invalidate()
+        response = client.get("/data")
+
+    assert len(response.json()["indicators"]) == 1
+    assert session.execute.await_count == 1
+
+
+def test_crud_updates_cache(clear_memory):
+    """Создание и удаление индикатора сразу видны в кэше"""
+    sessionmaker, session = make_sessionmaker([])
+
+    async def refresh(instance):
+        instance.id = 42
+    session.refresh = AsyncMock(side_effect=refresh)
+
+    with patch('api.indicator_routes.get_session_local', return_value=sessionmaker):
+        client.get("/data")
+        client.post("/indicator", json={"name": "EMA 50", "type": "ema", "period": 50})
+        names = [ind["name"] for ind in client.get("/data").json()["indicators"]]
+        assert names == ["EMA 50"]
+
+        client.delete("/indicator/42")
+        assert client.get("/data").json()["indicators"] == []
+
+    assert indicator_cache.loaded
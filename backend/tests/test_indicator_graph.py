@@ -0,0 +1,352 @@
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from app import app
+from models.indicator import IndicatorDB
+from services.indicator_cache import indicator_cache
+from services.indicators import recalc_all_indicators
+from state.candle_store import CandleStore
+from state.memory import series
+from utils.columnar import align_end
+from utils.constants import DEFAULT_SERIES, Indicators
+from utils.indicator_calculator import IndicatorsCalculator
+from utils.indicator_graph import IndicatorGraph
+from utils.indicator_stream import IndicatorStream
+
+client = TestClient(app)
+
+
+def indicator(ind_id, ind_type, period=14, sources=None, symbol="BTCUSDT"):
+    return IndicatorDB(
+        id=ind_id, name=f"{ind_type} {period}", type=ind_type, period=period, color="#fff",
+        symbol=symbol, interval="1", sources=sources
+    )
+
+
+def source(ind_id, output=None):
+    return {"id": ind_id, "output": output}
+
+
+def session_with(indicators):
+    mock_session = MagicMock()
+    mock_result = MagicMock()
+    mock_result.scalars().all.return_value = indicators
+
+    async def execute(*args, **kwargs):
+        return mock_result
+
+    mock_session.execute = execute
+    mock_session_local = MagicMock()
+    mock_session_local.return_value.__aenter__.return_value = mock_session
+    return mock_session_local
+
+
+def ticks(count, seed=9):
+    rng = np.random.default_rng(seed)
+    close = 100 + np.cumsum(rng.normal(0, 1, size=count))
+    return [{"timestamp": 60_000.0 * i, "close": float(v), "volume": 1.0} for i, v in enumerate(close)]
+
+
+def composed(values, ind_type, period):
+    """Эталон индикатора над индикатором: расчёт по источнику без его прогрева"""
+    first = int(np.argmax(~np.isnan(values)))
+    result = np.asarray(IndicatorsCalculator.calculate(ind_type, values[first:], period), dtype=float)
+    return np.concatenate([np.full(first, np.nan), result])
+
+
+# =========================
+# Построение графа
+# =========================
+def test_common_subexpressions_share_node():
+    """Одинаковые выражения из разных индикаторов - один узел"""
+    graph = IndicatorGraph([
+        indicator(1, "rsi", 14),
+        indicator(2, "rsi", 14),
+        indicator(3, "ema", 9, {"close": source(1)}),
+        indicator(4, "ema", 9, {"close": source(2)}),
+        indicator(5, "ema", 9),
+    ])
+
+    assert graph.nodes[1] == graph.nodes[2]
+    assert graph.nodes[3] == graph.nodes[4]
+    assert graph.nodes[3] != graph.nodes[5]
+    assert len(graph.order) == 3
+    assert graph.order.index(graph.nodes[1]) < graph.order.index(graph.nodes[3])
+    assert graph.errors == {}
+
+
+def test_sources_in_any_order():
+    """Источник может идти в списке после индикатора, который его использует"""
+    graph = IndicatorGraph([
+        indicator(3, "crossover", sources={"fast": source(1), "slow": source(2)}),
+        indicator(1, "ema", 12),
+        indicator(2, "ema", 26),
+    ])
+
+    cross = graph.nodes[3]
+    assert graph.order[-1] == cross
+    assert set(cross.upstream) == {graph.nodes[1], graph.nodes[2]}
+    assert graph.levels(graph.order) == [graph.order[:2], [cross]]
+
+
+@pytest.mark.parametrize("indicators, broken, message", [
+    ([indicator(1, "ema", 9, {"close": source(2)}), indicator(2, "sma", 5, {"close": source(1)})],
+     {1, 2}, "cycle"),
+    ([indicator(1, "ema", 9, {"close": source(7)})], {1}, "not found"),
+    ([indicator(1, "sma", 5, symbol="ETHUSDT"), indicator(2, "ema", 9, {"close": source(1)})],
+     {2}, "another series"),
+    ([indicator(1, "macd", 12), indicator(2, "ema", 9, {"close": source(1, "value")})], {2}, "no output"),
+    ([indicator(1, "sma", 5, {"volume": source(1)})], {1}, "no inputs"),
+    ([indicator(1, "crossover")], {1}, "needs a source"),
+    ([indicator(1, "rsi", 14), indicator(2, "ema", 9, {"close": source(3)}),
+      indicator(3, "sma", 3, {"close": source(2)})], {2, 3}, "cycle"),
+])
+def test_invalid_sources(indicators, broken, message):
+    graph = IndicatorGraph(indicators)
+
+    assert set(graph.errors) == broken
+    assert all(message in error for error in graph.errors.values())
+    assert set(graph.nodes) == {ind.id for ind in indicators} - broken
+
+
+def test_dependents_and_warmup():
+    graph = IndicatorGraph([
+        indicator(1, "rsi", 14),
+        indicator(2, "ema", 9, {"close": source(1)}),
+        indicator(3, "sma", 5, {"close": source(2)}),
+        indicator(4, "macd", 12),
+        indicator(5, "sma", 3, {"close": source(4, "signal")}),
+    ])
+
+    assert graph.dependents(1) == {1, 2, 3}
+    assert graph.dependents(3) == {3}
+    assert graph.warmup(graph.nodes[3]) == 14 + 0 + 4
+    assert graph.warmup(graph.nodes[5]) == 2
+    assert graph.nodes[5].bindings[0][1] == (graph.nodes[4], 1)
+
+
+# =========================
+# Пересчёт
+# =========================
+@pytest.fixture
+def store():
+    return CandleStore.from_records(ticks(300), capacity=1000)
+
+
+INDICATORS = [
+    indicator(1, "rsi", 14),
+    indicator(2, "ema", 9, {"close": source(1)}),
+    indicator(3, "ema", 5),
+    indicator(4, "ema", 20),
+    indicator(5, "crossover", 1, {"fast": source(3), "slow": source(4)}),
+    indicator(6, "sma", 4, {"close": source(4)}),
+    indicator(7, "ema", 9, {"close": source(1)}),
+    indicator(8, "sma", 3, {"close": source(5, "diff")}),
+]
+
+
+def expected_values(close):
+    rsi = np.asarray(IndicatorsCalculator.calculate("rsi", close, 14), dtype=float)
+    fast = np.asarray(IndicatorsCalculator.calculate("ema", close, 5), dtype=float)
+    slow = np.asarray(IndicatorsCalculator.calculate("ema", close, 20), dtype=float)
+    cross = IndicatorsCalculator.calculate("crossover", {"fast": fast, "slow": slow}, 1)
+    return {
+        1: rsi,
+        2: composed(rsi, "ema", 9),
+        5: cross,
+        6: composed(slow, "sma", 4),
+        7: composed(rsi, "ema", 9),
+        8: composed(cross[:, 0], "sma", 3),
+    }
+
+
+def assert_values(values, expected):
+    for ind_id, expected_values in expected.items():
+        np.testing.assert_allclose(values[ind_id], expected_values, rtol=1e-9, equal_nan=True)
+
+
+@pytest.mark.asyncio
+async def test_recalc_composed_indicators(store):
+    values = {}
+    with patch('services.indicators.get_session_local', return_value=session_with(INDICATORS)), \
+            patch.dict(series, {DEFAULT_SERIES: store}), \
+            patch('services.indicators.indicator_values', values), \
+            patch('services.indicators.indicator_streams', {}), \
+            patch.object(IndicatorsCalculator, 'calculate', wraps=IndicatorsCalculator.calculate) as mock_calculate:
+        await recalc_all_indicators()
+
+    assert_values(values, expected_values(store.column("close")))
+    # EMA(9) от RSI у двух индикаторов - один расчёт
+    assert mock_calculate.call_count == 7
+
+
+@pytest.mark.asyncio
+async def test_incremental_composed_matches_full():
+    """Поток тиков по графу даёт те же значения, что и полный пересчёт"""
+    candles = ticks(260)
+    store = CandleStore(1000)
+    values = {}
+    streams = {}
+
+    def merge(rows):
+        return store.merge({name: [c[name] for c in rows] for name in ("timestamp", "close", "volume")})
+
+    with patch('services.indicators.get_session_local', return_value=session_with(INDICATORS)), \
+            patch.dict(series, {DEFAULT_SERIES: store}), \
+            patch('services.indicators.indicator_values', values), \
+            patch('services.indicators.indicator_streams', streams):
+        await recalc_all_indicators(*DEFAULT_SERIES, merge(candles[:60]))
+        for i in range(60, 260):
+            forming = dict(candles[i], close=candles[i]["close"] + 0.5)
+            await recalc_all_indicators(*DEFAULT_SERIES, merge(candles[i - 3:i] + [forming]))
+            await recalc_all_indicators(*DEFAULT_SERIES, merge(candles[i - 3:i + 1]))
+
+    assert_values(values, expected_values(store.column("close")))
+    assert len(streams) == 7
+
+
+@pytest.mark.asyncio
+async def test_incremental_values_follow_streams_when_store_rolls():
+    """Хвост дописывается к прошлым значениям, даже когда окно хранилища сдвигается"""
+    candles = ticks(200)
+    store = CandleStore(50)
+    values = {}
+    streams = {}
+
+    with patch('services.indicators.get_session_local', return_value=session_with(INDICATORS)), \
+            patch.dict(series, {DEFAULT_SERIES: store}), \
+            patch('services.indicators.indicator_values', values), \
+            patch('services.indicators.indicator_streams', streams):
+        for i in range(40, 200, 3):
+            changed = store.merge({name: [c[name] for c in candles[i - 3:i]] for name in ("timestamp", "close", "volume")})
+            await recalc_all_indicators(*DEFAULT_SERIES, changed)
+
+    for stream, _, _, result in streams.values():
+        np.testing.assert_array_equal(result, align_end(stream.series(), len(store)))
+
+
+@pytest.mark.asyncio
+async def test_unchanged_nodes_are_skipped(store):
+    """Открытая свеча сдвинулась, а входы узла нет: поток узла не трогается"""
+    indicators = [
+        indicator(1, "min", 20),
+        indicator(2, "ema", 9, {"close": source(1)}),
+        indicator(3, "vwap", 5),
+    ]
+    values = {}
+
+    with patch('services.indicators.get_session_local', return_value=session_with(indicators)), \
+            patch.dict(series, {DEFAULT_SERIES: store}), \
+            patch('services.indicators.indicator_values', values), \
+            patch('services.indicators.indicator_streams', {}):
+        await recalc_all_indicators(*DEFAULT_SERIES, len(store) - 1)
+        before = dict(values)
+
+        # Рост цены не меняет минимум окна: EMA от минимума не пересчитывается
+        last = store[-1]
+        store.upsert(dict(last, close=last["close"] + 0.1))
+        with patch.object(IndicatorStream, 'update', autospec=True, side_effect=IndicatorStream.update) as mock_update:
+            await recalc_all_indicators(*DEFAULT_SERIES, len(store) - 1)
+        updated = {stream.ind_type for stream, *_ in (call.args for call in mock_update.call_args_list)}
+        assert updated == {Indicators.MIN, Indicators.VWAP}
+        assert values[2] is before[2]
+
+        # Изменился только объём: узлы по close пропускаются целиком
+        store.upsert(dict(store[-1], volume=5.0))
+        with patch.object(IndicatorStream, 'update', autospec=True, side_effect=IndicatorStream.update) as mock_update:
+            await recalc_all_indicators(*DEFAULT_SERIES, len(store) - 1)
+        updated = {stream.ind_type for stream, *_ in (call.args for call in mock_update.call_args_list)}
+        assert updated == {Indicators.VWAP}
+
+    close = store.column("close")
+    minimum = np.asarray(IndicatorsCalculator.calculate("min", close, 20), dtype=float)
+    np.testing.assert_allclose(values[2], composed(minimum, "ema", 9), rtol=1e-9, equal_nan=True)
+
+
+@pytest.mark.asyncio
+async def test_broken_source_leaves_others(store):
+    indicators = [indicator(1, "ema", 9, {"close": source(2)}), indicator(3, "sma", 5)]
+    values = {}
+    with patch('services.indicators.get_session_local', return_value=session_with(indicators)), \
+            patch.dict(series, {DEFAULT_SERIES: store}), \
+            patch('services.indicators.indicator_values', values), \
+            patch('services.indicators.indicator_streams', {}):
+        await recalc_all_indicators()
+
+    assert len(values[1]) == 0
+    assert len(values[3]) == len(store)
+
+
+# =========================
+# API
+# =========================
+@pytest.fixture
+def cached_indicators():
+    indicator_cache.put(indicator(1, "rsi", 14))
+    indicator_cache.put(indicator(2, "ema", 9, {"close": source(1)}))
+    indicator_cache.loaded = True
+    yield
+
+
+def test_create_with_missing_source(cached_indicators):
+    response = client.post("/indicator", json={
+        "name": "EMA", "type": "ema", "period": 9, "sources": {"close": {"id": 42}}
+    })
+    assert response.status_code == 400
+    assert "not found" in response.json()["detail"]
+
+
+def test_create_crossover_without_sources(cached_indicators):
+    response = client.post("/indicator", json={"name": "Cross", "type": "crossover", "period": 1})
+    assert response.status_code == 400
+
+
+def test_create_with_unknown_source_input(cached_indicators):
+    response = client.post("/indicator", json={
+        "name": "EMA", "type": "ema", "period": 9, "sources": {"high": {"id": 1}}
+    })
+    assert response.status_code == 400
+
+
+def update(ind, json):
+    mock_session = MagicMock()
+    mock_result = MagicMock()
+    mock_result.scalar_one_or_none.return_value = ind
+
+    async def execute(*args, **kwargs):
+        return mock_result
+
+    mock_session.execute = execute
+    mock_sessionmaker = MagicMock()
+    mock_sessionmaker.return_value.__aenter__.return_value = mock_session
+
+    with patch('api.indicator_routes.get_session_local', return_value=mock_sessionmaker):
+        return client.put(f"/indicator/{ind.id}", json=json)
+
+
+def test_update_creates_cycle(cached_indicators):
+    response = update(indicator(1, "rsi", 14), {"sources": {"close": {"id": 2}}})
+
+    assert response.status_code == 400
+    assert "cycle" in response.json()["detail"]
+
+
+def test_update_breaks_dependent(cached_indicators):
+    """Изменение источника, после которого зависимый индикатор не считается, - 409"""
+    indicator_cache.put(indicator(3, "macd", 12))
+    indicator_cache.put(indicator(4, "ema", 9, {"close": source(3, "signal")}))
+
+    response = update(indicator(3, "macd", 12), {"type": "bbands"})
+
+    assert response.status_code == 409
+    assert "4" in response.json()["detail"] and "signal" in response.json()["detail"]
+    assert indicator_cache.cached()[2].type == "macd"
+
+
+def test_delete_source_of_other_indicator(cached_indicators):
+    response = client.delete("/indicator/1")
+    assert response.status_code == 409
+    assert "2" in response.json()["detail"]
@@ -0,0 +1,220 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from tests.conftest import assert_parity
+from utils.accumulators import BbandsAccumulator, StochAccumulator, macd_periods
+from utils.columnar import align
+from utils.constants import Indicators
+from utils.indicator_calculator import IndicatorsCalculator
+from utils.indicator_registry import REGISTRY, get_definition
+from utils.indicator_stream import IndicatorStream
+
+
+# =========================
+# Фикстуры
+# =========================
+@pytest.fixture
+def ohlcv():
+    """Случайные минутные свечи BTC с ненулевым объёмом.
+
+    fast и slow - входы CROSSOVER, которые обычно идут из других индикаторов.
+    """
+    rng = np.random.default_rng(11)
+    close = 50000 + np.cumsum(rng.normal(0, 25, size=800))
+    open_ = np.concatenate(([close[0]], close[:-1]))
+    spread = np.abs(rng.normal(0, 10, size=len(close)))
+    return {
+        "open": open_,
+        "high": np.maximum(open_, close) + spread,
+        "low": np.minimum(open_, close) - spread,
+        "close": close,
+        "volume": rng.uniform(1, 20, size=len(close)),
+        "fast": close,
+        "slow": open_,
+    }
+
+
+def calculate(ind_type, columns, period):
+    return np.asarray(IndicatorsCalculator.calculate(ind_type, columns, period), dtype=float)
+
+
+def stream_rows(ind_type, columns):
+    definition = get_definition(ind_type)
+    if len(definition.inputs) == 1:
+        return columns[definition.inputs[0]]
+    return np.column_stack([columns[name] for name in definition.inputs])
+
+
+# =========================
+# Паритет с эталоном на pandas и циклах
+# =========================
+@pytest.mark.parametrize("period", [2, 14])
+def test_rsi_matches_pandas(ohlcv, period):
+    delta = pd.Series(ohlcv["close"]).diff()
+    gain = delta.clip(lower=0)
+    loss = -delta.clip(upper=0)
+
+    def smooth(series):
+        # Затравка - среднее первых period изменений, дальше ewm Уайлдера
+        seeded = series.copy()
+        seeded.iloc[:period] = np.nan
+        seeded.iloc[period] = series.iloc[1:period + 1].mean()
+        return seeded.ewm(alpha=1 / period, adjust=False, ignore_na=True).mean().where(seeded.index >= period)
+
+    expected = 100 - 100 / (1 + smooth(gain) / smooth(loss))
+    assert_parity(calculate(Indicators.RSI, ohlcv, period), expected)
+
+
+def test_rsi_flat_and_rising():
+    assert calculate(Indicators.RSI, np.full(10, 5.0), 3)[-1] == 50.0
+    assert calculate(Indicators.RSI, np.arange(10.0), 3)[-1] == 100.0
+
+
+@pytest.mark.parametrize("period", [3, 12])
+def test_macd_matches_pandas(ohlcv, period):
+    fast, slow, signal_period = macd_periods(period)
+    close = pd.Series(ohlcv["close"])
+    line = close.ewm(span=fast, adjust=False).mean() - close.ewm(span=slow, adjust=False).mean()
+    signal = line.ewm(span=signal_period, adjust=False).mean()
+
+    values = calculate(Indicators.MACD, ohlcv, period)
+    assert values.shape == (len(close), 3)
+    assert_parity(values, np.column_stack([line, signal, line - signal]))
+
+
+def test_macd_periods_classic():
+    assert macd_periods(12) == (12, 26, 9)
+    fast, slow, signal = macd_periods(1)
+    assert slow > fast and signal >= 1
+
+
+@pytest.mark.parametrize("period", [5, 20])
+def test_bbands_matches_pandas(ohlcv, period):
+    close = pd.Series(ohlcv["close"])
+    middle = close.rolling(period).mean()
+    deviation = BbandsAccumulator.width * close.rolling(period).std(ddof=0)
+
+    assert_parity(calculate(Indicators.BBANDS, ohlcv, period),
+                  np.column_stack([middle, middle + deviation, middle - deviation]), rtol=1e-7)
+
+
+@pytest.mark.parametrize("period", [1, 14])
+def test_atr_matches_loop(ohlcv, period):
+    high, low, close = ohlcv["high"], ohlcv["low"], ohlcv["close"]
+    ranges = [high[0] - low[0]] + [
+        max(high[i] - low[i], abs(high[i] - close[i - 1]), abs(low[i] - close[i - 1]))
+        for i in range(1, len(close))
+    ]
+    expected = [np.nan] * (period - 1) + [np.mean(ranges[:period])]
+    for value in ranges[period:]:
+        expected.append((expected[-1] * (period - 1) + value) / period)
+
+    assert_parity(calculate(Indicators.ATR, ohlcv, period), expected)
+
+
+@pytest.mark.parametrize("period", [1, 10])
+def test_vwap_matches_pandas(ohlcv, period):
+    frame = pd.DataFrame(ohlcv)
+    typical = (frame["high"] + frame["low"] + frame["close"]) / 3
+    expected = (typical * frame["volume"]).rolling(period).sum() / frame["volume"].rolling(period).sum()
+
+    assert_parity(calculate(Indicators.VWAP, ohlcv, period), expected)
+
+
+def test_vwap_zero_volume_is_nan():
+    columns = {name: np.full(5, 10.0) for name in ("high", "low", "close")}
+    columns["volume"] = np.zeros(5)
+    assert np.isnan(calculate(Indicators.VWAP, columns, 2)).all()
+
+
+@pytest.mark.parametrize("period", [5, 14])
+def test_stoch_matches_pandas(ohlcv, period):
+    frame = pd.DataFrame(ohlcv)
+    lowest = frame["low"].rolling(period).min()
+    highest = frame["high"].rolling(period).max()
+    k = 100 * (frame["close"] - lowest) / (highest - lowest)
+    d = k.rolling(StochAccumulator.smoothing).mean()
+
+    assert_parity(calculate(Indicators.STOCH, ohlcv, period), np.column_stack([k, d]))
+
+
+def test_crossover_signs():
+    fast = np.array([1.0, 2.0, 3.0, 2.0, 1.0, 1.0, 3.0])
+    slow = np.full(7, 2.0)
+    values = calculate(Indicators.CROSSOVER, {"fast": fast, "slow": slow}, 1)
+
+    np.testing.assert_array_equal(values[:, 0], fast - slow)
+    np.testing.assert_array_equal(values[:, 1], [0, 0, 1, 0, -1, 0, 1])
+
+
+def test_missing_input_column(ohlcv):
+    """ATR по одному close посчитать нельзя: ошибка логируется, результат пустой"""
+    assert IndicatorsCalculator.calculate(Indicators.ATR, ohlcv["close"], 14) == []
+
+
+# =========================
+# Описания в реестре
+# =========================
+def test_every_indicator_is_registered():
+    assert set(REGISTRY) == set(Indicators)
+    assert all(definition.accumulator is not None for definition in REGISTRY.values())
+
+
+@pytest.mark.parametrize("ind_type", list(Indicators))
+@pytest.mark.parametrize("period", [1, 3, 14])
+def test_warmup_matches_leading_nans(ohlcv, ind_type, period):
+    definition = get_definition(ind_type)
+    values = calculate(ind_type, ohlcv, period)
+    if values.ndim == 1:
+        values = values[:, None]
+
+    assert values.shape == (len(ohlcv["close"]), len(definition.outputs))
+    # Пока идёт прогрев, хотя бы один выход ещё NaN (у STOCH %K готов раньше %D)
+    warmup = definition.warmup(period)
+    assert np.isnan(values[:warmup]).any(axis=1).all()
+    assert not np.isnan(values[warmup:]).any()
+
+
+# =========================
+# Поток против пакетного расчёта
+# =========================
+@pytest.mark.parametrize("ind_type", list(Indicators))
+@pytest.mark.parametrize("period", [1, 3, 14])
+def test_stream_matches_batch(ohlcv, ind_type, period):
+    rows = stream_rows(ind_type, ohlcv)
+    stream = IndicatorStream(ind_type, period)
+    stream.update(rows[:500])
+    stream.update(rows[500:-1], forming=rows[-1])
+
+    assert_parity(stream.series(), calculate(ind_type, ohlcv, period), rtol=1e-7)
+
+
+@pytest.mark.parametrize("ind_type", list(Indicators))
+def test_stream_forming_candle_matches_batch(ohlcv, ind_type):
+    """Несколько тиков по формирующейся свече не меняют закрытую историю"""
+    rows = stream_rows(ind_type, ohlcv)
+    stream = IndicatorStream(ind_type, 7)
+    stream.update(rows[:300])
+
+    for shift in [0.0, 12.5, -30.0]:
+        columns = {name: values[:301].copy() for name, values in ohlcv.items()}
+        for name in ("high", "low", "close"):
+            columns[name][-1] += shift
+        columns["fast"] = columns["close"]
+        stream.update(forming=stream_rows(ind_type, columns)[-1])
+        assert_parity(stream.series(), calculate(ind_type, columns, 7), rtol=1e-7)
+
+
+# =========================
+# align для индикаторов с несколькими выходами
+# =========================
+def test_align_two_dimensional():
+    values = np.arange(6.0).reshape(3, 2)
+
+    padded = align(values, 5)
+    assert padded.shape == (5, 2)
+    np.testing.assert_array_equal(padded[:3], values)
+    assert np.isnan(padded[3:]).all()
+
+    assert align(values, 2).shape == (2, 2)
@@ -0,0 +1,152 @@
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from tests.conftest import assert_parity
+from utils.constants import Indicators
+from utils.indicator_calculator import IndicatorsCalculator
+from utils.indicator_stream import (
+    EmaAccumulator,
+    IndicatorAccumulator,
+    IndicatorStream,
+    SmaAccumulator,
+    WmaAccumulator,
+)
+
+
+# =========================
+# Фикстуры
+# =========================
+@pytest.fixture
+def random_closes():
+    """Случайное блуждание цены, похожее на минутные свечи BTC"""
+    rng = np.random.default_rng(42)
+    return 50000 + np.cumsum(rng.normal(0, 25, size=2500))
+
+
+def reference(ind_type, closes, period):
+    """Эталонный расчёт через pandas"""
+    return np.asarray(
+        IndicatorsCalculator.calculate(ind_type, pd.Series(closes), period),
+        dtype=float,
+    )
+
+
+# =========================
+# Паритет с pandas
+# =========================
+@pytest.mark.parametrize("ind_type", [Indicators.SMA, Indicators.EMA, Indicators.WMA])
+@pytest.mark.parametrize("period", [1, 2, 5, 14, 50, 200])
+def test_stream_matches_pandas(random_closes, ind_type, period):
+    """Поток по одной свече совпадает с полным пересчётом"""
+    stream = IndicatorStream(ind_type, period)
+    for value in random_closes:
+        stream.update([value])
+
+    assert_parity(stream.series(), reference(ind_type, random_closes, period))
+
+
+@pytest.mark.parametrize("ind_type", [Indicators.SMA, Indicators.EMA, Indicators.WMA])
+def test_stream_matches_pandas_in_chunks(random_closes, ind_type):
+    """Подача свечей пачками разного размера даёт тот же ряд"""
+    stream = IndicatorStream(ind_type, 20)
+    start = 0
+    for size in [100, 1, 7, 0, 393, 1999]:
+        stream.update(random_closes[start:start + size])
+        start += size
+
+    assert_parity(stream.series(), reference(ind_type, random_closes, 20))
+
+
+@pytest.mark.parametrize("ind_type", [Indicators.SMA, Indicators.EMA, Indicators.WMA])
+@pytest.mark.parametrize("period", [3, 14])
+def test_forming_candle_matches_pandas(random_closes, ind_type, period):
+    """Формирующаяся свеча пересчитывается без изменения закрытой истории"""
+    closed = random_closes[:300]
+    stream = IndicatorStream(ind_type, period)
+    stream.update(closed)
+
+    # Несколько тиков по незакрытой свече
+    for tick in [50010.0, 49990.5, 50003.25]:
+        new_values = stream.update(forming=tick)
+        expected = reference(ind_type, np.append(closed, tick), period)
+
+        assert len(new_values) == 1
+        assert_parity(stream.series(), expected)
+
+    # Свеча закрылась и пришла следующая формирующаяся
+    stream.update([50003.25], forming=50020.0)
+    expected = reference(ind_type, np.append(closed, [50003.25, 50020.0]), period)
+    assert_parity(stream.series(), expected)
+
+
+@pytest.mark.parametrize("ind_type", [Indicators.SMA, Indicators.WMA])
+def test_forming_candle_during_warmup(ind_type):
+    """Формирующаяся свеча, которая завершает окно прогрева"""
+    closes = [10.0, 12.0, 11.0, 13.0]
+    stream = IndicatorStream(ind_type, 5)
+    stream.update(closes[:3], forming=closes[3])
+    assert math.isnan(stream.series()[-1])
+
+    stream.update(closes[3:], forming=15.0)
+    assert_parity(stream.series(), reference(ind_type, closes + [15.0], 5))
+
+
+def test_long_history_does_not_drift():
+    """Пересинхронизация сумм держит точность на длинной истории"""
+    rng = np.random.default_rng(7)
+    closes = 60000 + np.cumsum(rng.normal(0, 50, size=20000))
+
+    for ind_type in [Indicators.SMA, Indicators.WMA]:
+        stream = IndicatorStream(ind_type, 30)
+        stream.update(closes)
+        assert_parity(stream.series(), reference(ind_type, closes, 30))
+
+
+# =========================
+# Аккумуляторы
+# =========================
+def test_peek_does_not_change_state():
+    """peek() не влияет на последующие push()"""
+    for accumulator_cls in [SmaAccumulator, EmaAccumulator, WmaAccumulator]:
+        plain = accumulator_cls(3)
+        peeked = accumulator_cls(3)
+        for value in [1.0, 2.0, 3.0, 4.0]:
+            peeked.peek(value * 10)
+            assert plain.push(value) == pytest.approx(peeked.push(value), nan_ok=True)
+
+
+def test_invalid_period():
+    """Неположительный период не принимается"""
+    with pytest.raises(ValueError):
+        SmaAccumulator(0)
+
+
+def test_accumulator_requires_push_and_peek():
+    """Базовый аккумулятор и наследник без peek() не создаются"""
+    class PushOnly(IndicatorAccumulator):
+        def push(self, value):
+            return value
+
+    with pytest.raises(TypeError):
+        IndicatorAccumulator(3)
+    with pytest.raises(TypeError):
+        PushOnly(3)
+
+
+def test_unknown_indicator_type():
+    """Неизвестный тип индикатора"""
+    with pytest.raises(ValueError):
+        IndicatorStream("invalid_type", 14)
+
+
+def test_max_history_trims_old_values(random_closes):
+    """Старые значения отбрасываются, хвост совпадает с полным расчётом"""
+    stream = IndicatorStream(Indicators.SMA, 10, max_history=100)
+    stream.update(random_closes)
+
+    series = stream.series()
+    assert len(series) <= 200
+    assert_parity(series, reference(Indicators.SMA, random_closes, 10)[-len(series):])
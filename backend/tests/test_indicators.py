@@ -8,7 +8,9 @@ from services.indicators import IndicatorsCalculator
 from services.indicators import clean
 from services.indicators import recalc_all_indicators
 from services.indicators import recalc_indicator
-from utils.constants import Indicators
+from state.candle_store import CandleStore
+from state.memory import series
+from utils.constants import DEFAULT_SERIES, Indicators
 
 
 # --------------------------
@@ -24,9 +26,10 @@ def sample_series():
 def mock_candles(monkeypatch):
     """Мокаем candles для calculate()"""
     from state import memory
-    memory.candles = [{"close": v} for v in range(10)]
+    memory.candles.clear()
+    memory.candles.extend({"close": v} for v in range(10))
     yield
-    memory.candles = []
+    memory.candles.clear()
 
 
 # =========================
@@ -79,8 +82,70 @@ def test_wma_manual(sample_series):
     weights = np.arange(1, period + 1)
     expected = np.dot(sample_series.iloc[:period], weights) / weights.sum()
 
+    assert len(wma) == len(sample_series)
+    assert isinstance(wma, list)
+
     # Проверка пятого значения
-    assert abs(wma.iloc[period - 1] - expected) < 1e-6
+    assert abs(wma[period - 1] - expected) < 1e-6
+
+
+def test_wma_matches_rolling_apply():
+    """Векторная WMA совпадает с прежним расчётом через rolling().apply()"""
+    series = pd.Series(np.random.default_rng(1).normal(100, 5, size=500))
+    series.iloc[200] = np.nan
+    period = 7
+
+    weights = np.arange(1, period + 1)
+    expected = series.rolling(window=period).apply(
+        lambda x: np.dot(x, weights) / weights.sum(), raw=True
+    )
+    wma = IndicatorsCalculator.calc_wma(series, period)
+
+    np.testing.assert_allclose(wma, expected.to_numpy(), rtol=1e-12, equal_nan=True)
+
+
+def test_wma_period_longer_than_series():
+    """Период длиннее истории: все значения NaN"""
+    wma = IndicatorsCalculator.calc_wma(pd.Series([1.0, 2.0]), 5)
+    assert len(wma) == 2
+    assert all(pd.isna(v) for v in wma)
+
+
+# =========================
+# calculate_batch()
+# =========================
+def test_calculate_batch_matches_single(sample_series):
+    """Пакетный расчёт совпадает с поштучным"""
+    specs = [(Indicators.SMA, 3), (Indicators.EMA, 5), (Indicators.WMA, 4)]
+    results = IndicatorsCalculator.calculate_batch(sample_series.to_numpy(), specs)
+
+    assert len(results) == len(specs)
+    for (ind_type, period), values in zip(specs, results):
+        expected = IndicatorsCalculator.calculate(ind_type, sample_series.astype(float), period)
+        np.testing.assert_allclose(values, expected, equal_nan=True)
+
+
+def test_calculate_batch_dedupes(sample_series):
+    """Дубликаты спецификаций считаются один раз и сохраняют порядок"""
+    specs = [("sma", 5), (Indicators.SMA, 5), (Indicators.EMA, 5), ("sma", 5)]
+
+    with patch.object(
+        IndicatorsCalculator, 'calculate', wraps=IndicatorsCalculator.calculate
+    ) as mock_calculate:
+        results = IndicatorsCalculator.calculate_batch(sample_series, specs)
+
+    assert mock_calculate.call_count == 2
+    assert len(results) == 4
+    assert results[0] is results[1] is results[3]
+
+
+def test_calculate_batch_invalid_type(sample_series):
+    """Неизвестный тип даёт пустой список и не ломает остальные"""
+    results = IndicatorsCalculator.calculate_batch(
+        sample_series, [("invalid_type", 5), (Indicators.SMA, 5)]
+    )
+    assert results[0] == []
+    assert len(results[1]) == len(sample_series)
 
 
 # =========================
@@ -172,13 +237,13 @@ def test_clean_empty():
 @pytest.mark.asyncio
 async def test_recalc_indicator_empty_candles():
     """Тест когда нет свечей"""
-    with patch('services.indicators.candles', []):
+    with patch.dict(series, {DEFAULT_SERIES: CandleStore(10)}):
         ind = IndicatorDB(id=1, type=Indicators.SMA, period=14)
         indicator_values = {}
 
         with patch('services.indicators.indicator_values', indicator_values):
             await recalc_indicator(ind)
-            assert indicator_values[1] == []
+            assert len(indicator_values[1]) == 0
 
 
 @pytest.mark.asyncio
@@ -188,7 +253,7 @@ async def test_recalc_indicator_with_candles():
         {"close": 10}, {"close": 12}, {"close": 11}, {"close": 13}, {"close": 15}
     ]
 
-    with patch('services.indicators.candles', mock_candles):
+    with patch.dict(series, {DEFAULT_SERIES: CandleStore.from_records(mock_candles)}):
         ind = IndicatorDB(id=1, type=Indicators.SMA, period=3)
         indicator_values = {}
 
@@ -205,7 +270,7 @@ async def test_recalc_indicator_default_period():
     """Тест с периодом по умолчанию"""
     mock_candles = [{"close": i} for i in range(20)]
 
-    with patch('services.indicators.candles', mock_candles):
+    with patch.dict(series, {DEFAULT_SERIES: CandleStore.from_records(mock_candles)}):
         ind = IndicatorDB(id=1, type=Indicators.EMA, period=None)  # Должен стать 14
         indicator_values = {}
 
@@ -222,7 +287,7 @@ async def test_recalc_indicator_different_types():
     indicator_types = [Indicators.SMA, Indicators.EMA, Indicators.WMA]
 
     for ind_type in indicator_types:
-        with patch('services.indicators.candles', mock_candles):
+        with patch.dict(series, {DEFAULT_SERIES: CandleStore.from_records(mock_candles)}):
             ind = IndicatorDB(id=1, type=ind_type, period=5)
             indicator_values = {}
 
@@ -265,14 +330,54 @@ async def test_recalc_all_indicators_with_indicators():
     mock_session_local = MagicMock()
     mock_session_local.return_value.__aenter__.return_value = mock_session
 
+    mock_candles = [{"close": float(i)} for i in range(30)]
+    indicator_values = {}
+
     with patch('services.indicators.get_session_local', return_value=mock_session_local):
-        with patch('services.indicators.recalc_indicator') as mock_recalc:
-            await recalc_all_indicators()
-            assert mock_recalc.call_count == len(indicators)
+        with patch.dict(series, {DEFAULT_SERIES: CandleStore.from_records(mock_candles)}):
+            with patch('services.indicators.indicator_values', indicator_values):
+                await recalc_all_indicators()
+
+    # Каждый индикатор получил ряд на всю историю
+    assert set(indicator_values) == {ind.id for ind in indicators}
+    for ind in indicators:
+        assert len(indicator_values[ind.id]) == len(mock_candles)
+
+    close = pd.Series([c["close"] for c in mock_candles])
+    np.testing.assert_array_equal(indicator_values[2], IndicatorsCalculator.calc_ema(close, 20))
+
+
+@pytest.mark.asyncio
+async def test_recalc_all_indicators_dedupes_specs():
+    """Одинаковые (type, period) у разных индикаторов считаются один раз"""
+    indicators = [
+        IndicatorDB(id=1, type="sma", period=20),
+        IndicatorDB(id=2, type=Indicators.SMA, period=20),
+        IndicatorDB(id=3, type=Indicators.EMA, period=50),
+        IndicatorDB(id=4, type="ema", period=50),
+    ]
+
+    mock_session = AsyncMock()
+    mock_result = MagicMock()
+    mock_result.scalars().all.return_value = indicators
+    mock_session.execute.return_value = mock_result
+
+    mock_session_local = MagicMock()
+    mock_session_local.return_value.__aenter__.return_value = mock_session
 
-            # Проверяем что каждый индикатор был передан
-            calls = [call[0][0] for call in mock_recalc.call_args_list]
-            assert set(calls) == set(indicators)
+    mock_candles = CandleStore.from_records({"close": float(i)} for i in range(60))
+    indicator_values = {}
+    with patch('services.indicators.get_session_local', return_value=mock_session_local):
+        with patch.dict(series, {DEFAULT_SERIES: mock_candles}):
+            with patch('services.indicators.indicator_values', indicator_values):
+                with patch.object(
+                    IndicatorsCalculator, 'calculate', wraps=IndicatorsCalculator.calculate
+                ) as mock_calculate:
+                    await recalc_all_indicators()
+
+    assert mock_calculate.call_count == 2
+    np.testing.assert_array_equal(indicator_values[1], indicator_values[2])
+    np.testing.assert_array_equal(indicator_values[3], indicator_values[4])
 
 
 @pytest.mark.asyncio
@@ -289,3 +394,131 @@ async def test_recalc_all_indicators_db_error():
             with pytest.raises(Exception) as exc_info:
                 await recalc_all_indicators()
             assert "Database connection error" in str(exc_info.value)
+
+
+# =========================
+# Инкрементальный пересчёт
+# =========================
+def session_with(indicators):
+    mock_session = AsyncMock()
+    mock_result = MagicMock()
+    mock_result.scalars().all.return_value = indicators
+    mock_session.execute.return_value = mock_result
+
+    mock_session_local = MagicMock()
+    mock_session_local.return_value.__aenter__.return_value = mock_session
+    return mock_session_local
+
+
+def ticks(count, seed=5):
+    rng = np.random.default_rng(seed)
+    close = 100 + np.cumsum(rng.normal(0, 1, size=count))
+    return [{"timestamp": 60_000.0 * i, "close": float(v)} for i, v in enumerate(close)]
+
+
+@pytest.mark.asyncio
+async def test_incremental_recalc_matches_full():
+    """Поток тиков через merge даёт те же значения, что и полный пересчёт"""
+    indicators = [
+        IndicatorDB(id=1, type=Indicators.SMA, period=10),
+        IndicatorDB(id=2, type=Indicators.EMA, period=20),
+        IndicatorDB(id=3, type=Indicators.WMA, period=5),
+    ]
+    candles = ticks(300)
+    store = CandleStore(1000)
+    values = {}
+    streams = {}
+
+    def merge(rows):
+        return store.merge({
+            "timestamp": [c["timestamp"] for c in rows],
+            "close": [c["close"] for c in rows],
+        })
+
+    with patch('services.indicators.get_session_local', return_value=session_with(indicators)), \
+            patch.dict(series, {DEFAULT_SERIES: store}), \
+            patch('services.indicators.indicator_values', values), \
+            patch('services.indicators.indicator_streams', streams):
+        await recalc_all_indicators(*DEFAULT_SERIES, merge(candles[:100]))
+
+        for i in range(100, 300):
+            # Открытая свеча меняется несколько раз, потом приходит следующая
+            forming = dict(candles[i], close=candles[i]["close"] + 0.5)
+            await recalc_all_indicators(*DEFAULT_SERIES, merge(candles[i - 5:i] + [forming]))
+            changed = merge(candles[i - 5:i + 1])
+            await recalc_all_indicators(*DEFAULT_SERIES, changed)
+
+    close = pd.Series([c["close"] for c in candles])
+    for ind in indicators:
+        expected = IndicatorsCalculator.calculate(ind.type, close, ind.period)
+        np.testing.assert_allclose(
+            np.asarray(values[ind.id], dtype=float), expected, rtol=1e-9, equal_nan=True
+        )
+    # Поток на каждый узел графа (ряд, выражение)
+    assert {node.period for _, node in streams} == {10, 20, 5}
+
+
+@pytest.mark.asyncio
+async def test_incremental_recalc_does_not_recompute_history():
+    """При изменении хвоста полный расчёт не вызывается"""
+    indicators = [IndicatorDB(id=1, type=Indicators.SMA, period=10)]
+    store = CandleStore.from_records(ticks(200), capacity=1000)
+    values = {}
+
+    with patch('services.indicators.get_session_local', return_value=session_with(indicators)), \
+            patch.dict(series, {DEFAULT_SERIES: store}), \
+            patch('services.indicators.indicator_values', values), \
+            patch('services.indicators.indicator_streams', {}):
+        await recalc_all_indicators(*DEFAULT_SERIES, len(store) - 1)
+        store.upsert({"timestamp": store.last_timestamp(), "close": 1.0})
+
+        with patch.object(IndicatorsCalculator, 'calculate_batch') as mock_batch:
+            await recalc_all_indicators(*DEFAULT_SERIES, len(store) - 1)
+        mock_batch.assert_not_called()
+
+    close = pd.Series(store.column("close"))
+    assert values[1][-1] == pytest.approx(IndicatorsCalculator.calc_sma(close, 10)[-1])
+
+
+@pytest.mark.asyncio
+async def test_incremental_recalc_restarts_on_period_change():
+    """Смена периода сбрасывает поток"""
+    ind = IndicatorDB(id=1, type=Indicators.SMA, period=10)
+    store = CandleStore.from_records(ticks(100), capacity=1000)
+    values = {}
+
+    with patch('services.indicators.get_session_local', return_value=session_with([ind])), \
+            patch.dict(series, {DEFAULT_SERIES: store}), \
+            patch('services.indicators.indicator_values', values), \
+            patch('services.indicators.indicator_streams', {}):
+        await recalc_all_indicators(*DEFAULT_SERIES, 99)
+        ind.period = 3
+        await recalc_all_indicators(*DEFAULT_SERIES, 99)
+
+    close = pd.Series(store.column("close"))
+    np.testing.assert_allclose(
+        np.asarray(values[1], dtype=float), IndicatorsCalculator.calc_sma(close, 3), equal_nan=True
+    )
+
+
+@pytest.mark.asyncio
+async def test_incremental_recalc_isolates_broken_indicator():
+    """Ошибка потока одного индикатора не мешает остальным индикаторам ряда"""
+    indicators = [
+        IndicatorDB(id=1, type=Indicators.SMA, period=-3),
+        IndicatorDB(id=2, type=Indicators.SMA, period=10),
+    ]
+    store = CandleStore.from_records(ticks(100), capacity=1000)
+    values = {}
+    streams = {}
+
+    with patch('services.indicators.get_session_local', return_value=session_with(indicators)), \
+            patch.dict(series, {DEFAULT_SERIES: store}), \
+            patch('services.indicators.indicator_values', values), \
+            patch('services.indicators.indicator_streams', streams):
+        await recalc_all_indicators(*DEFAULT_SERIES, 99)
+
+    close = pd.Series(store.column("close"))
+    np.testing.assert_allclose(values[2], IndicatorsCalculator.calc_sma(close, 10), equal_nan=True)
+    assert len(values[1]) == 0
+    assert [node.period for _, node in streams] == [10]
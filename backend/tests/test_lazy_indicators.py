@@ -0,0 +1,151 @@
+from unittest.mock import AsyncMock, patch
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from app import app
+from models.indicator import IndicatorDB
+from services import indicators
+from services.data_cache import invalidate_all
+from services.indicators import lazy_values, recalc_all_indicators
+from services.stream import StreamHub
+from state import memory
+from state.candle_store import CandleStore
+from utils.budget_cache import BudgetLruCache
+from utils.constants import DEFAULT_SERIES
+from utils.indicator_calculator import IndicatorsCalculator
+
+INDICATORS = [
+    IndicatorDB(id=1, type="sma", period=5, symbol="BTCUSDT", interval="1"),
+    IndicatorDB(id=2, type="ema", period=10, symbol="BTCUSDT", interval="1"),
+    IndicatorDB(id=3, type="sma", period=5, symbol="BTCUSDT", interval="1"),
+]
+
+
+def make_store(size=200):
+    store = CandleStore(1000)
+    close = 100 + np.cumsum(np.random.default_rng(5).normal(0, 1, size=size))
+    store.extend_columns({"timestamp": np.arange(size) * 60_000.0, "close": close})
+    return store
+
+
+@pytest.fixture
+def lazy_mode(monkeypatch):
+    monkeypatch.setenv("INDICATOR_MODE", "lazy")
+    store = make_store()
+    with patch.dict(memory.series, {DEFAULT_SERIES: store}), \
+            patch.dict(memory.indicator_values, clear=True), \
+            patch.dict(memory.watched_series, clear=True), \
+            patch.object(indicators, 'lazy_cache', BudgetLruCache(1024 * 1024)), \
+            patch('services.indicators.indicator_cache') as cache:
+        cache.all = AsyncMock(return_value=INDICATORS)
+        invalidate_all()
+        yield store
+    invalidate_all()
+
+
+# =========================
+# BudgetLruCache
+# =========================
+def test_budget_cache_evicts_least_recently_used():
+    cache = BudgetLruCache(100)
+    cache.put("a", 1, 40)
+    cache.put("b", 2, 40)
+    cache.get("a")
+    cache.put("c", 3, 40)
+
+    assert "b" not in cache
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.nbytes == 80
+
+
+def test_budget_cache_skips_values_over_budget():
+    cache = BudgetLruCache(100)
+    cache.put("a", 1, 40)
+    cache.put("big", 2, 101)
+
+    assert "big" not in cache
+    assert len(cache) == 1
+
+
+def test_budget_cache_replaces_key():
+    cache = BudgetLruCache(100)
+    cache.put("a", 1, 40)
+    cache.put("a", 2, 60)
+
+    assert cache.get("a") == 2
+    assert cache.nbytes == 60
+
+
+# =========================
+# Режим lazy
+# =========================
+@pytest.mark.asyncio
+async def test_lazy_recalc_skips_unwatched_series(lazy_mode):
+    with patch('services.indicators.calculate_batch', new_callable=AsyncMock) as mock_batch:
+        await recalc_all_indicators("BTCUSDT", "1", start=len(lazy_mode) - 1)
+        await recalc_all_indicators()
+
+    mock_batch.assert_not_called()
+    assert memory.indicator_values == {}
+    assert memory.indicator_series[1] == DEFAULT_SERIES
+
+
+@pytest.mark.asyncio
+async def test_lazy_recalc_computes_watched_series(lazy_mode):
+    hub = StreamHub(max_pending=4)
+    subscriber = hub.subscribe(*DEFAULT_SERIES)
+    await recalc_all_indicators("BTCUSDT", "1")
+
+    assert set(memory.indicator_values) == {1, 2, 3}
+
+    hub.unsubscribe(subscriber)
+    assert DEFAULT_SERIES not in memory.watched_series
+
+
+@pytest.mark.asyncio
+async def test_lazy_values_match_calculator(lazy_mode):
+    values = await lazy_values(*DEFAULT_SERIES)
+
+    close = lazy_mode.column("close")
+    expected = IndicatorsCalculator.calculate_batch(close, [("sma", 5), ("ema", 10)])
+    np.testing.assert_allclose(values[1], expected[0], equal_nan=True)
+    np.testing.assert_allclose(values[2], expected[1], equal_nan=True)
+    np.testing.assert_allclose(values[3], expected[0], equal_nan=True)
+
+
+@pytest.mark.asyncio
+async def test_lazy_values_cached_until_store_changes(lazy_mode):
+    with patch('services.indicators.calculate_batch', wraps=indicators.calculate_batch) as mock_batch:
+        await lazy_values(*DEFAULT_SERIES)
+        await lazy_values(*DEFAULT_SERIES)
+        assert mock_batch.call_count == 1
+        # Одинаковые (type, period) считаются один раз
+        assert len(mock_batch.call_args.args[1]) == 2
+
+        lazy_mode.merge({"timestamp": [200 * 60_000.0], "close": [150.0]})
+        values = await lazy_values(*DEFAULT_SERIES)
+
+    assert mock_batch.call_count == 2
+    assert len(values[1]) == len(lazy_mode)
+
+
+@pytest.mark.asyncio
+async def test_lazy_values_within_budget(lazy_mode):
+    with patch.object(indicators, 'lazy_cache', BudgetLruCache(200 * 8)):
+        values = await lazy_values(*DEFAULT_SERIES)
+
+        # В бюджет влезает один ряд, но ответ содержит все индикаторы
+        assert len(indicators.lazy_cache) == 1
+        assert all(len(v) == len(lazy_mode) for v in values.values())
+
+
+def test_get_data_lazy(lazy_mode):
+    with patch('api.indicator_routes.indicator_cache') as cache:
+        cache.all = AsyncMock(return_value=INDICATORS)
+        rows = TestClient(app).get("/data").json()["candles"]
+
+    assert len(rows) == len(lazy_mode)
+    assert rows[-1]["indicators"]["1"] == pytest.approx(np.mean(lazy_mode.column("close")[-5:]))
+    assert memory.indicator_values == {}
@@ -0,0 +1,102 @@
+import httpx
+import pytest
+
+from benchmarks.bybit_stub import BybitStub
+from benchmarks.load import (
+    LiveBybitStub,
+    Recorder,
+    cpu_cores,
+    load_manifests,
+    memory_mb,
+    pod_sizing,
+    summarize,
+)
+from core.settings import get_bybit_url
+
+
+def test_bybit_url_from_environment(monkeypatch):
+    monkeypatch.delenv("BYBIT_URL", raising=False)
+    assert get_bybit_url() == "https://api.bybit.com/v5/market/kline"
+    monkeypatch.setenv("BYBIT_URL", "http://127.0.0.1:9/v5/market/kline")
+    assert get_bybit_url() == "http://127.0.0.1:9/v5/market/kline"
+
+
+def test_live_stub_moves_only_forming_candle(monkeypatch):
+    now = 1_700_000_030.0
+    monkeypatch.setattr("benchmarks.load.time.time", lambda: now)
+    stub = LiveBybitStub()
+    plain = BybitStub(now_ms=int(now * 1000))
+    params = {"interval": "1", "limit": 5}
+
+    first, second = stub.klines(params), stub.klines(params)
+
+    assert first[0][0] == second[0][0]
+    assert first[0][4] != second[0][4]
+    # Закрытые свечи и запросы истории (end) как у обычной заглушки
+    assert first[1:] == second[1:] == plain.klines(params)[1:]
+    history = {"interval": "1", "limit": 5, "end": int(first[2][0])}
+    assert stub.klines(history) == plain.klines(history)
+
+
+@pytest.mark.asyncio
+async def test_recorder_counts_only_measured_requests():
+    def handler(request):
+        return httpx.Response(304 if request.headers.get("If-None-Match") else 200)
+
+    recorder = Recorder()
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler), base_url="http://test") as client:
+        await recorder.request(client, "GET", "/data", "data")
+        recorder.active = True
+        await recorder.request(client, "GET", "/data", lambda r: str(r.status_code))
+        await recorder.request(client, "GET", "/data", lambda r: str(r.status_code), headers={"If-None-Match": "x"})
+
+    assert {kind: len(values) for kind, values in recorder.latencies.items()} == {"200": 1, "304": 1}
+
+
+def test_summarize_subtracts_idle_cpu():
+    recorder = Recorder()
+    recorder.latencies = {"data": [0.001] * 90 + [0.1] * 10, "create": [0.01] * 10}
+    recorder.errors = {"delete": 2}
+
+    summary = summarize(recorder, duration=10, dashboards=20, idle_cores=0.01, load_cpu=1.1, client_cpu=1.0,
+                        rss_peak=[100 * 2 ** 20, 120 * 2 ** 20])
+
+    assert summary["requests"] == 110
+    assert summary["throughput_rps"] == pytest.approx(11)
+    assert summary["errors"] == 2
+    assert summary["by_kind"]["data"]["p50_ms"] == pytest.approx(1)
+    assert summary["by_kind"]["data"]["p99_ms"] == pytest.approx(100)
+    assert summary["by_kind"]["delete"] == {"count": 0, "rps": 0.0, "errors": 2}
+    # 1.1 с CPU за 10 с, из них 0.1 с - фон без клиентов
+    assert summary["cpu"]["load_cores"] == pytest.approx(0.11)
+    assert summary["cpu"]["per_request_ms"] == pytest.approx(1000 / 110)
+    assert summary["cpu"]["per_dashboard_cores"] == pytest.approx(0.005)
+    assert summary["rss_peak_mb"] == pytest.approx(120)
+
+
+@pytest.mark.parametrize("value, cores", [("200m", 0.2), ("1", 1.0), ("0.5", 0.5)])
+def test_cpu_cores(value, cores):
+    assert cpu_cores(value) == pytest.approx(cores)
+
+
+@pytest.mark.parametrize("value, mb", [("256Mi", 256), ("1Gi", 1024), ("512Ki", 0.5)])
+def test_memory_mb(value, mb):
+    assert memory_mb(value) == pytest.approx(mb)
+
+
+def test_pod_sizing_from_manifests():
+    deployment, hpa = load_manifests()
+    summary = {
+        "cpu": {"idle_cores": 0.01, "load_cores": 0.3, "per_dashboard_cores": 0.001},
+        "rss_peak_mb": 300,
+    }
+
+    sizing = pod_sizing(summary, deployment, hpa)
+
+    request = cpu_cores(deployment["spec"]["template"]["spec"]["containers"][0]["resources"]["requests"]["cpu"])
+    assert sizing["utilization_pct"] == pytest.approx(0.3 / request * 100)
+    assert sizing["hpa_replicas"] <= hpa["spec"]["maxReplicas"]
+    assert sizing["hpa_replicas_wanted"] >= sizing["hpa_replicas"]
+    assert sizing["dashboards_per_pod_at_limit"] == pytest.approx((sizing["cpu_limit"] - 0.01) / 0.001)
+    assert sizing["cpu_throttled"] == (0.3 > sizing["cpu_limit"])
+    assert sizing["memory_ok"] == (300 < sizing["memory_limit_mb"])
@@ -0,0 +1,209 @@
+import asyncio
+import time
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, inspect, text
+
+from app import app
+from benchmarks.bybit_stub import BybitStub
+from core.migrations import run_migrations
+from models.indicator import IndicatorDB
+from services.candles import fetch_all_candles, polled_series, tracked_series
+from state import memory
+from state.memory import get_store, indicator_series, indicator_values
+from utils.rate_limiter import AsyncRateLimiter
+
+client = TestClient(app)
+
+
+@pytest.fixture
+def two_symbols(monkeypatch):
+    """Два символа и два таймфрейма"""
+    monkeypatch.setenv("MARKET_SYMBOLS", "BTCUSDT,ETHUSDT")
+    monkeypatch.setenv("MARKET_INTERVALS", "1,5")
+    monkeypatch.setenv("RESAMPLE_INTERVALS", "")
+    saved = dict(memory.series)
+    yield
+    memory.series.clear()
+    memory.series.update(saved)
+    memory.candles.clear()
+    indicator_values.clear()
+    indicator_series.clear()
+
+
+# =========================
+# Ограничение частоты
+# =========================
+@pytest.mark.asyncio
+async def test_rate_limiter_spaces_requests():
+    """После burst запросы идут не чаще rate в секунду"""
+    limiter = AsyncRateLimiter(rate=50, burst=2)
+    start = time.monotonic()
+    for _ in range(7):
+        await limiter.acquire()
+    elapsed = time.monotonic() - start
+
+    # 2 сразу, остальные 5 с шагом 20 мс
+    assert elapsed >= 0.09
+
+
+@pytest.mark.asyncio
+async def test_rate_limiter_shared_between_tasks():
+    limiter = AsyncRateLimiter(rate=100, burst=1)
+    start = time.monotonic()
+    await asyncio.gather(*(limiter.acquire() for _ in range(6)))
+    assert time.monotonic() - start >= 0.045
+
+
+def test_rate_limiter_invalid_rate():
+    with pytest.raises(ValueError):
+        AsyncRateLimiter(rate=0)
+
+
+# =========================
+# Опрос нескольких рядов
+# =========================
+def test_tracked_series(two_symbols, monkeypatch):
+    assert tracked_series() == [
+        ("BTCUSDT", "1"), ("BTCUSDT", "5"), ("ETHUSDT", "1"), ("ETHUSDT", "5"),
+    ]
+
+    # Опрашиваемый таймфрейм не собирается повторно, W не выровнен по эпохе
+    monkeypatch.setenv("RESAMPLE_INTERVALS", "5,15,W")
+    assert polled_series() == tracked_series()[:4]
+    assert tracked_series()[4:] == [("BTCUSDT", "15"), ("ETHUSDT", "15")]
+
+
+@pytest.mark.asyncio
+async def test_fetch_all_candles_fills_every_series(two_symbols):
+    """Каждый ряд получает своё хранилище и свой пересчёт индикаторов"""
+    async with BybitStub() as stub:
+        with patch('services.candles.get_bybit_url', return_value=stub.url), \
+                patch('services.candles.get_http_client', return_value=None), \
+                patch('services.candles.recalc_all_indicators', new=AsyncMock()) as mock_recalc:
+            await fetch_all_candles()
+
+    requested = {(r["symbol"], r["interval"]) for r in stub.requests}
+    assert requested == set(tracked_series())
+    assert {call.args[:2] for call in mock_recalc.call_args_list} == set(tracked_series())
+
+    five_minutes = get_store("ETHUSDT", "5")
+    assert len(five_minutes) == 100
+    assert five_minutes.column("timestamp")[1] - five_minutes.column("timestamp")[0] == 300_000
+
+
+@pytest.mark.asyncio
+async def test_fetch_all_candles_bounded_concurrency(two_symbols, monkeypatch):
+    """Ряды опрашиваются параллельно, но не больше FETCH_CONCURRENCY сразу"""
+    monkeypatch.setenv("FETCH_CONCURRENCY", "2")
+    running = 0
+    peak = 0
+
+    async def slow_fetch(symbol, interval):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.02)
+        running -= 1
+
+    with patch('services.candles.fetch_candles', new=slow_fetch):
+        await fetch_all_candles()
+
+    assert peak == 2
+
+
+@pytest.mark.asyncio
+async def test_fetch_error_does_not_stop_other_series(two_symbols):
+    calls = []
+
+    async def flaky_fetch(symbol, interval):
+        calls.append((symbol, interval))
+        if symbol == "ETHUSDT":
+            raise RuntimeError("boom")
+
+    with patch('services.candles.fetch_candles', new=flaky_fetch):
+        await fetch_all_candles()
+
+    assert len(calls) == 4
+
+
+# =========================
+# /data по рядам
+# =========================
+def test_get_data_scoped_by_series(two_symbols):
+    """Индикаторы и свечи отдаются только для своего ряда"""
+    indicators = [
+        IndicatorDB(id=1, name="BTC SMA", type="sma", period=2),
+        IndicatorDB(id=2, name="ETH SMA", type="sma", period=2, symbol="ETHUSDT", interval="5"),
+    ]
+    mock_session = AsyncMock()
+    mock_session.execute.return_value.scalars = MagicMock(
+        return_value=MagicMock(all=MagicMock(return_value=indicators))
+    )
+    mock_session.__aenter__ = AsyncMock(return_value=mock_session)
+    mock_session.__aexit__ = AsyncMock(return_value=None)
+
+    get_store("ETHUSDT", "5").extend([{"timestamp": 1000, "close": 10}, {"timestamp": 2000, "close": 20}])
+    indicator_values[2] = [None, 15.0]
+    indicator_series[2] = ("ETHUSDT", "5")
+
+    with patch('api.indicator_routes.get_session_local', return_value=MagicMock(return_value=mock_session)):
+        eth = client.get("/data", params={"symbol": "ETHUSDT", "interval": "5"}).json()
+        btc = client.get("/data").json()
+        missing = client.get("/data", params={"symbol": "DOGEUSDT", "interval": "1"})
+
+    assert [i["name"] for i in eth["indicators"]] == ["ETH SMA"]
+    assert eth["indicators"][0]["symbol"] == "ETHUSDT"
+    assert eth["candles"][1]["indicators"] == {"2": 15.0}
+    assert [i["name"] for i in btc["indicators"]] == ["BTC SMA"]
+    assert all("2" not in c["indicators"] for c in btc["candles"])
+    assert missing.status_code == 404
+
+
+def test_create_indicator_for_untracked_series():
+    response = client.post(
+        "/indicator",
+        json={"name": "SMA", "type": "sma", "period": 5, "symbol": "DOGEUSDT"}
+    )
+    assert response.status_code == 404
+
+
+# =========================
+# Миграции
+# =========================
+class SyncConnection:
+    """Синхронное соединение с интерфейсом AsyncConnection для run_migrations"""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    async def run_sync(self, fn):
+        return fn(self.conn)
+
+    async def execute(self, statement):
+        return self.conn.execute(statement)
+
+
+@pytest.mark.asyncio
+async def test_migrations_add_series_columns():
+    """Старая таблица получает symbol/interval/sources, существующие строки остаются рабочими"""
+    engine = create_engine("sqlite://")
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE indicators (id INTEGER PRIMARY KEY, name VARCHAR NOT NULL, "
+            "type VARCHAR NOT NULL, period INTEGER NOT NULL, color VARCHAR NOT NULL)"
+        ))
+        conn.execute(text("INSERT INTO indicators VALUES (1, 'SMA 14', 'sma', 14, '#000')"))
+
+        await run_migrations(SyncConnection(conn))
+        # Повторный запуск ничего не делает
+        await run_migrations(SyncConnection(conn))
+
+        columns = {c["name"] for c in inspect(conn).get_columns("indicators")}
+        row = conn.execute(text('SELECT symbol, "interval", sources FROM indicators')).one()
+
+    assert {"symbol", "interval", "sources"} <= columns
+    # Без sources индикатор считается по свечам, как раньше
+    assert tuple(row) == ("BTCUSDT", "1", None)
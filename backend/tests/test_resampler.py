@@ -0,0 +1,191 @@
+from unittest.mock import AsyncMock, patch
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.bybit_stub import BybitStub
+from services.candles import fetch_all_candles
+from state import memory
+from state.candle_store import CandleStore
+from state.memory import get_store
+from utils.constants import CANDLE_COLUMNS
+from utils.resampler import bucket_start, can_resample, resample, resample_into
+
+MINUTE = 60_000
+# 2023-11-14 22:00 UTC: начало 4-часовой корзины
+ORIGIN = 1_699_999_200_000
+
+
+def minute_candles(count, start=ORIGIN, seed=3):
+    """Случайные минутные свечи подряд"""
+    rng = np.random.default_rng(seed)
+    close = 30000 + np.cumsum(rng.normal(0, 10, size=count))
+    open_ = close + rng.normal(0, 3, size=count)
+    return {
+        "timestamp": start + np.arange(count, dtype=np.float64) * MINUTE,
+        "open": open_,
+        "high": np.maximum(open_, close) + rng.uniform(0, 5, size=count),
+        "low": np.minimum(open_, close) - rng.uniform(0, 5, size=count),
+        "close": close,
+        "volume": rng.uniform(1, 10, size=count),
+        "turnover": rng.uniform(1e4, 1e5, size=count),
+    }
+
+
+def reference(columns, interval):
+    """Эталон через pandas.resample с выравниванием по эпохе"""
+    df = pd.DataFrame(columns)
+    df.index = pd.to_datetime(df["timestamp"], unit="ms")
+    rule = "1440min" if interval == "D" else f"{interval}min"
+    out = df.resample(rule, origin="epoch").agg({
+        "open": "first", "high": "max", "low": "min", "close": "last",
+        "volume": "sum", "turnover": "sum",
+    }).dropna()
+    out["timestamp"] = (out.index - pd.Timestamp(0)) // pd.Timedelta(milliseconds=1)
+    return out
+
+
+def assert_matches(actual, expected):
+    for name in CANDLE_COLUMNS:
+        np.testing.assert_allclose(np.asarray(actual[name]), expected[name].to_numpy(dtype=float), rtol=1e-12)
+
+
+# =========================
+# Векторная агрегация
+# =========================
+@pytest.mark.parametrize("interval", ["5", "15", "60", "240", "D"])
+def test_resample_matches_pandas(interval):
+    columns = minute_candles(3000)
+    assert_matches(resample(columns, interval), reference(columns, interval))
+
+
+def test_resample_with_gaps():
+    """Пропущенные минуты не ломают корзины"""
+    columns = minute_candles(200)
+    keep = np.ones(200, dtype=bool)
+    keep[[3, 4, 50, 51, 52, 53, 54, 120]] = False
+    columns = {name: values[keep] for name, values in columns.items()}
+
+    assert_matches(resample(columns, "5"), reference(columns, "5"))
+
+
+def test_resample_drops_partial_head():
+    columns = minute_candles(20, start=ORIGIN + 2 * MINUTE)
+
+    full = resample(columns, "5")
+    trimmed = resample(columns, "5", drop_partial_head=True)
+
+    assert full["timestamp"][0] == ORIGIN
+    assert trimmed["timestamp"][0] == ORIGIN + 5 * MINUTE
+    assert len(trimmed["timestamp"]) == len(full["timestamp"]) - 1
+
+
+def test_resample_empty():
+    assert all(len(v) == 0 for v in resample(minute_candles(0), "5").values())
+
+
+def test_interval_helpers():
+    assert bucket_start(ORIGIN + 7 * MINUTE, "5") == ORIGIN + 5 * MINUTE
+    assert can_resample("240")
+    assert not can_resample("1")
+    assert not can_resample("W")
+    with pytest.raises(ValueError):
+        bucket_start(ORIGIN, "W")
+
+
+# =========================
+# Инкрементальное обновление
+# =========================
+@pytest.mark.parametrize("interval", ["5", "15", "60"])
+def test_incremental_matches_full_resample(interval):
+    """Живой поток минутных свечей с формирующейся последней даёт тот же ряд"""
+    columns = minute_candles(400)
+    base = CandleStore(1000)
+    target = CandleStore(1000)
+    base.extend_columns({name: values[:100] for name, values in columns.items()})
+    resample_into(base, target, interval)
+
+    for i in range(100, 400):
+        since = base.last_timestamp()
+        # Формирующаяся свеча: сначала частичная, потом закрытая
+        partial = {name: float(values[i]) for name, values in columns.items()}
+        partial["close"] = partial["open"]
+        partial["volume"] /= 2
+        base.upsert(partial)
+        changed = resample_into(base, target, interval, since)
+        assert changed == bucket_start(since, interval)
+
+        base.upsert({name: float(values[i]) for name, values in columns.items()})
+        resample_into(base, target, interval, base.last_timestamp())
+
+    expected = resample(columns, interval, drop_partial_head=True)
+    for name in CANDLE_COLUMNS:
+        np.testing.assert_allclose(target.column(name), expected[name], rtol=1e-12)
+
+
+def test_incremental_touches_only_open_bucket():
+    """Закрытые корзины не переписываются"""
+    columns = minute_candles(60)
+    base = CandleStore.from_records([], capacity=100)
+    base.extend_columns(columns)
+    target = CandleStore(100)
+    resample_into(base, target, "15")
+    closed = target.column("close")[:-1].copy()
+
+    since = base.last_timestamp()
+    base.upsert({"timestamp": since, "open": 1, "high": 1e6, "low": 1, "close": 2, "volume": 1, "turnover": 1})
+    resample_into(base, target, "15", since)
+
+    np.testing.assert_array_equal(target.column("close")[:-1], closed)
+    assert target.column("high")[-1] == 1e6
+    assert target.column("close")[-1] == 2
+
+
+def test_rebuild_when_target_is_ahead():
+    """Расхождение с target приводит к полной пересборке"""
+    base = CandleStore(100)
+    base.extend_columns(minute_candles(30))
+    target = CandleStore(100)
+    target.append({"timestamp": ORIGIN + 1000 * MINUTE, "close": 1})
+
+    assert resample_into(base, target, "5", base.last_timestamp()) is None
+    assert target.column("timestamp")[-1] == ORIGIN + 25 * MINUTE
+
+
+# =========================
+# Опрос: старшие таймфреймы из минутных
+# =========================
+@pytest.fixture
+def derived_intervals(monkeypatch):
+    monkeypatch.setenv("MARKET_SYMBOLS", "BTCUSDT")
+    monkeypatch.setenv("MARKET_INTERVALS", "1")
+    monkeypatch.setenv("RESAMPLE_INTERVALS", "5,15")
+    saved = dict(memory.series)
+    yield
+    memory.series.clear()
+    memory.series.update(saved)
+    memory.candles.clear()
+
+
+@pytest.mark.asyncio
+async def test_fetch_builds_derived_timeframes(derived_intervals):
+    """Биржа опрашивается только за минутными свечами"""
+    async with BybitStub(now_ms=ORIGIN + 99 * MINUTE) as stub:
+        with patch('services.candles.get_bybit_url', return_value=stub.url), \
+                patch('services.candles.get_http_client', return_value=None), \
+                patch('services.candles.recalc_all_indicators', new=AsyncMock()) as mock_recalc:
+            await fetch_all_candles()
+            await fetch_all_candles()
+
+    assert {r["interval"] for r in stub.requests} == {"1"}
+    assert {call.args[:2] for call in mock_recalc.call_args_list} == {
+        ("BTCUSDT", "1"), ("BTCUSDT", "5"), ("BTCUSDT", "15"),
+    }
+
+    base = get_store("BTCUSDT", "1")
+    five = get_store("BTCUSDT", "5")
+    assert len(five) == 20
+    assert_matches(five.columns(), reference(base.columns(), "5"))
+    # Последняя 15-минутная корзина открыта: в ней 10 минутных свечей
+    assert len(get_store("BTCUSDT", "15")) == 7
@@ -0,0 +1,188 @@
+import copy
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from tests.conftest import assert_parity
+from utils.rolling import (
+    MonotonicWindow,
+    WelfordWindow,
+    WilderSmoother,
+    WindowSum,
+    rolling_max,
+    rolling_mean,
+    rolling_min,
+    rolling_std,
+    rolling_sum,
+    rolling_var,
+    weighted_mean,
+    wilder,
+)
+
+
+# =========================
+# Фикстуры
+# =========================
+@pytest.fixture
+def random_values():
+    """Случайное блуждание цены с пропуском в середине"""
+    rng = np.random.default_rng(3)
+    values = 50000 + np.cumsum(rng.normal(0, 25, size=1500))
+    values[700] = np.nan
+    return values
+
+
+def stream(primitive, values):
+    return [primitive.push(v) for v in values]
+
+
+# =========================
+# Пакетные примитивы и pandas
+# =========================
+@pytest.mark.parametrize("period", [1, 2, 7, 30, 2000])
+def test_rolling_sum_and_mean_match_pandas(random_values, period):
+    series = pd.Series(random_values)
+    assert_parity(rolling_sum(random_values, period), series.rolling(period).sum())
+    assert_parity(rolling_mean(random_values, period), series.rolling(period).mean())
+
+
+@pytest.mark.parametrize("period", [2, 7, 30])
+@pytest.mark.parametrize("ddof", [0, 1])
+def test_rolling_var_matches_pandas(random_values, period, ddof):
+    series = pd.Series(random_values)
+    assert_parity(rolling_var(random_values, period, ddof), series.rolling(period).var(ddof=ddof), rtol=1e-7)
+    assert_parity(rolling_std(random_values, period, ddof), series.rolling(period).std(ddof=ddof), rtol=1e-7)
+
+
+def test_rolling_var_constant_window_is_zero():
+    assert rolling_var(np.full(10, 3.3), 4)[-1] == 0.0
+
+
+@pytest.mark.parametrize("period", [1, 3, 7, 30, 1499, 1500, 1501])
+def test_rolling_min_max_match_pandas(random_values, period):
+    series = pd.Series(random_values)
+    assert_parity(rolling_min(random_values, period), series.rolling(period).min(), rtol=0)
+    assert_parity(rolling_max(random_values, period), series.rolling(period).max(), rtol=0)
+
+
+def test_weighted_mean_matches_apply(random_values):
+    period = 5
+    weights = np.arange(1, period + 1)
+    expected = pd.Series(random_values).rolling(period).apply(lambda x: np.dot(x, weights) / weights.sum(), raw=True)
+    assert_parity(weighted_mean(random_values, period), expected)
+
+
+def test_wilder_matches_loop():
+    values = np.random.default_rng(5).uniform(0, 10, size=200)
+    period = 14
+
+    expected = [math.nan] * (period - 1) + [values[:period].mean()]
+    for value in values[period:]:
+        expected.append((expected[-1] * (period - 1) + value) / period)
+
+    assert_parity(wilder(values, period), expected)
+
+
+@pytest.mark.parametrize("primitive", [rolling_sum, rolling_min, rolling_max, rolling_var, wilder, weighted_mean])
+def test_short_history_and_invalid_period(primitive):
+    assert np.isnan(primitive([1.0, 2.0], 5)).all()
+    with pytest.raises(ValueError):
+        primitive([1.0, 2.0], 0)
+
+
+# =========================
+# Потоковые примитивы против пакетных
+# =========================
+@pytest.mark.parametrize("period", [1, 5, 40])
+def test_window_sum_matches_batch(period):
+    values = np.random.default_rng(1).normal(100, 5, size=3000)
+    assert_parity(stream(WindowSum(period), values), rolling_sum(values, period))
+
+
+@pytest.mark.parametrize("period", [1, 2, 5, 40])
+@pytest.mark.parametrize("maximum", [False, True])
+def test_monotonic_window_matches_batch(period, maximum):
+    values = np.random.default_rng(2).integers(0, 20, size=1000).astype(float)
+    expected = (rolling_max if maximum else rolling_min)(values, period)
+    assert_parity(stream(MonotonicWindow(period, maximum=maximum), values), expected, rtol=0)
+
+
+@pytest.mark.parametrize("period", [2, 5, 40])
+@pytest.mark.parametrize("ddof", [0, 1])
+def test_welford_window_matches_batch(period, ddof):
+    values = 60000 + np.cumsum(np.random.default_rng(4).normal(0, 50, size=5000))
+    # Округление при удалении значений порядка eps * цена^2: на почти пустой
+    # дисперсии относительная погрешность заметна, абсолютная - нет
+    assert_parity(stream(WelfordWindow(period, ddof), values), rolling_var(values, period, ddof), rtol=1e-6, atol=1e-5)
+
+
+@pytest.fixture
+def gapped_values():
+    """Ряд с одиночным NaN, NaN подряд и NaN в самом начале"""
+    values = np.random.default_rng(5).normal(100, 5, size=300)
+    values[[0, 10, 120, 121, 122, 200]] = np.nan
+    return values
+
+
+@pytest.mark.parametrize("period", [1, 3, 40])
+def test_window_sum_with_nan_matches_batch(gapped_values, period):
+    assert_parity(stream(WindowSum(period), gapped_values), rolling_sum(gapped_values, period))
+
+
+def test_window_sum_recovers_after_nan():
+    values = np.arange(50, dtype=float)
+    values[10] = np.nan
+    result = stream(WindowSum(3), values)
+    assert np.isnan(result[10:13]).all()
+    assert result[13:20] == [36.0, 39.0, 42.0, 45.0, 48.0, 51.0, 54.0]
+
+
+@pytest.mark.parametrize("period", [1, 3, 40])
+@pytest.mark.parametrize("maximum", [False, True])
+def test_monotonic_window_with_nan_matches_batch(gapped_values, period, maximum):
+    expected = (rolling_max if maximum else rolling_min)(gapped_values, period)
+    assert_parity(stream(MonotonicWindow(period, maximum=maximum), gapped_values), expected, rtol=0)
+
+
+@pytest.mark.parametrize("period", [2, 3, 40])
+@pytest.mark.parametrize("ddof", [0, 1])
+def test_welford_window_with_nan_matches_batch(gapped_values, period, ddof):
+    expected = rolling_var(gapped_values, period, ddof)
+    assert_parity(stream(WelfordWindow(period, ddof), gapped_values), expected, rtol=1e-6, atol=1e-9)
+
+
+@pytest.mark.parametrize("factory", [
+    lambda: WindowSum(3),
+    lambda: MonotonicWindow(3),
+    lambda: MonotonicWindow(3, maximum=True),
+    lambda: WelfordWindow(3),
+])
+def test_peek_with_nan_equals_push(gapped_values, factory):
+    primitive = factory()
+    for value in gapped_values:
+        assert primitive.peek(value) == pytest.approx(copy.deepcopy(primitive).push(value), nan_ok=True)
+        primitive.push(value)
+
+
+def test_wilder_smoother_matches_batch():
+    values = np.random.default_rng(6).uniform(0, 10, size=500)
+    assert_parity(stream(WilderSmoother(14), values), wilder(values, 14))
+
+
+@pytest.mark.parametrize("factory", [
+    lambda: WindowSum(3),
+    lambda: MonotonicWindow(3),
+    lambda: MonotonicWindow(3, maximum=True),
+    lambda: WelfordWindow(3),
+    lambda: WilderSmoother(3),
+])
+def test_peek_equals_push_without_changing_state(factory):
+    """peek() даёт то же, что следующий push(), и не меняет состояние"""
+    values = np.random.default_rng(8).normal(10, 3, size=50)
+    plain, peeked = factory(), factory()
+    for value in values:
+        preview = peeked.peek(value * 2)
+        assert preview == pytest.approx(copy.deepcopy(peeked).push(value * 2), nan_ok=True)
+        assert plain.push(value) == pytest.approx(peeked.push(value), nan_ok=True)
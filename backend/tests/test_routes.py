@@ -10,16 +10,6 @@ from state.memory import candles, indicator_values
 client = TestClient(app)
 
 
-@pytest.fixture
-def clear_memory():
-    """Очистка памяти перед каждым тестом"""
-    candles.clear()
-    indicator_values.clear()
-    yield
-    candles.clear()
-    indicator_values.clear()
-
-
 # =========================
 # Тесты для POST /indicator
 # =========================
@@ -59,6 +49,22 @@ def test_create_indicator_missing_name(clear_memory):
     assert response.status_code == 422
 
 
+@pytest.mark.parametrize("period", [0, -3])
+def test_create_indicator_invalid_period(clear_memory, period):
+    """Неположительный период отклоняется до записи в БД"""
+    response = client.post(
+        "/indicator",
+        json={"name": "SMA", "type": "sma", "period": period}
+    )
+    assert response.status_code == 422
+
+
+def test_update_indicator_invalid_period(clear_memory):
+    """Неположительный период отклоняется и при обновлении"""
+    response = client.put("/indicator/1", json={"period": -3})
+    assert response.status_code == 422
+
+
 # =========================
 # Тесты для PUT /indicator
 # =========================
@@ -87,6 +93,7 @@ def test_update_indicator_success(clear_memory):
     mock_indicator.type = "sma"
     mock_indicator.period = 10
     mock_indicator.color = "#000000"
+    mock_indicator.sources = None
 
     mock_session = AsyncMock()
     mock_result = MagicMock()
@@ -100,7 +107,7 @@ def test_update_indicator_success(clear_memory):
     mock_sessionmaker.return_value = mock_session
 
     with patch('api.indicator_routes.get_session_local', return_value=mock_sessionmaker):
-        with patch('services.indicators.recalc_indicator', new=AsyncMock()):
+        with patch('api.indicator_routes.recalc_indicator', new=AsyncMock()):
             response = client.put(
                 "/indicator/1",
                 json={"name": "New Name", "period": 20}
@@ -156,6 +163,24 @@ def test_get_data_empty(clear_memory):
             assert "indicators" in data
 
 
+def test_get_data_window(clear_memory, monkeypatch):
+    """Без since отдаётся только последнее окно истории, остальное через since"""
+    monkeypatch.setenv("DATA_WINDOW", "3")
+    candles.extend({"timestamp": 1000 * i, "close": 100 + i} for i in range(10))
+
+    mock_session = AsyncMock()
+    mock_session.execute.return_value.scalars = MagicMock(return_value=MagicMock(all=MagicMock(return_value=[])))
+    mock_session.__aenter__ = AsyncMock(return_value=mock_session)
+    mock_session.__aexit__ = AsyncMock(return_value=None)
+
+    with patch('api.indicator_routes.get_session_local', return_value=MagicMock(return_value=mock_session)):
+        window = client.get("/data").json()["candles"]
+        tail = client.get("/data", params={"since": 2000}).json()["candles"]
+
+    assert [c["timestamp"] for c in window] == [7000, 8000, 9000]
+    assert len(tail) == 8
+
+
 def test_get_data_with_candles(clear_memory):
     """Тест получения данных со свечами"""
     candles.append({"timestamp": 1000, "close": 100})
@@ -188,6 +213,8 @@ def test_get_data_with_indicators(clear_memory):
     mock_indicator1.type = "sma"
     mock_indicator1.period = 14
     mock_indicator1.color = "#FF0000"
+    mock_indicator1.series = ("BTCUSDT", "1")
+    mock_indicator1.sources = None
 
     mock_indicator2 = MagicMock()
     mock_indicator2.id = 2
@@ -195,6 +222,8 @@ def test_get_data_with_indicators(clear_memory):
     mock_indicator2.type = "ema"
     mock_indicator2.period = 20
     mock_indicator2.color = "#00FF00"
+    mock_indicator2.series = ("BTCUSDT", "1")
+    mock_indicator2.sources = None
 
     # Добавляем свечи
     candles.extend([
@@ -226,6 +255,42 @@ def test_get_data_with_indicators(clear_memory):
             assert len(data["indicators"]) == 2
 
 
+def test_get_data_since_returns_tail(clear_memory):
+    """since отдаёт только свечи начиная с указанного timestamp"""
+    candles.extend([
+        {"timestamp": 1000, "close": 100},
+        {"timestamp": 2000, "close": 110},
+        {"timestamp": 3000, "close": 120},
+    ])
+    indicator_values[1] = [None, 105, 115]
+
+    mock_session = AsyncMock()
+    mock_result = MagicMock()
+    mock_result.scalars.return_value.all.return_value = []
+    mock_session.execute = AsyncMock(return_value=mock_result)
+    mock_session.__aenter__ = AsyncMock(return_value=mock_session)
+    mock_session.__aexit__ = AsyncMock(return_value=None)
+
+    mock_sessionmaker = MagicMock()
+    mock_sessionmaker.return_value = mock_session
+
+    with patch('api.indicator_routes.get_session_local', return_value=mock_sessionmaker):
+        response = client.get("/data", params={"since": 2000})
+        assert response.status_code == 200
+        data = response.json()
+        assert [c["timestamp"] for c in data["candles"]] == [2000, 3000]
+        assert data["candles"][0]["indicators"] == {"1": 105}
+        assert "etag" in response.headers
+
+        # Между свечами: с первой более поздней
+        response = client.get("/data", params={"since": 2500})
+        assert [c["timestamp"] for c in response.json()["candles"]] == [3000]
+
+        # Новее последней свечи: пусто
+        response = client.get("/data", params={"since": 4000})
+        assert response.json()["candles"] == []
+
+
 # =========================
 # Тесты для проверки clean функции
 # =========================
@@ -250,4 +315,30 @@ def test_clean_preserves_none():
     """Тест что clean сохраняет None"""
     from services.indicators import clean
     result = clean([1.0, None, 2.0])
-    assert result == [1.0, None, 2.0]
\ No newline at end of file
+    assert result == [1.0, None, 2.0]
+
+def test_clean_float64_array():
+    """clean принимает массив float64 целиком"""
+    from services.indicators import clean
+    import numpy as np
+    result = clean(np.array([np.nan, 1.5, np.inf]))
+    assert result == [None, 1.5, None]
+
+
+def test_get_data_float64_indicator_values(clear_memory):
+    """Значения индикаторов - массивы float64, NaN в ответе становится null"""
+    import numpy as np
+    candles.extend({"timestamp": 1000 * i, "close": 100 + i} for i in range(3))
+    indicator_values[1] = np.array([np.nan, 1.0, 2.0])
+
+    mock_session = AsyncMock()
+    mock_session.execute.return_value.scalars = MagicMock(return_value=MagicMock(all=MagicMock(return_value=[])))
+    mock_session.__aenter__ = AsyncMock(return_value=mock_session)
+    mock_session.__aexit__ = AsyncMock(return_value=None)
+
+    with patch('api.indicator_routes.get_session_local', return_value=MagicMock(return_value=mock_session)):
+        rows = client.get("/data").json()["candles"]
+        tail = client.get("/data", params={"since": 0}).json()["candles"]
+
+    assert [row["indicators"]["1"] for row in rows] == [None, 1.0, 2.0]
+    assert tail == rows
@@ -46,7 +46,7 @@ async def test_recalc_indicator_no_candles(sample_ohlc):
     await recalc_indicator(indicator)
 
     assert indicator.id in indicator_values
-    assert indicator_values[indicator.id] == []
+    assert len(indicator_values[indicator.id]) == 0
 
 
 @pytest.mark.asyncio
@@ -266,8 +266,8 @@ async def test_fetch_candles_empty_response():
 
             # Проверяем что свечи не добавились
             assert len(candles) == 0
-            # Индикаторы все равно пересчитываются
-            mock_recalc.assert_called_once()
+            # Данные не изменились: пересчитывать нечего
+            mock_recalc.assert_not_called()
 
 
 def test_indicator_constants():
@@ -279,7 +279,7 @@ def test_indicator_constants():
     # Проверяем что все значения уникальны
     values = [v.value for v in Indicators]
     assert len(values) == len(set(values))
-    assert len(values) == 3  # только SMA, EMA, WMA
+    assert set(values) == {"sma", "ema", "wma", "rsi", "macd", "bbands", "atr", "vwap", "stoch", "min", "max", "stddev", "crossover"}
 
 
 @pytest.mark.asyncio
@@ -0,0 +1,130 @@
+import asyncio
+import json
+from unittest.mock import patch
+
+import pytest
+
+from services.stream import StreamHub, StreamSubscriber, stream_hub
+from state.memory import candles, indicator_values
+
+
+def make_candle(i, close=None):
+    return {
+        "timestamp": 1_000_000 + i * 60_000,
+        "open": 100.0,
+        "high": 110.0,
+        "low": 90.0,
+        "close": 100.0 + i if close is None else close,
+        "volume": 1.0,
+        "turnover": 100.0,
+    }
+
+
+# =========================
+# Очередь подключения
+# =========================
+@pytest.mark.asyncio
+async def test_subscriber_delivers_in_order():
+    subscriber = StreamSubscriber(max_pending=4)
+    subscriber.offer("a")
+    subscriber.offer("b")
+
+    assert await subscriber.next() == "a"
+    assert await subscriber.next() == "b"
+
+
+@pytest.mark.asyncio
+async def test_slow_subscriber_is_coalesced_into_snapshot():
+    """Переполненная очередь заменяется одним снимком, память не растёт"""
+    subscriber = StreamSubscriber(max_pending=3)
+    for i in range(100):
+        subscriber.offer(str(i))
+
+    assert len(subscriber._pending) <= 3
+    # Сначала снимок, затем только новые дельты
+    assert await subscriber.next() is None
+    subscriber.offer("fresh")
+    assert await subscriber.next() == "fresh"
+
+
+@pytest.mark.asyncio
+async def test_subscriber_waits_for_message():
+    subscriber = StreamSubscriber(max_pending=3)
+    waiter = asyncio.create_task(subscriber.next())
+    await asyncio.sleep(0)
+    assert not waiter.done()
+
+    subscriber.offer("late")
+    assert await asyncio.wait_for(waiter, 1) == "late"
+
+
+# =========================
+# Рассылка
+# =========================
+def test_publish_since_sends_revised_and_new_candles(clear_memory):
+    """Дельта содержит пересобранную последнюю свечу и новые"""
+    hub = StreamHub(max_pending=8)
+    subscriber = hub.subscribe()
+
+    candles.extend(make_candle(i) for i in range(3))
+    since = candles.last_timestamp()
+    candles.upsert(make_candle(2, close=555.0))
+    candles.append(make_candle(3))
+    indicator_values[7] = [None, 1.0, 2.0, float("nan")]
+
+    hub.publish_since(since)
+
+    delta = json.loads(subscriber._pending[0])
+    assert delta["type"] == "delta"
+    assert [c["timestamp"] for c in delta["candles"]] == [since, since + 60_000]
+    assert delta["candles"][0]["close"] == 555.0
+    assert delta["candles"][0]["indicators"] == {"7": 2.0}
+    assert delta["candles"][1]["indicators"] == {"7": None}
+
+
+def test_publish_without_subscribers_is_noop(clear_memory):
+    hub = StreamHub(max_pending=8)
+    candles.append(make_candle(0))
+    with patch('services.stream.candle_rows') as mock_rows:
+        hub.publish_since(candles.last_timestamp())
+    mock_rows.assert_not_called()
+
+
+def test_unsubscribe():
+    hub = StreamHub(max_pending=8)
+    subscriber = hub.subscribe()
+    hub.unsubscribe(subscriber)
+    assert len(hub) == 0
+
+
+# =========================
+# WebSocket /ws/data
+# =========================
+def test_ws_snapshot_then_delta(client, clear_memory, mock_sessionmaker):
+    """При подключении приходит снимок, затем только дельты"""
+    candles.extend(make_candle(i) for i in range(3))
+
+    with client.websocket_connect("/ws/data") as ws:
+        snapshot = ws.receive_json()
+        assert snapshot["type"] == "snapshot"
+        assert len(snapshot["data"]["candles"]) == 3
+
+        since = candles.last_timestamp()
+        candles.append(make_candle(3))
+        client.portal.call(stream_hub.publish_since, since)
+
+        delta = ws.receive_json()
+        assert delta["type"] == "delta"
+        assert len(delta["candles"]) == 2
+
+    assert len(stream_hub) == 0
+
+
+def test_ws_resync_after_indicator_change(client, clear_memory, mock_sessionmaker):
+    """Изменение списка индикаторов присылает новый снимок"""
+    candles.extend(make_candle(i) for i in range(2))
+
+    with client.websocket_connect("/ws/data") as ws:
+        assert ws.receive_json()["type"] == "snapshot"
+        client.portal.call(stream_hub.resync_all)
+        assert ws.receive_json()["type"] == "snapshot"
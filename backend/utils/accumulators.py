@@ -0,0 +1,329 @@
+import math
+from abc import ABC, abstractmethod
+from collections import deque
+
+from utils.rolling import RESYNC_EVERY, MonotonicWindow, WelfordWindow, WilderSmoother, WindowSum
+
+
+class IndicatorAccumulator(ABC):
+    """Базовый потоковый аккумулятор индикатора.
+
+    push() фиксирует значение закрытой свечи, peek() считает значение
+    для формирующейся свечи, не меняя состояние. Аргументы - входные
+    колонки индикатора в порядке inputs из реестра, с несколькими
+    выходами результат - кортеж в порядке outputs.
+    """
+
+    def __init__(self, period):
+        if period < 1:
+            raise ValueError(f"Period must be positive, got {period}")
+        self.period = period
+
+    @abstractmethod
+    def push(self, value):
+        ...
+
+    @abstractmethod
+    def peek(self, value):
+        ...
+
+
+class SmaAccumulator(IndicatorAccumulator):
+    """SMA на скользящей сумме окна"""
+
+    def __init__(self, period):
+        super().__init__(period)
+        self._sum = WindowSum(period)
+
+    def push(self, value):
+        return self._sum.push(value) / self.period
+
+    def peek(self, value):
+        return self._sum.peek(value) / self.period
+
+
+class EmaAccumulator(IndicatorAccumulator):
+    """EMA с adjust=False: хранит только последнее значение"""
+
+    def __init__(self, period):
+        super().__init__(period)
+        self._alpha = 2 / (period + 1)
+        self._last = None
+
+    def _next(self, value):
+        if self._last is None:
+            return value
+        return (1 - self._alpha) * self._last + self._alpha * value
+
+    def push(self, value):
+        self._last = self._next(value)
+        return self._last
+
+    def peek(self, value):
+        return self._next(value)
+
+
+class WmaAccumulator(IndicatorAccumulator):
+    """WMA на паре скользящих сумм: обычной и взвешенной"""
+
+    def __init__(self, period):
+        super().__init__(period)
+        self._window = deque(maxlen=period)
+        self._denominator = period * (period + 1) / 2
+        self._sum = 0.0
+        self._weighted_sum = 0.0
+        self._pushes = 0
+
+    @staticmethod
+    def _weighted(values):
+        return math.fsum(weight * v for weight, v in enumerate(values, start=1))
+
+    def push(self, value):
+        if len(self._window) == self.period:
+            # Все веса сдвигаются на единицу вниз, новое значение получает вес period
+            self._weighted_sum += self.period * value - self._sum
+            self._sum += value - self._window[0]
+            self._window.append(value)
+        else:
+            self._window.append(value)
+            self._sum += value
+            if len(self._window) == self.period:
+                self._weighted_sum = self._weighted(self._window)
+
+        self._pushes += 1
+        if self._pushes % RESYNC_EVERY == 0 and len(self._window) == self.period:
+            self._sum = math.fsum(self._window)
+            self._weighted_sum = self._weighted(self._window)
+
+        if len(self._window) < self.period:
+            return math.nan
+        return self._weighted_sum / self._denominator
+
+    def peek(self, value):
+        size = len(self._window)
+        if size == self.period:
+            return (self._weighted_sum + self.period * value - self._sum) / self._denominator
+        if size == self.period - 1:
+            return (self._weighted(self._window) + self.period * value) / self._denominator
+        return math.nan
+
+
+class MinAccumulator(IndicatorAccumulator):
+    """Минимум окна на монотонной очереди"""
+
+    maximum = False
+
+    def __init__(self, period):
+        super().__init__(period)
+        self._window = MonotonicWindow(period, maximum=self.maximum)
+
+    def push(self, value):
+        return self._window.push(value)
+
+    def peek(self, value):
+        return self._window.peek(value)
+
+
+class MaxAccumulator(MinAccumulator):
+    """Максимум окна на монотонной очереди"""
+
+    maximum = True
+
+
+class StddevAccumulator(IndicatorAccumulator):
+    """Стандартное отклонение окна по Уэлфорду"""
+
+    def __init__(self, period):
+        super().__init__(period)
+        self._variance = WelfordWindow(period)
+
+    def push(self, value):
+        return math.sqrt(self._variance.push(value))
+
+    def peek(self, value):
+        return math.sqrt(self._variance.peek(value))
+
+
+class RsiAccumulator(IndicatorAccumulator):
+    """RSI Уайлдера: сглаженные рост и падение цены"""
+
+    def __init__(self, period):
+        super().__init__(period)
+        self._previous = None
+        self._gain = WilderSmoother(period)
+        self._loss = WilderSmoother(period)
+
+    @staticmethod
+    def _value(gain, loss):
+        if math.isnan(gain):
+            return math.nan
+        if loss == 0:
+            return 50.0 if gain == 0 else 100.0
+        return 100 - 100 / (1 + gain / loss)
+
+    def push(self, value):
+        previous, self._previous = self._previous, value
+        if previous is None:
+            return math.nan
+        delta = value - previous
+        return self._value(self._gain.push(max(delta, 0.0)), self._loss.push(max(-delta, 0.0)))
+
+    def peek(self, value):
+        if self._previous is None:
+            return math.nan
+        delta = value - self._previous
+        return self._value(self._gain.peek(max(delta, 0.0)), self._loss.peek(max(-delta, 0.0)))
+
+
+def macd_periods(period):
+    """MACD(12, 26, 9) масштабируется от периода быстрой EMA"""
+    return period, max(period + 1, round(period * 26 / 12)), max(1, round(period * 9 / 12))
+
+
+class MacdAccumulator(IndicatorAccumulator):
+    """MACD: разность быстрой и медленной EMA и EMA этой разности"""
+
+    def __init__(self, period):
+        super().__init__(period)
+        fast, slow, signal = macd_periods(period)
+        self._fast = EmaAccumulator(fast)
+        self._slow = EmaAccumulator(slow)
+        self._signal = EmaAccumulator(signal)
+
+    def push(self, value):
+        line = self._fast.push(value) - self._slow.push(value)
+        signal = self._signal.push(line)
+        return line, signal, line - signal
+
+    def peek(self, value):
+        line = self._fast.peek(value) - self._slow.peek(value)
+        signal = self._signal.peek(line)
+        return line, signal, line - signal
+
+
+class BbandsAccumulator(IndicatorAccumulator):
+    """Полосы Боллинджера: SMA и две стандартные отклонения окна (Уэлфорд)"""
+
+    width = 2.0
+
+    def __init__(self, period):
+        super().__init__(period)
+        self._sum = WindowSum(period)
+        self._variance = WelfordWindow(period)
+
+    def _bands(self, total, variance):
+        middle = total / self.period
+        deviation = self.width * math.sqrt(variance)
+        return middle, middle + deviation, middle - deviation
+
+    def push(self, value):
+        return self._bands(self._sum.push(value), self._variance.push(value))
+
+    def peek(self, value):
+        return self._bands(self._sum.peek(value), self._variance.peek(value))
+
+
+class AtrAccumulator(IndicatorAccumulator):
+    """ATR: true range, сглаженный по Уайлдеру"""
+
+    def __init__(self, period):
+        super().__init__(period)
+        self._previous = None
+        self._smoother = WilderSmoother(period)
+
+    def _true_range(self, high, low):
+        if self._previous is None:
+            return high - low
+        return max(high - low, abs(high - self._previous), abs(low - self._previous))
+
+    def push(self, high, low, close):
+        value = self._smoother.push(self._true_range(high, low))
+        self._previous = close
+        return value
+
+    def peek(self, high, low, close):
+        return self._smoother.peek(self._true_range(high, low))
+
+
+class VwapAccumulator(IndicatorAccumulator):
+    """VWAP окна: скользящие суммы цены, взвешенной объёмом, и объёма"""
+
+    def __init__(self, period):
+        super().__init__(period)
+        self._turnover = WindowSum(period)
+        self._volume = WindowSum(period)
+
+    @staticmethod
+    def _value(turnover, volume):
+        return turnover / volume if volume > 0 else math.nan
+
+    @staticmethod
+    def _typical(high, low, close):
+        return (high + low + close) / 3
+
+    def push(self, high, low, close, volume):
+        turnover = self._turnover.push(self._typical(high, low, close) * volume)
+        return self._value(turnover, self._volume.push(volume))
+
+    def peek(self, high, low, close, volume):
+        turnover = self._turnover.peek(self._typical(high, low, close) * volume)
+        return self._value(turnover, self._volume.peek(volume))
+
+
+class StochAccumulator(IndicatorAccumulator):
+    """Стохастик: %K по монотонным окнам high/low, %D - скользящая сумма %K"""
+
+    smoothing = 3
+
+    def __init__(self, period):
+        super().__init__(period)
+        self._lowest = MonotonicWindow(period)
+        self._highest = MonotonicWindow(period, maximum=True)
+        self._k = WindowSum(self.smoothing)
+
+    @staticmethod
+    def _percent_k(lowest, highest, close):
+        if math.isnan(lowest) or math.isnan(highest):
+            return math.nan
+        spread = highest - lowest
+        # Окно без движения цены: середина диапазона
+        return 50.0 if spread == 0 else 100 * (close - lowest) / spread
+
+    def push(self, high, low, close):
+        k = self._percent_k(self._lowest.push(low), self._highest.push(high), close)
+        # %K не определён, пока окно не заполнилось: в сумму %D он не попадает
+        d = self._k.push(k) / self.smoothing if not math.isnan(k) else math.nan
+        return k, d
+
+    def peek(self, high, low, close):
+        k = self._percent_k(self._lowest.peek(low), self._highest.peek(high), close)
+        d = self._k.peek(k) / self.smoothing if not math.isnan(k) else math.nan
+        return k, d
+
+
+class CrossoverAccumulator(IndicatorAccumulator):
+    """Разность двух рядов и её смена знака"""
+
+    def __init__(self, period):
+        super().__init__(period)
+        self._previous = math.nan
+
+    @staticmethod
+    def _cross(previous, diff):
+        if math.isnan(diff):
+            return math.nan
+        if previous <= 0 < diff:
+            return 1.0
+        if previous >= 0 > diff:
+            return -1.0
+        return 0.0
+
+    def push(self, fast, slow):
+        diff = fast - slow
+        cross = self._cross(self._previous, diff)
+        self._previous = diff
+        return diff, cross
+
+    def peek(self, fast, slow):
+        diff = fast - slow
+        return diff, self._cross(self._previous, diff)
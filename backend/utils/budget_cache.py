@@ -0,0 +1,46 @@
+from collections import OrderedDict
+
+
+class BudgetLruCache:
+    """LRU-кэш с потолком по памяти, а не по числу элементов.
+
+    Размер каждого значения передаётся при записи. Когда сумма превышает
+    max_bytes, выбрасываются давно не читавшиеся значения. Значение больше
+    всего бюджета не кэшируется.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self._items = OrderedDict()
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, key):
+        return key in self._items
+
+    def get(self, key, default=None):
+        if key not in self._items:
+            return default
+        self._items.move_to_end(key)
+        return self._items[key][0]
+
+    def put(self, key, value, nbytes):
+        self.discard(key)
+        if nbytes > self.max_bytes:
+            return
+        self._items[key] = (value, nbytes)
+        self.nbytes += nbytes
+        while self.nbytes > self.max_bytes:
+            _, (_, evicted) = self._items.popitem(last=False)
+            self.nbytes -= evicted
+
+    def discard(self, key):
+        item = self._items.pop(key, None)
+        if item is not None:
+            self.nbytes -= item[1]
+
+    def clear(self):
+        self._items.clear()
+        self.nbytes = 0
@@ -0,0 +1,100 @@
+import struct
+
+import numpy as np
+
+# Колоночный формат /data: JSON-массив на колонку или упакованные float64
+ROWS = "rows"
+COLUMNS = "columns"
+BINARY = "binary"
+FORMATS = (ROWS, COLUMNS, BINARY)
+
+COLUMNS_MEDIA_TYPE = "application/vnd.cryptobrowser.columns+json"
+BINARY_MEDIA_TYPE = "application/vnd.cryptobrowser.columns"
+
+# Заголовок бинарного формата: magic, версия, число колонок, число строк.
+# Дальше имена колонок (uint16 длина + UTF-8), потом данные колонка за
+# колонкой, float64 little-endian; пропуски - NaN.
+MAGIC = b"CNDL"
+VERSION = 1
+_HEADER = struct.Struct("<4sHHI")
+_NAME_SIZE = struct.Struct("<H")
+
+INDICATOR_PREFIX = "indicator:"
+
+
+def negotiate(fmt, accept):
+    """Формат ответа: параметр format важнее заголовка Accept"""
+    if fmt:
+        if fmt not in FORMATS:
+            raise ValueError(f"Unsupported format {fmt}, expected one of {', '.join(FORMATS)}")
+        return fmt
+
+    for media_type in (accept or "").split(","):
+        media_type = media_type.split(";")[0].strip()
+        if media_type in (BINARY_MEDIA_TYPE, "application/octet-stream"):
+            return BINARY
+        if media_type == COLUMNS_MEDIA_TYPE:
+            return COLUMNS
+    return ROWS
+
+
+def media_type(fmt):
+    return {COLUMNS: COLUMNS_MEDIA_TYPE, BINARY: BINARY_MEDIA_TYPE}.get(fmt, "application/json")
+
+
+def nullable(values):
+    """Колонка для JSON: NaN и бесконечности становятся null"""
+    values = np.asarray(values, dtype=np.float64)
+    if np.isfinite(values).all():
+        return values.tolist()
+    return np.where(np.isfinite(values), values, None).tolist()
+
+
+def align(values, size):
+    """Значения индикатора длиной size: недостающий хвост заполняется NaN.
+
+    У индикаторов с несколькими выходами values двумерный: (история, выходы).
+    """
+    values = np.asarray(values, dtype=np.float64)[:size]
+    if len(values) == size:
+        return values
+    return np.concatenate([values, np.full((size - len(values),) + values.shape[1:], np.nan)])
+
+
+def align_end(values, size):
+    """Последние size значений; недостающее начало заполняется NaN"""
+    values = np.asarray(values, dtype=np.float64)
+    if len(values) >= size:
+        return values[len(values) - size:]
+    return np.concatenate([np.full((size - len(values),) + values.shape[1:], np.nan), values])
+
+
+def encode_binary(columns):
+    """Упаковывает колонки одинаковой длины {имя: массив} в байты"""
+    names = list(columns)
+    rows = len(columns[names[0]]) if names else 0
+    parts = [_HEADER.pack(MAGIC, VERSION, len(names), rows)]
+    for name in names:
+        encoded = name.encode("utf-8")
+        parts.append(_NAME_SIZE.pack(len(encoded)) + encoded)
+    for name in names:
+        parts.append(np.ascontiguousarray(columns[name], dtype="<f8").tobytes())
+    return b"".join(parts)
+
+
+def decode_binary(body):
+    """Обратное к encode_binary, для клиентов на Python и тестов"""
+    magic, version, ncols, nrows = _HEADER.unpack_from(body)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"Unsupported columnar payload {magic!r} v{version}")
+
+    offset = _HEADER.size
+    names = []
+    for _ in range(ncols):
+        (size,) = _NAME_SIZE.unpack_from(body, offset)
+        offset += _NAME_SIZE.size
+        names.append(body[offset:offset + size].decode("utf-8"))
+        offset += size
+
+    data = np.frombuffer(body, dtype="<f8", count=ncols * nrows, offset=offset).reshape(ncols, nrows)
+    return dict(zip(names, data))
@@ -6,4 +6,26 @@ class Indicators(str, Enum):
     
     SMA = "sma"
     EMA = "ema"
-    WMA = "wma"
\ No newline at end of file
+    WMA = "wma"
+    RSI = "rsi"
+    MACD = "macd"
+    BBANDS = "bbands"
+    ATR = "atr"
+    VWAP = "vwap"
+    STOCH = "stoch"
+    MIN = "min"
+    MAX = "max"
+    STDDEV = "stddev"
+    CROSSOVER = "crossover"
+
+
+# Колонки свечи в порядке ответа Bybit /v5/market/kline
+CANDLE_COLUMNS = ("timestamp", "open", "high", "low", "close", "volume", "turnover")
+
+# Ряд по умолчанию: запросы и индикаторы без symbol/interval относятся к нему
+DEFAULT_SYMBOL = "BTCUSDT"
+DEFAULT_INTERVAL = "1"
+DEFAULT_SERIES = (DEFAULT_SYMBOL, DEFAULT_INTERVAL)
+
+# Таймфрейм, из которого собираются старшие (см. utils/resampler.py)
+BASE_INTERVAL = "1"
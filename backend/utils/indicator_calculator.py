@@ -1,7 +1,7 @@
-import numpy as np
-
 from core.logging import get_logger
 from utils.constants import Indicators
+from utils.indicator_registry import get_definition
+from utils.rolling import as_float, ewm, rolling_mean, weighted_mean
 
 
 class IndicatorsCalculator:
@@ -9,33 +9,67 @@ class IndicatorsCalculator:
 
     @staticmethod
     def calc_sma(series, period):
-        return series.rolling(period).mean().tolist()
+        return rolling_mean(series, period).tolist()
 
     @staticmethod
     def calc_ema(series, period):
-        return series.ewm(span=period, adjust=False).mean().tolist()
+        return ewm(series, 2 / (period + 1)).tolist()
 
     @staticmethod
     def calc_wma(series, period):
-        weights = np.arange(1, period + 1)
-        return series.rolling(window=period).apply(lambda x: np.dot(x, weights) / weights.sum(), raw=True)
+        return weighted_mean(series, period).tolist()
 
     @classmethod
-    def calculate(cls, ind_type, close, period):
+    def calculate(cls, ind_type, data, period):
+        """Значения индикатора из реестра (utils/indicator_registry.py).
+
+        data - {колонка: массив} или сам close (Series, массив). Возвращает
+        массив float64: одномерный или (история, число выходов). Для
+        неизвестного типа и при ошибке - пустой список.
+        """
         values = []
-        try:
-            if ind_type == Indicators.SMA:
-                values = cls.calc_sma(close, period)
-            
-            elif ind_type == Indicators.EMA:
-                values = cls.calc_ema(close, period)
+        definition = get_definition(ind_type)
+        if definition is None:
+            cls._logger.warning(f"Unknown indicator type {ind_type}")
+            return values
 
-            elif ind_type == Indicators.WMA:
-                values = cls.calc_wma(close, period)
+        try:
+            values = definition.compute(definition.select(data), period)
 
-            cls._logger.debug(f"The indicator {ind_type} value has been calculated successfully: {values}")
+            # Сами значения не логируем: форматирование ряда дороже расчёта
+            cls._logger.debug(f"The indicator {ind_type} value has been calculated successfully: {len(values)} values")
         
         except Exception as exception:
             cls._logger.exception(f"Exception {exception} while calculating indicator with type {ind_type}")
             
         return values
+
+    @staticmethod
+    def spec_key(ind_type, period):
+        """Нормализует (type, period): строка "sma" и Indicators.SMA дают один ключ"""
+        try:
+            ind_type = Indicators(ind_type)
+        except ValueError:
+            pass
+        return ind_type, period
+
+    @classmethod
+    def calculate_batch(cls, data, specs):
+        """Считает набор индикаторов по одним и тем же колонкам свечей.
+
+        data - {колонка: массив} или массив close. Одинаковые (type, period)
+        считаются один раз, результат возвращается списком значений в
+        порядке specs.
+        """
+        if not isinstance(data, dict):
+            data = {"close": data}
+        data = {name: as_float(values) for name, values in data.items()}
+
+        keys = [cls.spec_key(ind_type, period) for ind_type, period in specs]
+        unique = {}
+        for key in keys:
+            if key not in unique:
+                unique[key] = cls.calculate(key[0], data, key[1])
+
+        cls._logger.debug(f"Batch of {len(keys)} indicators calculated with {len(unique)} unique specs")
+        return [unique[key] for key in keys]
@@ -0,0 +1,160 @@
+from dataclasses import dataclass
+
+import numpy as np
+
+from utils.constants import CANDLE_COLUMNS, Indicators
+from utils.indicator_registry import get_definition
+
+
+@dataclass(frozen=True)
+class Node:
+    """Вычисление в графе индикаторов.
+
+    bindings - пары (вход, источник) в порядке inputs из реестра. Источник -
+    имя колонки свечей или (узел, номер выхода). Узел сравнивается по
+    значению: одинаковые выражения разных индикаторов - один узел.
+    """
+    type: Indicators
+    period: int
+    bindings: tuple
+
+    @property
+    def definition(self):
+        return get_definition(self.type)
+
+    @property
+    def upstream(self):
+        return [source[0] for _, source in self.bindings if not isinstance(source, str)]
+
+    @property
+    def derived(self):
+        """Узел считается по другому индикатору, а не только по свечам"""
+        return bool(self.upstream)
+
+
+class IndicatorGraph:
+    """DAG индикаторов одного ряда.
+
+    sources индикатора - {вход: {"id": id источника, "output": выход}};
+    входы без источника берутся из колонок свечей. Индикаторы с ошибкой
+    (цикл, нет источника, источник другого ряда, вход без данных) в граф не
+    попадают, причина - в errors.
+    """
+
+    def __init__(self, indicators):
+        self._by_id = {ind.id: ind for ind in indicators}
+        self.nodes = {}
+        self.errors = {}
+        # Узлы без повторов: каждый после всех своих источников
+        self.order = []
+        self._seen = set()
+        for ind_id in self._by_id:
+            try:
+                self._resolve(ind_id, ())
+            except ValueError as e:
+                self.errors[ind_id] = str(e)
+
+    def _resolve(self, ind_id, path):
+        if ind_id in self.nodes:
+            return self.nodes[ind_id]
+        if ind_id in path:
+            raise ValueError(f"Indicator sources form a cycle: {' -> '.join(map(str, path + (ind_id,)))}")
+        ind = self._by_id.get(ind_id)
+        if ind is None:
+            raise ValueError(f"Source indicator {ind_id} not found")
+
+        definition = get_definition(ind.type)
+        if definition is None:
+            raise ValueError(f"Unknown indicator type {ind.type}")
+        sources = ind.sources or {}
+        unknown = set(sources) - set(definition.inputs)
+        if unknown:
+            raise ValueError(f"Indicator {definition.type.value} has no inputs {', '.join(sorted(unknown))}")
+
+        bindings = []
+        for name in definition.inputs:
+            source = sources.get(name)
+            if source is None:
+                if name not in CANDLE_COLUMNS:
+                    raise ValueError(f"Input {name} of {definition.type.value} needs a source indicator")
+                bindings.append((name, name))
+                continue
+            bindings.append((name, self._source(ind, source, path + (ind_id,))))
+
+        node = Node(definition.type, ind.period or 14, tuple(bindings))
+        if node not in self._seen:
+            self._seen.add(node)
+            self.order.append(node)
+        self.nodes[ind_id] = node
+        return node
+
+    def _source(self, ind, source, path):
+        source_id = source["id"]
+        upstream_ind = self._by_id.get(source_id)
+        if upstream_ind is not None and upstream_ind.series != ind.series:
+            raise ValueError(f"Source indicator {source_id} belongs to another series")
+        upstream = self._resolve(source_id, path)
+
+        outputs = upstream.definition.outputs
+        output = source.get("output") or outputs[0]
+        if output not in outputs:
+            raise ValueError(f"Source indicator {source_id} has no output {output}")
+        return upstream, outputs.index(output)
+
+    def closure(self, nodes):
+        """Узлы nodes вместе со всеми источниками, в топологическом порядке"""
+        needed = set()
+        stack = list(nodes)
+        while stack:
+            node = stack.pop()
+            if node not in needed:
+                needed.add(node)
+                stack.extend(node.upstream)
+        return [node for node in self.order if node in needed]
+
+    def levels(self, nodes):
+        """nodes по уровням: узлы одного уровня не зависят друг от друга"""
+        depth = {}
+        for node in self.order:
+            depth[node] = 1 + max((depth[up] for up in node.upstream), default=-1)
+        levels = {}
+        for node in nodes:
+            levels.setdefault(depth[node], []).append(node)
+        return [levels[level] for level in sorted(levels)]
+
+    def dependents(self, ind_id):
+        """id индикаторов, которые считаются через ind_id, включая его самого"""
+        target = self.nodes.get(ind_id)
+        result = {ind_id}
+        if target is None:
+            return result
+        for other_id, node in self.nodes.items():
+            if target in self.closure([node]):
+                result.add(other_id)
+        return result
+
+    def warmup(self, node):
+        """Сколько первых значений узла NaN: прогрев источников плюс свой"""
+        own = node.definition.warmup(node.period)
+        return own + max((self.warmup(up) for up in node.upstream), default=0)
+
+
+def node_inputs(node, columns, values):
+    """{вход: массив} узла: колонки свечей или выходы посчитанных узлов values"""
+    data = {}
+    for name, source in node.bindings:
+        if isinstance(source, str):
+            data[name] = columns[source]
+            continue
+        upstream, output = source
+        upstream_values = values[upstream]
+        data[name] = upstream_values[:, output] if upstream_values.ndim == 2 else upstream_values
+    return data
+
+
+def first_valid(data):
+    """Первая строка, где все входы не NaN: прогрев источника в расчёт не идёт"""
+    valid = np.ones(len(next(iter(data.values()))), dtype=bool)
+    for values in data.values():
+        valid &= ~np.isnan(values)
+    return int(np.argmax(valid)) if valid.any() else len(valid)
@@ -0,0 +1,217 @@
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+import numpy as np
+
+from utils.accumulators import (
+    AtrAccumulator,
+    BbandsAccumulator,
+    CrossoverAccumulator,
+    EmaAccumulator,
+    MacdAccumulator,
+    MaxAccumulator,
+    MinAccumulator,
+    RsiAccumulator,
+    SmaAccumulator,
+    StddevAccumulator,
+    StochAccumulator,
+    VwapAccumulator,
+    WmaAccumulator,
+    macd_periods,
+)
+from utils.constants import Indicators
+from utils.rolling import (
+    as_float,
+    ewm,
+    rolling_max,
+    rolling_mean,
+    rolling_min,
+    rolling_std,
+    rolling_sum,
+    weighted_mean,
+    wilder,
+)
+
+
+@dataclass(frozen=True)
+class IndicatorDefinition:
+    """Описание индикатора в реестре.
+
+    inputs - колонки свечей, которые нужны расчёту (входы не из колонок
+    свечей задаются только источниками, см. utils/indicator_graph.py),
+    outputs - имена выходных рядов. С одним выходом compute возвращает
+    массив длины истории, с несколькими - массив (история, len(outputs)).
+    warmup(period) - сколько
+    первых значений остаются NaN, пока окну не хватает истории.
+    accumulator - класс потокового расчёта (utils/accumulators.py): его
+    результат по одной свече совпадает с compute.
+    """
+    type: Indicators
+    compute: Callable
+    inputs: tuple
+    outputs: tuple
+    warmup: Callable
+    accumulator: Optional[type] = None
+
+    def select(self, data):
+        """Нужные расчёту колонки из {колонка: массив}; массив или Series - это close"""
+        if not isinstance(data, dict):
+            data = {"close": data}
+        missing = [name for name in self.inputs if name not in data]
+        if missing:
+            raise ValueError(f"Indicator {self.type.value} needs columns {', '.join(missing)}")
+        return {name: as_float(data[name]) for name in self.inputs}
+
+
+REGISTRY = {}
+
+
+def register(ind_type, accumulator, inputs=("close",), outputs=("value",), warmup=lambda period: period - 1):
+    """Декоратор: добавляет функцию расчёта compute(columns, period) в реестр"""
+    def decorator(compute):
+        key = Indicators(ind_type)
+        REGISTRY[key] = IndicatorDefinition(key, compute, tuple(inputs), tuple(outputs), warmup, accumulator)
+        return compute
+    return decorator
+
+
+def get_definition(ind_type):
+    """Описание индикатора или None, если тип неизвестен"""
+    try:
+        return REGISTRY.get(Indicators(ind_type))
+    except ValueError:
+        return None
+
+
+def _stack(*outputs):
+    return np.column_stack(outputs)
+
+
+# =========================
+# Скользящие средние и статистики окна
+# =========================
+@register(Indicators.SMA, SmaAccumulator)
+def sma(columns, period):
+    return rolling_mean(columns["close"], period)
+
+
+@register(Indicators.EMA, EmaAccumulator, warmup=lambda period: 0)
+def ema(columns, period):
+    return ewm(columns["close"], 2 / (period + 1))
+
+
+@register(Indicators.WMA, WmaAccumulator)
+def wma(columns, period):
+    return weighted_mean(columns["close"], period)
+
+
+@register(Indicators.MIN, MinAccumulator)
+def minimum(columns, period):
+    return rolling_min(columns["close"], period)
+
+
+@register(Indicators.MAX, MaxAccumulator)
+def maximum(columns, period):
+    return rolling_max(columns["close"], period)
+
+
+@register(Indicators.STDDEV, StddevAccumulator)
+def stddev(columns, period):
+    """Стандартное отклонение окна по генеральной совокупности"""
+    return rolling_std(columns["close"], period)
+
+
+# =========================
+# Осцилляторы и полосы
+# =========================
+@register(Indicators.RSI, RsiAccumulator, warmup=lambda period: period)
+def rsi(columns, period):
+    """RSI Уайлдера: первое значение после period изменений цены"""
+    close = columns["close"]
+    result = np.full(len(close), np.nan)
+    if len(close) <= period:
+        return result
+
+    delta = np.diff(close)
+    gain = wilder(np.clip(delta, 0, None), period)
+    loss = wilder(np.clip(-delta, 0, None), period)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        values = 100 - 100 / (1 + gain / loss)
+    # Без падений RSI 100, без движения вовсе - 50
+    values = np.where(loss == 0, np.where(gain == 0, 50.0, 100.0), values)
+    result[1:] = np.where(np.isnan(gain), np.nan, values)
+    return result
+
+
+@register(Indicators.MACD, MacdAccumulator, outputs=("macd", "signal", "histogram"), warmup=lambda period: 0)
+def macd(columns, period):
+    fast, slow, signal_period = macd_periods(period)
+    close = columns["close"]
+    line = ewm(close, 2 / (fast + 1)) - ewm(close, 2 / (slow + 1))
+    signal = ewm(line, 2 / (signal_period + 1))
+    return _stack(line, signal, line - signal)
+
+
+@register(Indicators.BBANDS, BbandsAccumulator, outputs=("middle", "upper", "lower"))
+def bbands(columns, period):
+    middle = rolling_mean(columns["close"], period)
+    deviation = BbandsAccumulator.width * rolling_std(columns["close"], period)
+    return _stack(middle, middle + deviation, middle - deviation)
+
+
+def true_range(high, low, close):
+    previous = np.concatenate(([np.nan], close[:-1]))
+    # fmax пропускает NaN: у первой свечи нет предыдущего close, остаётся high - low
+    return np.fmax(high - low, np.fmax(np.abs(high - previous), np.abs(low - previous)))
+
+
+@register(Indicators.ATR, AtrAccumulator, inputs=("high", "low", "close"))
+def atr(columns, period):
+    return wilder(true_range(columns["high"], columns["low"], columns["close"]), period)
+
+
+@register(Indicators.VWAP, VwapAccumulator, inputs=("high", "low", "close", "volume"))
+def vwap(columns, period):
+    """VWAP скользящего окна по типичной цене (high + low + close) / 3"""
+    typical = (columns["high"] + columns["low"] + columns["close"]) / 3
+    volume = rolling_sum(columns["volume"], period)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        values = rolling_sum(typical * columns["volume"], period) / volume
+    return np.where(volume > 0, values, np.nan)
+
+
+STOCH_SMOOTHING = StochAccumulator.smoothing
+
+
+@register(
+    Indicators.STOCH, StochAccumulator, inputs=("high", "low", "close"), outputs=("k", "d"),
+    warmup=lambda period: period + STOCH_SMOOTHING - 2
+)
+def stoch(columns, period):
+    """Стохастик: %K за period свечей и %D - его SMA(3)"""
+    lowest = rolling_min(columns["low"], period)
+    highest = rolling_max(columns["high"], period)
+    spread = highest - lowest
+    with np.errstate(divide="ignore", invalid="ignore"):
+        k = 100 * (columns["close"] - lowest) / spread
+    # Окно без движения цены: середина диапазона
+    k = np.where(spread == 0, 50.0, k)
+    return _stack(k, rolling_mean(k, STOCH_SMOOTHING))
+
+
+# =========================
+# Индикаторы над индикаторами (входы задаются источниками)
+# =========================
+@register(
+    Indicators.CROSSOVER, CrossoverAccumulator, inputs=("fast", "slow"), outputs=("diff", "cross"),
+    warmup=lambda period: 0
+)
+def crossover(columns, period):
+    """Разность fast - slow и пересечения: +1 снизу вверх, -1 сверху вниз, иначе 0.
+
+    Например, fast и slow - две EMA. period не используется.
+    """
+    diff = columns["fast"] - columns["slow"]
+    previous = np.concatenate(([np.nan], diff[:-1]))
+    cross = np.where((previous <= 0) & (diff > 0), 1.0, np.where((previous >= 0) & (diff < 0), -1.0, 0.0))
+    return _stack(diff, np.where(np.isnan(diff), np.nan, cross))
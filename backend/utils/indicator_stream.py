@@ -0,0 +1,70 @@
+from utils.accumulators import (  # noqa: F401 - аккумуляторы раньше жили здесь
+    EmaAccumulator,
+    IndicatorAccumulator,
+    SmaAccumulator,
+    WmaAccumulator,
+)
+from utils.indicator_registry import get_definition
+
+
+class IndicatorStream:
+    """Потоковое состояние одного индикатора.
+
+    Закрытые свечи подаются один раз и попадают в аккумулятор, формирующаяся
+    свеча только пересчитывается поверх него. Когда формирующаяся свеча
+    закрывается, она приходит в update() уже среди закрытых.
+    """
+
+    def __init__(self, ind_type, period, max_history=None):
+        definition = get_definition(ind_type)
+        if definition is None or definition.accumulator is None:
+            raise ValueError(f"Indicator {ind_type} has no streaming calculation")
+        self.ind_type = definition.type
+        self.inputs = definition.inputs
+        self.period = period
+        self.max_history = max_history
+        self.values = []
+        self.forming = None
+        self._accumulator = definition.accumulator(period)
+
+    @classmethod
+    def supports(cls, ind_type):
+        """Есть ли у типа индикатора потоковый расчёт"""
+        definition = get_definition(ind_type)
+        return definition is not None and definition.accumulator is not None
+
+    def update(self, closed=(), forming=None):
+        """Добавляет закрытые свечи и пересчитывает формирующуюся, возвращает новые точки.
+
+        С одним входом свеча - число, с несколькими - строка значений в
+        порядке inputs (например, массив (свечи, входы)).
+        """
+        new_values = [self._accumulator.push(*row) for row in self._rows(closed)]
+        self.values.extend(new_values)
+        self._trim()
+
+        self.forming = None if forming is None else self._accumulator.peek(*self._row(forming))
+        if self.forming is not None:
+            return new_values + [self.forming]
+        return new_values
+
+    def _row(self, value):
+        if len(self.inputs) == 1:
+            return (float(value),)
+        return tuple(float(v) for v in value)
+
+    def _rows(self, values):
+        return (self._row(value) for value in values)
+
+    def series(self):
+        """Полный ряд значений в формате IndicatorsCalculator.calculate"""
+        if self.forming is None:
+            return list(self.values)
+        return self.values + [self.forming]
+
+    def _trim(self):
+        # Режем с запасом, чтобы не сдвигать список на каждой свече
+        if self.max_history is None:
+            return
+        if len(self.values) > self.max_history * 2:
+            del self.values[:len(self.values) - self.max_history]
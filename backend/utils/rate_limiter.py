@@ -0,0 +1,36 @@
+import asyncio
+import time
+
+
+class AsyncRateLimiter:
+    """Общий лимит частоты запросов для всех корутин.
+
+    Алгоритм GCRA: каждый вызов резервирует следующий свободный слот,
+    burst запросов могут пройти сразу. Резервирование происходит без
+    await, поэтому блокировка не нужна.
+    """
+
+    def __init__(self, rate, burst=1):
+        if rate <= 0:
+            raise ValueError(f"Rate must be positive, got {rate}")
+        self._interval = 1 / rate
+        self._tolerance = (max(burst, 1) - 1) * self._interval
+        self._next_slot = 0.0
+
+    def _reserve(self):
+        now = time.monotonic()
+        slot = max(self._next_slot, now)
+        self._next_slot = slot + self._interval
+        return slot - self._tolerance - now
+
+    async def acquire(self):
+        delay = self._reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
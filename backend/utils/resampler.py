@@ -0,0 +1,106 @@
+import numpy as np
+
+from utils.constants import BASE_INTERVAL, CANDLE_COLUMNS
+
+# Длительность таймфреймов Bybit в миллисекундах. Недельные и месячные
+# свечи не выровнены по эпохе, их из минутных не собираем.
+INTERVAL_MS = {
+    "1": 60_000,
+    "3": 3 * 60_000,
+    "5": 5 * 60_000,
+    "15": 15 * 60_000,
+    "30": 30 * 60_000,
+    "60": 60 * 60_000,
+    "120": 120 * 60_000,
+    "240": 240 * 60_000,
+    "360": 360 * 60_000,
+    "720": 720 * 60_000,
+    "D": 1440 * 60_000,
+}
+
+
+def interval_ms(interval):
+    if interval not in INTERVAL_MS:
+        raise ValueError(f"Unsupported interval for resampling: {interval}")
+    return INTERVAL_MS[interval]
+
+
+def can_resample(interval, base=BASE_INTERVAL):
+    """Можно ли собрать interval из свечей base"""
+    if interval not in INTERVAL_MS or base not in INTERVAL_MS or interval == base:
+        return False
+    return INTERVAL_MS[interval] % INTERVAL_MS[base] == 0
+
+
+def bucket_start(timestamp, interval):
+    """Начало свечи таймфрейма interval, в которую попадает timestamp"""
+    ms = interval_ms(interval)
+    return timestamp - timestamp % ms
+
+
+def resample(columns, interval, drop_partial_head=False):
+    """Векторная агрегация отсортированных свечей в таймфрейм interval.
+
+    Свечи группируются по началу корзины: open берётся у первой свечи,
+    close у последней, high/low через reduceat, объёмы суммируются.
+    drop_partial_head отбрасывает первую корзину, если история начинается
+    с её середины.
+    """
+    timestamps = np.asarray(columns["timestamp"], dtype=np.float64)
+    if drop_partial_head and len(timestamps):
+        head = bucket_start(timestamps[0], interval)
+        if timestamps[0] != head:
+            skip = int(np.searchsorted(timestamps, head + interval_ms(interval), side="left"))
+            columns = {name: np.asarray(columns[name])[skip:] for name in CANDLE_COLUMNS}
+            timestamps = timestamps[skip:]
+
+    if not len(timestamps):
+        return {name: np.empty(0) for name in CANDLE_COLUMNS}
+
+    buckets = bucket_start(timestamps, interval)
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    ends = np.r_[starts[1:], len(buckets)] - 1
+
+    def col(name):
+        return np.asarray(columns[name], dtype=np.float64)
+
+    return {
+        "timestamp": buckets[starts],
+        "open": col("open")[starts],
+        "high": np.maximum.reduceat(col("high"), starts),
+        "low": np.minimum.reduceat(col("low"), starts),
+        "close": col("close")[ends],
+        "volume": np.add.reduceat(col("volume"), starts),
+        "turnover": np.add.reduceat(col("turnover"), starts),
+    }
+
+
+def resample_into(base, target, interval, since=None):
+    """Обновляет хранилище target свечами base, собранными в interval.
+
+    since - timestamp, начиная с которого менялись свечи base (обычно
+    последняя свеча до опроса). Тогда пересобирается только открытая
+    корзина и новые за ней: это не больше одной корзины минутных свечей.
+    Без since или при расхождении с target ряд строится заново целиком.
+    Возвращает timestamp первой изменённой свечи target или None, если ряд
+    построен заново.
+    """
+    if not len(base):
+        return None
+
+    last = target.last_timestamp()
+    timestamps = base.column("timestamp")
+    if since is not None and last is not None:
+        start = bucket_start(since, interval)
+        # Открытая корзина должна быть последней в target и целиком лежать в base
+        if start >= last and timestamps[0] <= start:
+            tail = {name: base.column(name)[base.index_from(start):] for name in CANDLE_COLUMNS}
+            block = resample(tail, interval)
+            target.truncate(target.index_from(start))
+            target.extend_columns(block)
+            return start
+
+    block = resample(base.columns(), interval, drop_partial_head=True)
+    target.clear()
+    target.extend_columns(block)
+    return None
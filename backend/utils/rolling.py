@@ -0,0 +1,319 @@
+import math
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+# Через сколько значений пересчитывать скользящие суммы окна с нуля,
+# чтобы накопленная ошибка округления не уводила результат от пакетного расчёта
+RESYNC_EVERY = 1024
+
+
+# =========================
+# Пакетные примитивы: весь ряд за раз, без циклов на Python.
+# Окно, в котором есть NaN, даёт NaN, как rolling(period) в pandas.
+# =========================
+def _check_period(period):
+    if period < 1:
+        raise ValueError(f"Period must be positive, got {period}")
+
+
+def as_float(values):
+    return np.ascontiguousarray(values, dtype=np.float64)
+
+
+def rolling_sum(values, period):
+    """Сумма окна через разность кумулятивных сумм"""
+    _check_period(period)
+    values = as_float(values)
+    result = np.full(len(values), np.nan)
+    if len(values) < period:
+        return result
+
+    missing = np.isnan(values)
+    finite = values[~missing]
+    # Сдвиг к первому значению уменьшает величину сумм и ошибку округления
+    offset = finite[0] if len(finite) else 0.0
+    sums = np.concatenate(([0.0], np.cumsum(np.where(missing, 0.0, values - offset))))
+    gaps = np.concatenate(([0], np.cumsum(missing)))
+
+    window = sums[period:] - sums[:-period] + offset * period
+    result[period - 1:] = np.where(gaps[period:] - gaps[:-period] > 0, np.nan, window)
+    return result
+
+
+def rolling_mean(values, period):
+    return rolling_sum(values, period) / period
+
+
+def rolling_var(values, period, ddof=0):
+    """Дисперсия окна алгоритмом Уэлфорда с удалением выпадающих значений.
+
+    Цикл по ряду - rolling().var() pandas на C, это тот же алгоритм, что и
+    у потокового WelfordWindow, поэтому пакетный и потоковый расчёт совпадают.
+    """
+    _check_period(period)
+    values = as_float(values)
+    if period - ddof < 1:
+        return np.full(len(values), np.nan)
+    var = pd.Series(values, copy=False).rolling(period).var(ddof=ddof).to_numpy()
+    # Отрицательный ноль от округления на постоянном окне
+    return np.where(var < 0, 0.0, var)
+
+
+def rolling_std(values, period, ddof=0):
+    return np.sqrt(rolling_var(values, period, ddof))
+
+
+def _rolling_extreme(values, period, ufunc, fill):
+    # Алгоритм van Herk/Gil-Werman: префиксные и суффиксные экстремумы блоков
+    # длины period, экстремум окна - из суффикса одного блока и префикса следующего
+    _check_period(period)
+    values = as_float(values)
+    size = len(values)
+    result = np.full(size, np.nan)
+    if size < period:
+        return result
+
+    blocks = np.concatenate([values, np.full(-size % period, fill)]).reshape(-1, period)
+    prefix = ufunc.accumulate(blocks, axis=1).ravel()
+    suffix = ufunc.accumulate(blocks[:, ::-1], axis=1)[:, ::-1].ravel()
+    result[period - 1:] = ufunc(suffix[:size - period + 1], prefix[period - 1:size])
+    return result
+
+
+def rolling_min(values, period):
+    return _rolling_extreme(values, period, np.minimum, np.inf)
+
+
+def rolling_max(values, period):
+    return _rolling_extreme(values, period, np.maximum, -np.inf)
+
+
+def ewm(values, alpha):
+    """Экспоненциальное сглаживание с adjust=False, первое значение - затравка"""
+    values = as_float(values)
+    return pd.Series(values, copy=False).ewm(alpha=alpha, adjust=False).mean().to_numpy()
+
+
+def wilder(values, period):
+    """Сглаживание Уайлдера (RSI, ATR): затравка - среднее первых period значений"""
+    _check_period(period)
+    values = as_float(values)
+    result = np.full(len(values), np.nan)
+    if len(values) < period:
+        return result
+
+    seeded = values[period - 1:].copy()
+    seeded[0] = values[:period].mean()
+    result[period - 1:] = ewm(seeded, 1 / period)
+    return result
+
+
+def weighted_mean(values, period):
+    """Линейно взвешенное среднее окна: старшему значению вес period"""
+    _check_period(period)
+    values = as_float(values)
+    result = np.full(len(values), np.nan)
+    if len(values) < period:
+        return result
+
+    weights = np.arange(1, period + 1, dtype=np.float64)
+    result[period - 1:] = np.convolve(values, weights[::-1], mode="valid") / weights.sum()
+    return result
+
+
+# =========================
+# Потоковые примитивы: окно по одному значению.
+# push() добавляет значение, peek() считает результат с ещё одним
+# значением, не меняя состояние.
+# =========================
+class WindowSum:
+    """Скользящая сумма последних period значений.
+
+    NaN в сумму не входят, а считаются отдельно: пока в окне есть NaN,
+    результат NaN, как у пакетного rolling_sum.
+    """
+
+    def __init__(self, period):
+        _check_period(period)
+        self.period = period
+        self.window = deque(maxlen=period)
+        self.total = 0.0
+        self.nans = 0
+        self._pushes = 0
+
+    @property
+    def full(self):
+        return len(self.window) == self.period
+
+    def _result(self, full, total, nans):
+        return total if full and not nans else math.nan
+
+    def _step(self, value):
+        total, nans = self.total, self.nans
+        if self.full:
+            if math.isnan(self.window[0]):
+                nans -= 1
+            else:
+                total -= self.window[0]
+        if math.isnan(value):
+            return total, nans + 1
+        return total + value, nans
+
+    def push(self, value):
+        self.total, self.nans = self._step(value)
+        self.window.append(value)
+
+        self._pushes += 1
+        if self._pushes % RESYNC_EVERY == 0:
+            self.total = math.fsum(v for v in self.window if not math.isnan(v))
+        return self._result(self.full, self.total, self.nans)
+
+    def peek(self, value):
+        total, nans = self._step(value)
+        return self._result(len(self.window) + 1 >= self.period, total, nans)
+
+
+class WilderSmoother:
+    """Сглаживание Уайлдера по одному значению, как пакетный wilder()"""
+
+    def __init__(self, period):
+        _check_period(period)
+        self.period = period
+        self._alpha = 1 / period
+        self._count = 0
+        self._value = 0.0
+
+    def _step(self, value):
+        count = self._count + 1
+        if count < self.period:
+            return count, self._value + value
+        if count == self.period:
+            return count, (self._value + value) / self.period
+        return count, (1 - self._alpha) * self._value + self._alpha * value
+
+    def push(self, value):
+        self._count, self._value = self._step(value)
+        return self._value if self._count >= self.period else math.nan
+
+    def peek(self, value):
+        count, result = self._step(value)
+        return result if count >= self.period else math.nan
+
+
+class MonotonicWindow:
+    """Минимум или максимум окна на монотонной очереди: O(1) в среднем на значение.
+
+    NaN в очередь не попадает: он сбрасывает её, потому что всё, что было до
+    него, покинет окно раньше него. Пока NaN в окне, результат NaN, как у
+    пакетных rolling_min/rolling_max.
+    """
+
+    def __init__(self, period, maximum=False):
+        _check_period(period)
+        self.period = period
+        self.maximum = maximum
+        # (номер значения, значение), значения монотонны от лучшего к худшему
+        self._queue = deque()
+        self._count = 0
+        self._last_nan = -1
+
+    def _better(self, a, b):
+        # Без лямбд: поток с окном уходит в процессный пул и должен pickle'иться
+        return a >= b if self.maximum else a <= b
+
+    def push(self, value):
+        if math.isnan(value):
+            self._queue.clear()
+            self._last_nan = self._count
+        else:
+            while self._queue and self._better(value, self._queue[-1][1]):
+                self._queue.pop()
+            self._queue.append((self._count, value))
+        self._count += 1
+        if self._queue and self._queue[0][0] <= self._count - 1 - self.period:
+            self._queue.popleft()
+        if self._count < self.period or self._last_nan >= self._count - self.period:
+            return math.nan
+        return self._queue[0][1]
+
+    def peek(self, value):
+        if self._count + 1 < self.period or math.isnan(value):
+            return math.nan
+        # После push из окна выпадет значение с номером count - period
+        if self._last_nan > self._count - self.period:
+            return math.nan
+        for index, candidate in self._queue:
+            if index > self._count - self.period:
+                return candidate if self._better(candidate, value) else value
+        return value
+
+
+class WelfordWindow:
+    """Дисперсия окна алгоритмом Уэлфорда с удалением выпадающих значений.
+
+    NaN в среднее и сумму квадратов не входят, а считаются отдельно: пока
+    в окне есть NaN, результат NaN, как у пакетного rolling_var.
+    """
+
+    def __init__(self, period, ddof=0):
+        _check_period(period)
+        self.period = period
+        self.ddof = ddof
+        self.window = deque(maxlen=period)
+        # Число значений без NaN, их среднее и сумма квадратов отклонений
+        self._count = 0
+        self._mean = 0.0
+        self._m2 = 0.0
+        self.nans = 0
+        self._pushes = 0
+
+    @staticmethod
+    def _add(count, mean, m2, value):
+        count += 1
+        delta = value - mean
+        mean += delta / count
+        return count, mean, m2 + delta * (value - mean)
+
+    @staticmethod
+    def _remove(count, mean, m2, value):
+        if count == 1:
+            return 0, 0.0, 0.0
+        count -= 1
+        delta = value - mean
+        mean -= delta / count
+        return count, mean, m2 - delta * (value - mean)
+
+    def _step(self, value):
+        state, nans = (self._count, self._mean, self._m2), self.nans
+        if len(self.window) == self.period:
+            if math.isnan(self.window[0]):
+                nans -= 1
+            else:
+                state = self._remove(*state, self.window[0])
+        if math.isnan(value):
+            return state, nans + 1
+        return self._add(*state, value), nans
+
+    def _variance(self, size, state, nans):
+        count, _, m2 = state
+        if size < self.period or nans:
+            return math.nan
+        return max(m2, 0.0) / (count - self.ddof)
+
+    def push(self, value):
+        state, self.nans = self._step(value)
+        self._count, self._mean, self._m2 = state
+        self.window.append(value)
+
+        self._pushes += 1
+        if self._pushes % RESYNC_EVERY == 0 and self._count:
+            finite = [v for v in self.window if not math.isnan(v)]
+            self._mean = math.fsum(finite) / len(finite)
+            self._m2 = math.fsum((v - self._mean) ** 2 for v in finite)
+        return self._variance(len(self.window), (self._count, self._mean, self._m2), self.nans)
+
+    def peek(self, value):
+        state, nans = self._step(value)
+        return self._variance(len(self.window) + 1, state, nans)
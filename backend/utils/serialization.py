@@ -0,0 +1,10 @@
+import orjson
+
+# NumPy-массивы сериализуются напрямую из буфера, NaN и бесконечности
+# orjson сам пишет как null
+_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+
+def dumps(content):
+    """JSON в UTF-8 байтах, как их отдаёт /data"""
+    return orjson.dumps(content, option=_OPTIONS)